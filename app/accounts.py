@@ -0,0 +1,320 @@
+
+# Account deletion (DELETE /me) → turant revoke + background purge
+#
+# Pehle User.notes / User.otps ORM cascade="all, delete" the → user delete
+# karte hi har note memory me load hota aur ek-ek DELETE → 100k notes wale
+# user ke liye ek bahut lamba transaction.
+#
+# Ab:
+#   1. DELETE /me → users.deleted_at set + account_deletions row (ek chhota
+#      transaction). Token / login usi waqt band (get_current_user check).
+#   2. Background thread user ka data bounded batches me hatata hai (har batch
+#      apna chhota transaction → lambe locks / bada undo log nahi).
+#   3. Aakhir me users row ka ek DELETE; bache hue FK rows (notes, email_otps,
+#      user_keys) DB ka ON DELETE CASCADE hatata hai (ORM passive_deletes).
+#
+# Worker crash ho jaye to adhoora purge:
+#   python -m app.accounts purge       → baaki deletions pura karo
+#   python -m app.accounts status      → recent deletions + purge rate
+#   python -m app.accounts bench --notes 100000
+
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, or_, select, update
+
+from .models import (
+    AccountDeletion, ChangeEvent, EmailOTP, OtpSendCount, ShardMove, ShardRoute, User,
+    UserKey
+)
+
+
+#                    PURGE CONFIG
+
+# Ek transaction me max kitni rows delete
+ACCOUNT_PURGE_BATCH = int(os.getenv("ACCOUNT_PURGE_BATCH", "1000"))
+
+# Batches ke beech pause (ms) → replicas / baaki writes ko saans; 0 → lagataar
+ACCOUNT_PURGE_PAUSE_MS = float(os.getenv("ACCOUNT_PURGE_PAUSE_MS", "0"))
+
+
+#                    REQUEST
+
+
+def request_deletion(db, user_id) -> AccountDeletion:
+    """
+    User ko deleted mark + account_deletions row (caller ke primary session me, commit yahi)
+    Pehle se mark hai → wahi purani row
+    """
+    now = datetime.utcnow()
+    db.execute(
+        update(User)
+        .where(User.id == user_id, User.deleted_at.is_(None))
+        .values(deleted_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    deletion = db.get(AccountDeletion, user_id)
+    if deletion is None:
+        deletion = AccountDeletion(user_id=user_id, requested_at=now, rows_deleted=0)
+        db.add(deletion)
+    db.commit()
+    db.refresh(deletion)
+    return deletion
+
+
+#                    PURGE
+
+
+def _purge_table(bind, table, condition, batch_size, pause) -> int:
+    """
+    condition wali rows pk batches me delete (har batch apna transaction)
+    Composite pk wali chhoti tables (user_keys, otp_send_counts) ek DELETE me
+    """
+    pk = list(table.primary_key.columns)
+    if len(pk) > 1:
+        with bind.begin() as conn:
+            return conn.execute(delete(table).where(condition)).rowcount
+
+    pk = pk[0]
+    deleted = 0
+    while True:
+        with bind.begin() as conn:
+            ids = conn.execute(select(pk).where(condition).limit(batch_size)).scalars().all()
+            if not ids:
+                return deleted
+            deleted += conn.execute(delete(table).where(pk.in_(ids))).rowcount
+
+        if pause:
+            time.sleep(pause)
+
+
+def _add_progress(primary, user_id, rows, **values):
+    with primary.begin() as conn:
+        conn.execute(
+            update(AccountDeletion)
+            .where(AccountDeletion.user_id == user_id)
+            .values(rows_deleted=AccountDeletion.rows_deleted + rows, **values)
+        )
+
+
+def purge_user(user_id, shard_binds, primary, batch_size=ACCOUNT_PURGE_BATCH,
+               pause_ms=ACCOUNT_PURGE_PAUSE_MS) -> dict:
+    """
+    User ka saara data delete → {"rows", "seconds", "rows_per_sec"}
+    Har shard par (adhoore shard move ki rows bhi) MOVED_TABLES children pehle,
+    phir primary ki user tables, aakhir me users row. Dobara chalana safe hai
+    """
+    from .sharding import MOVED_TABLES
+
+    started = time.perf_counter()
+    pause = pause_ms / 1000
+    _add_progress(primary, user_id, 0, started_at=datetime.utcnow())
+
+    with primary.connect() as conn:
+        email = conn.execute(select(User.email).where(User.id == user_id)).scalar()
+
+    def sweep():
+        # Har table ke baad progress → status CLI me chalte purge ka rate
+        rows = 0
+        for bind in shard_binds:
+            for table in reversed(MOVED_TABLES):
+                deleted = _purge_table(bind, table, table.c.user_id == user_id, batch_size, pause)
+                if deleted:
+                    _add_progress(primary, user_id, deleted)
+                rows += deleted
+        return rows
+
+    rows = sweep()
+
+    # Primary ki user tables (SQLite par cascade FK nahi hote → explicit)
+    otps = EmailOTP.user_id == user_id
+    if email is not None:
+        otps = or_(otps, EmailOTP.email == email)
+    primary_tables = [
+        (ChangeEvent.__table__, ChangeEvent.user_id == user_id),
+        (EmailOTP.__table__, otps),
+        (UserKey.__table__, UserKey.user_id == user_id),
+        (ShardMove.__table__, ShardMove.user_id == user_id),
+    ]
+    if email is not None:
+        primary_tables.append((OtpSendCount.__table__, OtpSendCount.email == email))
+    primary_rows = sum(
+        _purge_table(primary, table, condition, batch_size, pause)
+        for table, condition in primary_tables
+    )
+
+    # users row (bachi FK rows ON DELETE CASCADE se) + shard route
+    with primary.begin() as conn:
+        primary_rows += conn.execute(delete(User).where(User.id == user_id)).rowcount
+        primary_rows += conn.execute(delete(ShardRoute).where(ShardRoute.user_id == user_id)).rowcount
+
+    # Revoke se pehle shuru hui koi request beech me note likh gayi ho
+    rows += sweep() + primary_rows
+
+    seconds = time.perf_counter() - started
+    _add_progress(primary, user_id, primary_rows, finished_at=datetime.utcnow())
+
+    return {"rows": rows, "seconds": seconds, "rows_per_sec": rows / seconds if seconds else 0}
+
+
+#                    BACKGROUND PURGER
+
+
+class AccountPurger:
+    """
+    Per-worker queue + ek daemon thread (pehle submit par start)
+    submit() turant return → DELETE /me purge ka wait nahi karta
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = None
+        self.last = None    # aakhri purge ka result (rows / seconds / rows_per_sec)
+
+    def submit(self, user_id):
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name="account-purge", daemon=True).start()
+        self._queue.put(user_id)
+
+    def _run(self):
+        from .database import engine
+        from .sharding import shard_router
+
+        while True:
+            user_id = self._queue.get()
+            try:
+                self.last = {"user_id": user_id,
+                             **purge_user(user_id, set(shard_router.engines), engine)}
+                shard_router.forget(user_id)
+            except Exception as e:
+                # Row finished_at NULL reh jaati hai → `python -m app.accounts purge`
+                print(f"account purge failed for user {user_id}: {e!r}")
+
+
+account_purger = AccountPurger()
+
+
+def pending_deletions(primary) -> list:
+    with primary.connect() as conn:
+        return conn.execute(
+            select(AccountDeletion.user_id)
+            .where(AccountDeletion.finished_at.is_(None))
+            .order_by(AccountDeletion.requested_at)
+        ).scalars().all()
+
+
+#                    BENCHMARK
+
+
+def benchmark(notes: int, batch_size: int = ACCOUNT_PURGE_BATCH):
+    """
+    Temp SQLite file par ek user (`notes` notes + unke revisions):
+    purana ORM tarika (saare notes load + ek-ek DELETE, ek transaction) vs
+    batched purge (rows/s). Dono ke liye data dobara banta hai
+    """
+    import tempfile
+
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    from .database import Base, create_db_engine
+    from .models import Note, NoteRevision
+
+    path = os.path.join(tempfile.mkdtemp(), "purge_bench.db")
+    bind = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind)
+
+    def fill():
+        with Session(bind=bind) as db:
+            db.add(User(id=1, name="bench", email="bench@example.com", hashed_password="x"))
+            db.add(AccountDeletion(user_id=1, rows_deleted=0))
+            db.flush()
+            db.execute(insert(Note), [
+                {"id": i + 1, "title": f"note {i}", "content": "x" * 200, "user_id": 1,
+                 "change_seq": i + 1}
+                for i in range(notes)
+            ])
+            db.execute(insert(NoteRevision), [
+                {"note_id": i + 1, "user_id": 1, "revision": 1, "kind": "full",
+                 "title": f"note {i}", "data": "x" * 200, "size": 200}
+                for i in range(notes)
+            ])
+            db.commit()
+
+    fill()
+    started = time.perf_counter()
+    with Session(bind=bind) as db:
+        for note in db.query(Note).filter(Note.user_id == 1).all():
+            db.delete(note)
+        db.query(NoteRevision).filter(NoteRevision.user_id == 1).delete(synchronize_session=False)
+        db.query(User).filter(User.id == 1).delete(synchronize_session=False)
+        db.query(AccountDeletion).delete()
+        db.commit()
+    orm_seconds = time.perf_counter() - started
+
+    fill()
+    result = purge_user(1, [bind], bind, batch_size=batch_size, pause_ms=0)
+
+    print(f"{notes} notes + {notes} revisions (1 user, SQLite file)")
+    print(f"ORM load + per-row delete (1 txn) : {orm_seconds:>8.2f} s")
+    print(f"batched purge ({batch_size}/txn)        : {result['seconds']:>8.2f} s  "
+          f"({result['rows']} rows, {result['rows_per_sec']:.0f} rows/s)")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.accounts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    purge = sub.add_parser("purge", help="adhoori account deletions pura karo")
+    purge.add_argument("--batch-size", type=int, default=ACCOUNT_PURGE_BATCH)
+
+    status = sub.add_parser("status", help="recent deletions + purge rate")
+    status.add_argument("--limit", type=int, default=20)
+
+    bench = sub.add_parser("bench", help="ORM cascade vs batched purge")
+    bench.add_argument("--notes", type=int, default=100000)
+    bench.add_argument("--batch-size", type=int, default=ACCOUNT_PURGE_BATCH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.notes, args.batch_size)
+        return
+
+    from .database import engine
+    from .sharding import shard_router
+
+    if args.command == "purge":
+        for user_id in pending_deletions(engine):
+            result = purge_user(user_id, set(shard_router.engines), engine, args.batch_size)
+            print(f"user {user_id}: {result['rows']} rows in {result['seconds']:.1f}s "
+                  f"({result['rows_per_sec']:.0f} rows/s)")
+        return
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(AccountDeletion).order_by(AccountDeletion.requested_at.desc()).limit(args.limit)
+        ).all()
+    now = datetime.utcnow()
+    for row in rows:
+        elapsed = ((row.finished_at or now) - (row.started_at or now)).total_seconds()
+        rate = row.rows_deleted / elapsed if elapsed > 0 else 0
+        state = "done" if row.finished_at else ("running" if row.started_at else "pending")
+        print(f"user {row.user_id}: {state:<8} {row.rows_deleted:>10} rows  {rate:>10.0f} rows/s  "
+              f"requested {row.requested_at:%Y-%m-%d %H:%M:%S}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+
+# Hot / cold tiering (note archive)
+#
+#   notes          → hot tier: listings, filters, indexes
+#   notes_archive  → cold tier: same id / columns, content zlib compressed
+#
+# Zyada tar notes kuch mahine baad kabhi nahi padhe jaate, lekin notes table
+# aur uske indexes (jo har GET /notes walk karta hai) ko bada karte hai.
+# Archive job NOTE_ARCHIVE_DAYS se untouched (updated_at) notes batches me
+# cold tier me le jaata hai:
+#
+#   - GET /notes sirf hot tier (?archived=true → cold tier ki listing)
+#   - GET /notes/{id}, /content, /changes → hot me nahi mila to cold se
+#   - Edit / move / delete → note pehle wapas hot me (unarchive), phir normal path
+#
+#   python -m app.archive run [--days 180]
+#   python -m app.archive sizes
+#   python -m app.archive bench --users 20 --notes 5000
+
+
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from .database import begin_immediate
+from .models import Note, NoteArchive
+from .sync import invalidate_note_list
+
+
+#                    ARCHIVE CONFIG
+
+# Itne din se update nahi hua note → cold tier
+NOTE_ARCHIVE_DAYS = int(os.getenv("NOTE_ARCHIVE_DAYS", "180"))
+
+# Ek transaction me kitne notes move
+NOTE_ARCHIVE_BATCH = int(os.getenv("NOTE_ARCHIVE_BATCH", "500"))
+
+# zlib level (1 fast … 9 chhota)
+NOTE_ARCHIVE_LEVEL = int(os.getenv("NOTE_ARCHIVE_LEVEL", "6"))
+
+# Response ke liye cold columns (notes jaise naam)
+ARCHIVE_COLUMNS = (
+    NoteArchive.id, NoteArchive.title, NoteArchive.content_z, NoteArchive.created_at,
+    NoteArchive.version, NoteArchive.updated_at, NoteArchive.change_seq, NoteArchive.folder_id
+)
+
+
+def compress(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), NOTE_ARCHIVE_LEVEL)
+
+
+def decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _note_dict(row) -> dict:
+    # Cold row → notes jaisa dict (content stored form me, encryption on ho to ciphertext)
+    data = dict(row)
+    data["content"] = decompress(data.pop("content_z"))
+    return data
+
+
+#                    COLD READS
+
+
+def archived_notes(db, user_id, *conditions, limit=None) -> list:
+    """
+    User ke cold notes (dicts, content decompressed); conditions NoteArchive par
+    limit → change_seq order me pehle `limit` (delta sync)
+    """
+    query = select(*ARCHIVE_COLUMNS).where(NoteArchive.user_id == user_id, *conditions)
+    if limit is not None:
+        query = query.order_by(NoteArchive.change_seq).limit(limit)
+    return [_note_dict(row) for row in db.execute(query).mappings().all()]
+
+
+def archived_note(db, user_id, note_id):
+    notes = archived_notes(db, user_id, NoteArchive.id == note_id)
+    return notes[0] if notes else None
+
+
+def is_archived(db, user_id, note_id) -> bool:
+    return db.execute(
+        select(NoteArchive.id).where(NoteArchive.id == note_id, NoteArchive.user_id == user_id)
+    ).first() is not None
+
+
+#                    TIER MOVES
+
+
+def unarchive(db, user_id, note_id) -> bool:
+    """
+    Cold note wapas notes me (caller ke transaction me, commit caller karta hai)
+    Note cold me nahi → False
+    """
+    row = db.execute(
+        select(NoteArchive.__table__)
+        .where(NoteArchive.id == note_id, NoteArchive.user_id == user_id)
+    ).mappings().first()
+    if row is None:
+        return False
+
+    db.execute(insert(Note).values(
+        id=row["id"],
+        user_id=row["user_id"],
+        title=row["title"],
+        content=decompress(row["content_z"]),
+        created_at=row["created_at"],
+        version=row["version"],
+        updated_at=row["updated_at"],
+        change_seq=row["change_seq"],
+        folder_id=row["folder_id"]
+    ))
+    db.execute(
+        delete(NoteArchive)
+        .where(NoteArchive.id == note_id)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def archive_batch(bind, cutoff, after_id=0, batch_size=NOTE_ARCHIVE_BATCH):
+    """
+    id > after_id wale agle `batch_size` purane notes ek transaction me cold tier me
+    Rows FOR UPDATE (SQLite par BEGIN IMMEDIATE) → beech me koi edit commit nahi
+    hota (edit wait karke cold tier se unarchive path lega)
+    (last_id, moved) return; last_id None → khatam
+    """
+    now = datetime.utcnow()
+    with bind.begin() as conn:
+        begin_immediate(conn)
+        rows = conn.execute(
+            select(Note.__table__)
+            .where(Note.id > after_id, Note.updated_at < cutoff)
+            .order_by(Note.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).mappings().all()
+        if not rows:
+            return None, 0
+
+        conn.execute(insert(NoteArchive), [
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "title": row["title"],
+                "content_z": compress(row["content"]),
+                "content_size": len(row["content"].encode("utf-8")),
+                "created_at": row["created_at"],
+                "version": row["version"],
+                "updated_at": row["updated_at"],
+                "change_seq": row["change_seq"],
+                "folder_id": row["folder_id"],
+                "archived_at": now
+            }
+            for row in rows
+        ])
+        conn.execute(delete(Note).where(Note.id.in_([row["id"] for row in rows])))
+
+    # Hot listing badli → in users ke GET /notes ETag
+    invalidate_note_list(*{row["user_id"] for row in rows})
+    return rows[-1]["id"], len(rows)
+
+
+def archive_old_notes(bind, days=NOTE_ARCHIVE_DAYS, batch_size=NOTE_ARCHIVE_BATCH,
+                      log=print) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    after_id = 0
+    moved = 0
+    started = time.perf_counter()
+
+    while True:
+        after_id, count = archive_batch(bind, cutoff, after_id, batch_size)
+        if after_id is None:
+            break
+        moved += count
+
+    log(f"  {moved} notes archived (older than {days} days) in {time.perf_counter() - started:.1f}s")
+    return moved
+
+
+#                    SIZES
+
+
+def table_sizes(bind, tables=("notes", "notes_archive")) -> dict:
+    """
+    table → (table bytes, index bytes); Postgres / MySQL / SQLite (dbstat)
+    """
+    name = bind.dialect.name
+    result = {}
+    with bind.connect() as conn:
+        for table in tables:
+            if name == "postgresql":
+                row = conn.exec_driver_sql(
+                    "SELECT pg_table_size(%(t)s), pg_indexes_size(%(t)s)", {"t": table}
+                ).first()
+            elif name == "mysql":
+                row = conn.exec_driver_sql(
+                    "SELECT data_length, index_length FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = %(t)s", {"t": table}
+                ).first()
+            else:
+                # dbstat → har b-tree (table + uske indexes) ke pages
+                indexes = [
+                    row[0] for row in conn.exec_driver_sql(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?",
+                        (table,)
+                    )
+                ]
+                sizes = dict(conn.exec_driver_sql(
+                    "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"
+                ).all())
+                row = (sizes.get(table, 0), sum(sizes.get(index, 0) for index in indexes))
+            result[table] = tuple(int(value or 0) for value in row) if row else (0, 0)
+    return result
+
+
+#                    BENCHMARK
+
+
+def benchmark(users: int, notes: int, old_pct: int = 80, repeat: int = 20):
+    """
+    Temp SQLite file: `users` users × `notes` notes (old_pct% purane) →
+    archive se pehle / baad notes table + index size aur ek user ki GET /notes
+    jaisi listing query ka time
+    """
+    import random
+    import tempfile
+
+
+    from .database import Base, create_db_engine
+
+    path = os.path.join(tempfile.mkdtemp(), "archive_bench.db")
+    bind = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind)
+    rng = random.Random(1)
+
+    now = datetime.utcnow()
+    old = now - timedelta(days=NOTE_ARCHIVE_DAYS + 30)
+    words = ["alpha", "beta", "gamma", "delta", "notes", "meeting", "todo", "idea"]
+    rows = []
+    for user_id in range(1, users + 1):
+        for i in range(notes):
+            stamp = old if rng.randrange(100) < old_pct else now
+            rows.append({
+                "user_id": user_id, "title": f"note {i}",
+                "content": " ".join(rng.choice(words) for _ in range(80)),
+                "created_at": stamp, "updated_at": stamp, "change_seq": i + 1
+            })
+    # Real DB jaisa → users ke notes interleaved (id order me mixed)
+    rng.shuffle(rows)
+    with bind.begin() as conn:
+        conn.execute(insert(Note), rows)
+
+    def list_ms():
+        with bind.connect() as conn:
+            query = select(Note.id, Note.title, Note.content, Note.updated_at).where(Note.user_id == 1)
+            conn.execute(query).all()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                count = len(conn.execute(query).all())
+            return (time.perf_counter() - started) * 1000 / repeat, count
+
+    def vacuum():
+        with bind.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+    vacuum()
+    before_sizes = table_sizes(bind)
+    before_ms, before_count = list_ms()
+
+    started = time.perf_counter()
+    moved = archive_old_notes(bind, log=lambda msg: None)
+    archive_seconds = time.perf_counter() - started
+
+    vacuum()
+    after_sizes = table_sizes(bind)
+    after_ms, after_count = list_ms()
+
+    mb = 1024 * 1024
+    print(f"{users} users x {notes} notes, {old_pct}% older than {NOTE_ARCHIVE_DAYS} days")
+    print(f"archived {moved} notes in {archive_seconds:.1f}s")
+    print(f"{'':<14}{'notes table':>12}{'notes idx':>12}{'archive':>12}{'list 1 user':>14}")
+    for label, sizes, ms, count in (("before", before_sizes, before_ms, before_count),
+                                    ("after", after_sizes, after_ms, after_count)):
+        print(f"{label:<14}{sizes['notes'][0] / mb:>10.1f}MB{sizes['notes'][1] / mb:>10.1f}MB"
+              f"{sum(sizes['notes_archive']) / mb:>10.1f}MB{ms:>9.2f} ms ({count} notes)")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="purane notes cold tier me")
+    run.add_argument("--days", type=int, default=NOTE_ARCHIVE_DAYS)
+    run.add_argument("--batch-size", type=int, default=NOTE_ARCHIVE_BATCH)
+
+    sub.add_parser("sizes", help="notes / notes_archive table + index size")
+
+    bench = sub.add_parser("bench", help="archive se pehle / baad size + list latency")
+    bench.add_argument("--users", type=int, default=20)
+    bench.add_argument("--notes", type=int, default=5000)
+    bench.add_argument("--old-pct", type=int, default=80)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.users, args.notes, args.old_pct)
+        return
+
+    from .sharding import shard_engines
+
+    for shard_id, bind in enumerate(shard_engines):
+        print(f"shard {shard_id}:")
+        if args.command == "run":
+            archive_old_notes(bind, args.days, args.batch_size)
+        else:
+            for table, (data, index) in table_sizes(bind).items():
+                print(f"  {table:<14} table {data / 1024 / 1024:>8.1f} MB  "
+                      f"indexes {index / 1024 / 1024:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+
+# Attachment metadata + per-user storage accounting
+#
+# Bytes blob store (app/blobstore.py) me jaate hai; yaha sirf DB rows:
+#   attachments        → file metadata
+#   attachment_chunks  → file ke chunks (order + offset)
+#   user_storage       → user ka total attachment size / count
+#
+# user_storage kabhi SUM() se nahi banta → attachment insert / delete ke
+# same transaction me +size / -size (incremental)
+
+
+import os
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import Attachment, AttachmentChunk, UserStorage
+
+
+#                    ATTACHMENT CONFIG
+
+# Ek attachment ka max size (bytes)
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+
+#                    STORAGE ACCOUNTING
+
+
+def ensure_storage_row(bind, user_id):
+    """
+    User ka user_storage row (alag short transaction me)
+    Dusra worker pehle bana de → IntegrityError ignore
+    """
+    with bind.connect() as conn:
+        exists = conn.execute(
+            select(UserStorage.user_id).where(UserStorage.user_id == user_id)
+        ).first()
+    if exists:
+        return
+
+    try:
+        with bind.begin() as conn:
+            conn.execute(
+                UserStorage.__table__.insert().values(
+                    user_id=user_id, bytes_used=0, attachment_count=0
+                )
+            )
+    except IntegrityError:
+        pass
+
+
+def add_usage(db, user_id, size_delta, count_delta):
+    db.execute(
+        update(UserStorage)
+        .where(UserStorage.user_id == user_id)
+        .values(
+            bytes_used=UserStorage.bytes_used + size_delta,
+            attachment_count=UserStorage.attachment_count + count_delta
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def get_usage(db, user_id) -> dict:
+    row = db.execute(
+        select(UserStorage.bytes_used, UserStorage.attachment_count)
+        .where(UserStorage.user_id == user_id)
+    ).first()
+    return {
+        "bytes_used": row.bytes_used if row else 0,
+        "attachment_count": row.attachment_count if row else 0
+    }
+
+
+#                    WRITE / DELETE
+
+
+def save_attachment(db, user_id, note_id, filename, content_type, size, sha256, chunks):
+    """
+    chunks → (chunk_hash, offset, size) file order me (blob store me likhe ja chuke)
+    Attachment + chunks + usage ek transaction me
+    """
+    from .sharding import shard_router
+
+    ensure_storage_row(db.get_bind(), user_id)
+
+    attachment = Attachment(
+        note_id=note_id,
+        user_id=user_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        sha256=sha256
+    )
+    if shard_router.enabled:
+        attachment.id = shard_router.next_id(Attachment.__table__)
+    db.add(attachment)
+    db.flush()
+
+    rows = [
+        {
+            "attachment_id": attachment.id,
+            "user_id": user_id,
+            "seq": seq,
+            "chunk_hash": chunk_hash,
+            "offset": offset,
+            "size": chunk_size
+        }
+        for seq, (chunk_hash, offset, chunk_size) in enumerate(chunks)
+    ]
+    if shard_router.enabled:
+        for row in rows:
+            row["id"] = shard_router.next_id(AttachmentChunk.__table__)
+    if rows:
+        db.execute(insert(AttachmentChunk), rows)
+
+    add_usage(db, user_id, size, 1)
+    db.commit()
+    db.refresh(attachment)
+    return attachment
+
+
+def delete_attachments(db, user_id, *conditions) -> int:
+    """
+    User ke matching attachments (+ chunks rows) delete aur usage kam
+    Commit caller karta hai (note delete ke transaction me bhi chalta hai)
+    Chunk files GC job hatata hai
+    """
+    where = (Attachment.user_id == user_id, *conditions)
+
+    count, size = db.execute(
+        select(func.count(), func.coalesce(func.sum(Attachment.size), 0)).where(*where)
+    ).one()
+    if not count:
+        return 0
+
+    ids = select(Attachment.id).where(*where).scalar_subquery()
+    db.query(AttachmentChunk).filter(
+        AttachmentChunk.user_id == user_id,
+        AttachmentChunk.attachment_id.in_(ids)
+    ).delete(synchronize_session=False)
+    db.query(Attachment).filter(*where).delete(synchronize_session=False)
+
+    add_usage(db, user_id, -size, -count)
+    return count
@@ -1,8 +1,7 @@
 
-# CryptContext → password ko securely hash & verify karne ke liye
-# bcrypt industry-standard hashing algorithm hai
+# functools.lru_cache → heavy objects ko pehli zarurat par ek hi baar banane ke liye
 
-from passlib.context import CryptContext
+from functools import lru_cache
 
 # jose.jwt → JWT token generate & verify karne ke liye
 
@@ -21,6 +20,9 @@ import random
 
 import secrets
 
+# Crypto calls ke tracing spans (TRACING_ENABLED=0 → koi wrapper nahi)
+from .tracing import traced
+
 #                    JWT CONFIG
 
 
@@ -40,32 +42,41 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # CryptContext object
 # bcrypt → slow & secure (brute-force se protection)
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto"
-)
+# passlib (aur bcrypt backend) import mehenga hai → module import par nahi,
+# pehli hash / verify call par load hota hai
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto"
+    )
 
 #                 PASSWORD FUNCTIONS
 
 
+@traced("auth.bcrypt_hash")
 def hash_password(password: str) -> str:
     """
     Plain password ko encrypted (hashed) password me convert karta hai
     Register / Reset / Change password me use hota hai
     """
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
+@traced("auth.bcrypt_verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Login ke time user ka password verify karta hai
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 #                 JWT TOKEN FUNCTION
 
 
+@traced("auth.jwt_encode")
 def create_access_token(data: dict) -> str:
     """
     JWT access token generate karta hai
@@ -0,0 +1,303 @@
+
+# Content-addressed blob store (local filesystem)
+#
+# Attachment bytes chunks me store hote hain; har chunk ka path uske
+# sha256 se banta hai → same chunk (same file) kitni bhi baar upload ho,
+# disk par ek hi copy. Kaunsi file me kaunse chunks hai → attachment_chunks table.
+#
+#   <BLOB_STORE_PATH>/ab/cd/abcd...   (sha256 hex)
+#
+# Chunk delete upload / note delete ke waqt nahi hota (doosri file same
+# chunk use kar rahi ho sakti hai). GC job saare shards me live chunks dekh
+# ke baaki files hatata hai:
+#
+#   python -m app.blobstore gc
+#   python -m app.blobstore bench --size-mb 1024     → 1 GB write / read throughput
+
+
+import argparse
+import hashlib
+import mmap
+import os
+import random
+import shutil
+import tempfile
+import time
+import zlib
+
+from sqlalchemy import select
+
+
+#                    BLOB STORE CONFIG
+
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "blobs")
+
+# Upload isi size ke chunks me kata jata hai (memory me max ek chunk)
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(4 * 1024 * 1024)))
+
+# Download par ek baar me kitne bytes bheje jaate hai
+BLOB_READ_SIZE = int(os.getenv("BLOB_READ_SIZE", str(256 * 1024)))
+
+# Chunk likhne ke baad fsync (crash ke baad bhi file poori rahe)
+BLOB_FSYNC = os.getenv("BLOB_FSYNC", "1") == "1"
+
+# Itne naye chunks GC nahi hote (chal rahe uploads abhi DB me nahi pahunche)
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+
+#                    BLOB STORE
+
+
+class BlobStore:
+    """
+    put() → chunk ka sha256 (pehle se hai to sirf mtime touch)
+    read() → mmap ke memoryview slices (Python me copy nahi banti)
+    """
+
+    def __init__(self, root=BLOB_STORE_PATH, fsync=BLOB_FSYNC, read_size=BLOB_READ_SIZE):
+        self.root = root
+        self.fsync = fsync
+        self.read_size = read_size
+
+    def path(self, chunk_hash: str) -> str:
+        return os.path.join(self.root, chunk_hash[:2], chunk_hash[2:4], chunk_hash)
+
+    def put(self, data: bytes) -> str:
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(chunk_hash)
+
+        if os.path.exists(path):
+            # Dedupe → mtime touch taaki GC grace period me na hataye
+            # (beech me GC ne rename kar diya → FileNotFoundError → nayi copy likho)
+            try:
+                os.utime(path)
+                return chunk_hash
+            except FileNotFoundError:
+                pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Temp file + rename → aadhi likhi file kabhi is path par nahi dikhti
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        return chunk_hash
+
+    def read(self, chunk_hash: str, start: int, end: int):
+        """
+        Chunk ke [start, end] (inclusive) bytes → read_size ke memoryview pieces
+
+        uvicorn ASGI me sendfile / zerocopy extension nahi hai, isliye mmap:
+        bytes page cache se seedha socket write tak jaate hai, beech me
+        Python bytes object nahi banta. mmap explicitly close nahi hota
+        (server ke paas abhi view ho sakta hai) → GC band karta hai
+        """
+        with open(self.path(chunk_hash), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        view = memoryview(mapped)
+        for position in range(start, end + 1, self.read_size):
+            yield view[position:min(position + self.read_size, end + 1)]
+
+    def iter_range(self, chunks, start: int, end: int):
+        """
+        chunks → (chunk_hash, offset, size) file order me
+        File ke [start, end] bytes stream karta hai
+        """
+        for chunk_hash, offset, size in chunks:
+            if offset + size <= start or offset > end:
+                continue
+            yield from self.read(
+                chunk_hash,
+                max(start - offset, 0),
+                min(end - offset, size - 1)
+            )
+
+    def walk(self):
+        """
+        Store ke saare chunks → (chunk_hash, path, mtime)
+        """
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(directory, name)
+                yield name, path, os.stat(path).st_mtime
+
+    def delete(self, chunk_hash: str, cutoff=None) -> int:
+        """
+        Chunk hatata hai → freed bytes (skip hua to 0)
+
+        cutoff diya → pehle rename (ab put() is path ko nahi dekhega, nayi
+        copy likhega), phir mtime dobara check: rename se pehle kisi upload
+        ne dedupe karke touch kiya tha (GC ki DB query ke baad commit hoga)
+        → wapas rakh do
+        """
+        path = self.path(chunk_hash)
+        doomed = os.path.join(os.path.dirname(path), f".tmp-gc-{chunk_hash}")
+        try:
+            os.rename(path, doomed)
+        except FileNotFoundError:
+            return 0
+
+        stat = os.stat(doomed)
+        if cutoff is not None and stat.st_mtime >= cutoff:
+            # Content-addressed → beech me put() ne nayi copy likhi ho to bhi same bytes
+            os.replace(doomed, path)
+            return 0
+        os.unlink(doomed)
+        return stat.st_size
+
+
+blob_store = BlobStore()
+
+
+#                    GARBAGE COLLECTION
+
+
+def collect_garbage(store=blob_store, grace_seconds=BLOB_GC_GRACE_SECONDS,
+                    batch_size=1000, log=print):
+    """
+    Mark & sweep → jo chunk kisi bhi shard ki attachment_chunks me nahi hai
+    (aur grace period se purana hai) woh delete
+    """
+    from .models import AttachmentChunk
+    from .sharding import shard_engines
+
+    cutoff = time.time() - grace_seconds
+    checked = deleted = freed = 0
+
+    def sweep(batch):
+        nonlocal deleted, freed
+        live = set()
+        for bind in shard_engines:
+            with bind.connect() as conn:
+                live.update(conn.execute(
+                    select(AttachmentChunk.chunk_hash)
+                    .where(AttachmentChunk.chunk_hash.in_(list(batch)))
+                    .distinct()
+                ).scalars())
+
+        for chunk_hash in batch:
+            if chunk_hash not in live:
+                size = store.delete(chunk_hash, cutoff)
+                if size:
+                    freed += size
+                    deleted += 1
+
+    batch = {}
+    for chunk_hash, path, mtime in store.walk():
+        checked += 1
+        if mtime >= cutoff:
+            continue
+        batch[chunk_hash] = path
+        if len(batch) >= batch_size:
+            sweep(batch)
+            batch = {}
+    if batch:
+        sweep(batch)
+
+    log(f"checked {checked} chunks, deleted {deleted} ({freed / 1024 / 1024:.1f} MB freed)")
+    return deleted
+
+
+#                    BENCHMARK
+
+
+def benchmark(size_mb: int, chunk_size: int, root=None, ranges=1000):
+    """
+    `size_mb` ki file store me likh ke (chunking + sha256 + fsync) aur padh ke
+    throughput (MB/s) print karta hai; dobara same file → dedupe path
+    """
+    root = root or tempfile.mkdtemp(prefix="blobbench-")
+    store = BlobStore(root)
+    total = size_mb * 1024 * 1024
+    count = (total + chunk_size - 1) // chunk_size
+
+    # Har chunk alag (pehle 8 bytes counter) → dedupe na ho
+    base = bytearray(os.urandom(chunk_size))
+
+    def chunks():
+        for i in range(count):
+            base[:8] = i.to_bytes(8, "little")
+            yield bytes(base[:min(chunk_size, total - i * chunk_size)])
+
+    try:
+        def upload():
+            file_hash = hashlib.sha256()
+            layout = []
+            offset = 0
+            started = time.perf_counter()
+            for data in chunks():
+                file_hash.update(data)
+                layout.append((store.put(data), offset, len(data)))
+                offset += len(data)
+            return layout, time.perf_counter() - started
+
+        layout, write_seconds = upload()
+        _, dedupe_seconds = upload()
+
+        # crc32 → har byte sach me padha jaye (sirf memoryview length nahi)
+        started = time.perf_counter()
+        read = checksum = 0
+        for piece in store.iter_range(layout, 0, total - 1):
+            checksum = zlib.crc32(piece, checksum)
+            read += len(piece)
+        read_seconds = time.perf_counter() - started
+        assert read == total
+
+        rng = random.Random(1)
+        started = time.perf_counter()
+        for _ in range(ranges):
+            start = rng.randrange(total - 65536)
+            for piece in store.iter_range(layout, start, start + 65535):
+                zlib.crc32(piece)
+        range_ms = (time.perf_counter() - started) * 1000 / ranges
+
+        print(f"{size_mb} MB file, {count} chunks x {chunk_size // 1024} KB (store: {root})")
+        print(f"upload (sha256 + write + fsync): {size_mb / write_seconds:>8.0f} MB/s")
+        print(f"re-upload (dedupe)             : {size_mb / dedupe_seconds:>8.0f} MB/s")
+        print(f"download (mmap + crc32, full)  : {size_mb / read_seconds:>8.0f} MB/s")
+        print(f"range read (64 KB, random)     : {range_ms:>8.3f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.blobstore")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gc = sub.add_parser("gc", help="unreferenced chunks delete")
+    gc.add_argument("--grace-seconds", type=int, default=BLOB_GC_GRACE_SECONDS)
+
+    bench = sub.add_parser("bench", help="write / read throughput")
+    bench.add_argument("--size-mb", type=int, default=1024)
+    bench.add_argument("--chunk-size", type=int, default=BLOB_CHUNK_SIZE)
+    bench.add_argument("--path", help="benchmark store directory (default: temp dir)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        collect_garbage(grace_seconds=args.grace_seconds)
+    elif args.command == "bench":
+        benchmark(args.size_mb, args.chunk_size, args.path)
+
+
+if __name__ == "__main__":
+    main()
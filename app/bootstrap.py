@@ -0,0 +1,353 @@
+
+# Database schema bootstrap / migration command
+#
+# Pehle main.py import hote hi create_all() chalata tha → har worker boot,
+# reload aur test import par DB connection + saari tables reflect hoti thi.
+# Ab schema sirf is explicit command se banta / upgrade hota hai:
+#
+#   python -m app.bootstrap migrate               → tables create + version stamp
+#   python -m app.bootstrap check                 → DB ka schema version verify
+#   python -m app.bootstrap importtime            → app import time report
+#   python -m app.bootstrap importtime --budget-ms 800
+
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from sqlalchemy import func, inspect, select, text
+
+from .database import engine
+from .models import (
+    Base, EmailOTP, Note, NoteRevision, NoteSeq, SchemaVersion, SCHEMA_VERSION, User, UserKey
+)
+
+
+#                 MIGRATION STEPS
+
+# (version, description, fn(connection)) → version order me
+# Sirf un tables ke ALTER yaha aate hain jo pehle se exist karti thi;
+# bilkul nayi tables create_all() khud bana deta hai
+# Shard DBs par bhi yahi steps chalte hain → jo table waha nahi hai use skip karo
+
+
+def _index_notes_user_id(conn):
+    # MySQL FK ke saath index pehle se bana deta hai; SQLite nahi
+    indexes = inspect(conn).get_indexes("notes")
+    if any(ix["column_names"] == ["user_id"] for ix in indexes):
+        return
+    for index in Note.__table__.indexes:
+        if index.columns.keys() == ["user_id"]:
+            index.create(conn)
+
+
+def _add_column(conn, column):
+    """
+    Model ke column ko existing table me ALTER TABLE ... ADD COLUMN se jodta hai
+    Table nahi hai (shard) ya column pehle se hai → kuch nahi
+    """
+    table_name = column.table.name
+    insp = inspect(conn)
+    if not insp.has_table(table_name):
+        return
+    if column.name in {c["name"] for c in insp.get_columns(table_name)}:
+        return
+
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {column.name} " \
+          f"{column.type.compile(dialect=conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def _widen_column(conn, column):
+    """
+    Existing column ka type model ke type par (VARCHAR badhana)
+    SQLite length enforce nahi karta → skip
+    """
+    table_name = column.table.name
+    if conn.dialect.name == "sqlite" or not inspect(conn).has_table(table_name):
+        return
+
+    column_type = column.type.compile(dialect=conn.dialect)
+    null = "NULL" if column.nullable else "NOT NULL"
+    if conn.dialect.name == "mysql":
+        conn.execute(text(f"ALTER TABLE {table_name} MODIFY {column.name} {column_type} {null}"))
+    else:
+        conn.execute(text(f"ALTER TABLE {table_name} ALTER COLUMN {column.name} TYPE {column_type}"))
+
+
+def _encryption_columns(conn):
+    # Encrypted title (base64 ciphertext) 200 chars se lamba hota hai
+    _widen_column(conn, Note.__table__.c.title)
+    _widen_column(conn, NoteRevision.__table__.c.title)
+
+
+def _delta_sync_columns(conn):
+    if not inspect(conn).has_table("notes"):
+        return
+
+    notes = Note.__table__
+    _add_column(conn, notes.c.updated_at)
+    _add_column(conn, notes.c.change_seq)
+
+    # Purane notes → change_seq = id (per user monotonic), counter = max
+    conn.execute(notes.update().values(change_seq=notes.c.id, updated_at=notes.c.created_at))
+    for index in notes.indexes:
+        if index.name == "ix_notes_user_change_seq":
+            index.create(conn)
+
+    NoteSeq.__table__.create(bind=conn, checkfirst=True)
+    conn.execute(
+        NoteSeq.__table__.insert().from_select(
+            ["user_id", "last_seq"],
+            select(notes.c.user_id, func.max(notes.c.change_seq)).group_by(notes.c.user_id)
+        )
+    )
+
+
+def _folder_columns(conn):
+    if not inspect(conn).has_table("notes"):
+        return
+
+    _add_column(conn, Note.__table__.c.folder_id)
+    for index in Note.__table__.indexes:
+        if index.name == "ix_notes_user_folder":
+            index.create(conn)
+
+
+def _cascade_foreign_key(conn, column):
+    """
+    users.id wale FK ko ON DELETE CASCADE par (drop + same naam se dobara add)
+    SQLite me constraint ALTER nahi hota (table rebuild chahiye) → skip;
+    waha purge job ye rows khud hatata hai
+    """
+    table_name = column.table.name
+    insp = inspect(conn)
+    if conn.dialect.name == "sqlite" or not insp.has_table(table_name):
+        return
+
+    for fk in insp.get_foreign_keys(table_name):
+        if fk["constrained_columns"] != [column.name] or fk["referred_table"] != "users":
+            continue
+        if (fk.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+            return
+
+        drop = "DROP FOREIGN KEY" if conn.dialect.name == "mysql" else "DROP CONSTRAINT"
+        conn.execute(text(f"ALTER TABLE {table_name} {drop} {fk['name']}"))
+        conn.execute(text(
+            f"ALTER TABLE {table_name} ADD CONSTRAINT {fk['name']} "
+            f"FOREIGN KEY ({column.name}) REFERENCES users (id) ON DELETE CASCADE"
+        ))
+
+
+def _account_deletion_columns(conn):
+    _add_column(conn, User.__table__.c.deleted_at)
+    _cascade_foreign_key(conn, Note.__table__.c.user_id)
+    _cascade_foreign_key(conn, EmailOTP.__table__.c.user_id)
+    _cascade_foreign_key(conn, UserKey.__table__.c.user_id)
+
+
+MIGRATIONS = [
+    (2, "notes.user_id index + shard routing tables", _index_notes_user_id),
+    (3, "notes.version (optimistic concurrency)",
+     lambda conn: _add_column(conn, Note.__table__.c.version)),
+    (4, "notes.updated_at / change_seq + tombstones (delta sync)", _delta_sync_columns),
+    (5, "change_events (multi-worker change feed)", lambda conn: None),
+    (6, "note_revisions (history)", lambda conn: None),
+    (7, "user_keys + wider title columns (encryption)", _encryption_columns),
+    (8, "attachments / attachment_chunks / user_storage", lambda conn: None),
+    (9, "idempotency_keys", lambda conn: None),
+    (10, "notes.folder_id + folders / tags / note_tags", _folder_columns),
+    (11, "user_stats / otp_send_counts (usage counters + quotas)", lambda conn: None),
+    (12, "users.deleted_at + ON DELETE CASCADE FKs + account_deletions", _account_deletion_columns),
+    (13, "notes_archive (cold tier)", lambda conn: None),
+]
+
+
+#                 VERSION HELPERS
+
+
+def get_schema_version(conn):
+    """
+    DB me applied latest schema version return karta hai
+    schema_version table hi nahi hai → None
+    """
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return None
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+
+
+def _stamp(conn, version: int, description: str):
+    conn.execute(
+        SchemaVersion.__table__.insert().values(
+            version=version,
+            description=description
+        )
+    )
+
+
+def migrate(bind=engine, metadata=Base.metadata) -> int:
+    """
+    Schema ko latest SCHEMA_VERSION tak laata hai
+
+    - Fresh DB → create_all() + latest version stamp
+    - Purana DB (tables hai, version table nahi) → version 1 maan ke
+      baaki migration steps apply
+
+    metadata → shard DB ke liye sharding.shard_metadata()
+    """
+    with bind.begin() as conn:
+        version = get_schema_version(conn)
+
+        if version is None:
+            if not inspect(conn).has_table("notes"):
+                metadata.create_all(bind=conn)
+                _stamp(conn, SCHEMA_VERSION, "initial schema")
+                return SCHEMA_VERSION
+
+            # create_all() wala purana deployment → baseline version 1
+            SchemaVersion.__table__.create(bind=conn)
+            _stamp(conn, 1, "baseline (pre-bootstrap schema)")
+            version = 1
+
+        for step_version, description, step in MIGRATIONS:
+            if step_version > version:
+                step(conn)
+                _stamp(conn, step_version, description)
+                version = step_version
+
+        # Nayi tables (jinke liye ALTER step nahi hai) bana do
+        metadata.create_all(bind=conn)
+
+    return version
+
+
+def check_schema(bind=engine):
+    """
+    Fast startup check → sirf MAX(version) ki ek query
+    Version match nahi hua → RuntimeError (worker start hi nahi hoga)
+    """
+    with bind.connect() as conn:
+        try:
+            version = conn.execute(
+                select(func.max(SchemaVersion.version))
+            ).scalar()
+        except Exception:
+            version = None
+
+    if version != SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} hai, app ko "
+            f"{SCHEMA_VERSION} chahiye → `python -m app.bootstrap migrate` chalao"
+        )
+
+    return version
+
+
+#                 IMPORT TIME REPORT
+
+# Cold start budget (milliseconds) → autoscaled workers jaldi ready hon
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+# "import time:  self [us] | cumulative | imported package" lines
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_time_report(module: str = "app.main", top: int = 15,
+                       budget_ms: int = STARTUP_BUDGET_MS) -> bool:
+    """
+    Naye interpreter me `python -X importtime` se module import karta hai
+    aur sabse mehenge top-level imports + total cold start print karta hai
+
+    Budget ke andar → True, warna False
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    if result.returncode != 0:
+        # importtime lines skip → sirf traceback dikhao
+        print("\n".join(
+            line for line in result.stderr.splitlines()
+            if not line.startswith("import time:")
+        ))
+        raise RuntimeError(f"{module} import fail hua")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        # indent 1 → top-level import (jo seedha `import module` ne kiya)
+        rows.append((int(cumulative_us), int(self_us), len(indent), name))
+
+    total_ms = sum(r[0] for r in rows if r[2] == 1) / 1000
+
+    print(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+    for cumulative_us, self_us, _, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    print()
+    print(f"import {module}: {total_ms:.1f} ms (process wall time {wall_ms:.1f} ms)")
+    print(f"budget: {budget_ms} ms")
+
+    return wall_ms <= budget_ms
+
+
+#                 CLI
+
+
+def _for_each_shard(fn):
+    """Primary ke alawa har shard DB par fn(shard_id, bind, metadata)"""
+    from .sharding import shard_engines, shard_metadata
+
+    metadata = shard_metadata()
+    for shard_id, bind in enumerate(shard_engines):
+        if bind is not engine:
+            fn(shard_id, bind, metadata)
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.bootstrap")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="tables create / upgrade karo")
+    sub.add_parser("check", help="schema version verify karo")
+
+    report = sub.add_parser("importtime", help="import time report")
+    report.add_argument("--module", default="app.main")
+    report.add_argument("--top", type=int, default=15)
+    report.add_argument("--budget-ms", type=int, default=STARTUP_BUDGET_MS)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        print(f"Schema version: {migrate()}")
+        _for_each_shard(lambda shard_id, bind, metadata: print(
+            f"Shard {shard_id} schema version: {migrate(bind, metadata)}"
+        ))
+    elif args.command == "check":
+        print(f"Schema version OK: {check_schema()}")
+        _for_each_shard(lambda shard_id, bind, metadata: print(
+            f"Shard {shard_id} schema version OK: {check_schema(bind)}"
+        ))
+    elif args.command == "importtime":
+        if not import_time_report(args.module, args.top, args.budget_ms):
+            print("Cold start budget se zyada hai")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
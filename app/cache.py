@@ -0,0 +1,826 @@
+
+# Shared cache (principals, note-list versions, rate limits)
+#
+# `uvicorn --workers N` → har process ka apna state; ek worker ka cache baaki
+# workers ko nahi dikhta aur per-worker rate limit asal me N × limit hota hai.
+# Do tiers:
+#
+#   L1 → per-worker LRU (dict lookup, koi IO nahi), entries max CACHE_LOCAL_TTL
+#   L2 → CACHE_BACKEND ke hisaab se (saare workers share karte hai):
+#          local → L2 nahi (single worker / dev); principal / list ETag
+#                  caching band (invalidation doosre workers tak nahi jaata)
+#          shm   → ek host ke workers: mmap file (/dev/shm) me fixed-slot hash
+#                  table, fcntl byte-range locks
+#          redis → Redis protocol (RESP) server; real Redis ya
+#                  `python -m app.cache serve` wala local stand-in
+#
+# Invalidation: set() / delete() apne L1 ke saath baaki workers ke L1 ko bhi
+# message bhejte hai → shm: shared invalidation log (har get par ek counter
+# check), redis: PUBLISH / SUBSCRIBE thread. Message miss ho jaye to bhi L1
+# entry CACHE_LOCAL_TTL ke baad khud expire.
+#
+# Values JSON-serializable hone chahiye (dict / list / str / int).
+#
+#   python -m app.cache serve --port 6380     # Redis-protocol stand-in
+#   python -m app.cache bench
+
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+#                    CACHE CONFIG
+
+# local | shm | redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+
+# L1 (per worker) entries aur unki max age (seconds)
+CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "10000"))
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "30"))
+
+# shm backend: file (tmpfs par ho to RAM me), slots, har slot ke bytes
+CACHE_SHM_PATH = os.getenv(
+    "CACHE_SHM_PATH",
+    "/dev/shm/secure-notes-cache" if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "secure-notes-cache")
+)
+CACHE_SHM_SLOTS = int(os.getenv("CACHE_SHM_SLOTS", "65536"))
+CACHE_SHM_SLOT_SIZE = int(os.getenv("CACHE_SHM_SLOT_SIZE", "512"))
+
+# redis backend
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+CACHE_CHANNEL = os.getenv("CACHE_CHANNEL", "secure-notes:invalidate")
+
+# Keys ka prefix (ek Redis / shm file kai apps share kare)
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "sn:")
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _loads(data: bytes):
+    return json.loads(data)
+
+
+#                    L1: PER-WORKER LRU
+
+
+class LocalLRU:
+    """
+    key → (expires_at monotonic, value); bounded LRU, thread safe
+    """
+
+    def __init__(self, size=CACHE_LOCAL_SIZE, ttl=CACHE_LOCAL_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl=None) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def incr(self, key, ttl) -> int:
+        # Single worker counter (rate limit) → TTL window pehle increment se
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[0] <= now:
+                entry = (now + ttl, 0)
+            entry = (entry[0], entry[1] + 1)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            return entry[1]
+
+
+#                    L2: SHARED MEMORY (mmap)
+
+
+class ShmStore:
+    """
+    Ek host ke saare workers ke liye mmap file:
+
+      header (4 KiB) | invalidation log (LOG_ENTRIES × 128 B) | slots
+
+    Slot: hash(8) expires_ms(8) key_len(2) val_len(4) key val
+    Key ka hash ek bucket (8 slots) chunta hai; bucket bhara ho to sabse pehle
+    expire hone wala slot overwrite. Har bucket ek fcntl byte-range lock stripe
+    se guard (processes ke beech) + process ke threads ke liye threading.Lock
+    """
+
+    MAGIC = b"SNCACHE1"
+    HEADER = 4096
+    LOG_ENTRIES = 1024
+    LOG_ENTRY = 128
+    BUCKET = 8
+    STRIPES = 256
+    SLOT_HEAD = struct.Struct("<QqHI")
+
+    def __init__(self, path=CACHE_SHM_PATH, slots=CACHE_SHM_SLOTS, slot_size=CACHE_SHM_SLOT_SIZE):
+        self.slots = max(self.BUCKET, slots - slots % self.BUCKET)
+        self.slot_size = slot_size
+        self.buckets = self.slots // self.BUCKET
+        self.log_offset = self.HEADER
+        self.slot_offset = self.HEADER + self.LOG_ENTRIES * self.LOG_ENTRY
+        size = self.slot_offset + self.slots * slot_size
+
+        self._thread_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._locked(self.STRIPES, self._init_file, path, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    def _init_file(self, path, size):
+        # Pehla worker file banata hai; baaki wahi layout (alag settings → error)
+        if os.fstat(self._fd).st_size == 0:
+            os.ftruncate(self._fd, size)
+            os.pwrite(self._fd, self.MAGIC + struct.pack("<IIQ", self.slots, self.slot_size, 0), 0)
+            return
+        head = os.pread(self._fd, 16, 0)
+        if head[:8] != self.MAGIC or struct.unpack("<II", head[8:16]) != (self.slots, self.slot_size):
+            raise RuntimeError(f"{path} kisi aur CACHE_SHM_SLOTS / SLOT_SIZE se bana hai")
+
+    def _locked(self, stripe, fn, *args):
+        # Header ke pehle bytes lock stripes hai (data wahan nahi likha jaata, sirf lock)
+        with self._thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self.HEADER - self.STRIPES - 1 + stripe)
+            try:
+                return fn(*args)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self.HEADER - self.STRIPES - 1 + stripe)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _find(self, bucket, key_hash, key):
+        # (slot offset jisme key hai | None, khaali / expired / sabse purana slot)
+        now = int(time.time() * 1000)
+        victim = None
+        victim_expires = None
+        for i in range(self.BUCKET):
+            offset = self.slot_offset + (bucket * self.BUCKET + i) * self.slot_size
+            slot_hash, expires, key_len, _ = self.SLOT_HEAD.unpack_from(self._map, offset)
+            live = slot_hash != 0 and expires > now
+            if live and slot_hash == key_hash:
+                start = offset + self.SLOT_HEAD.size
+                if self._map[start:start + key_len] == key:
+                    return offset, offset
+            if not live:
+                if victim_expires != -1:
+                    victim, victim_expires = offset, -1
+            elif victim_expires != -1 and (victim is None or expires < victim_expires):
+                victim, victim_expires = offset, expires
+        return None, victim
+
+    def _read(self, offset):
+        _, _, key_len, val_len = self.SLOT_HEAD.unpack_from(self._map, offset)
+        start = offset + self.SLOT_HEAD.size + key_len
+        return self._map[start:start + val_len]
+
+    def _write(self, offset, key_hash, key, data, ttl):
+        expires = int((time.time() + ttl) * 1000)
+        self.SLOT_HEAD.pack_into(self._map, offset, key_hash, expires, len(key), len(data))
+        start = offset + self.SLOT_HEAD.size
+        self._map[start:start + len(key) + len(data)] = key + data
+
+    def _fits(self, key, data):
+        return self.SLOT_HEAD.size + len(key) + len(data) <= self.slot_size
+
+    def _op(self, key: str, fn):
+        raw = key.encode()
+        key_hash = self._hash(raw)
+        bucket = key_hash % self.buckets
+        return self._locked(bucket % self.STRIPES, fn, bucket, key_hash, raw)
+
+    def get(self, key):
+        def run(bucket, key_hash, raw):
+            found, _ = self._find(bucket, key_hash, raw)
+            return None if found is None else bytes(self._read(found))
+        data = self._op(key, run)
+        return None if data is None else _loads(data)
+
+    def set(self, key, value, ttl, only_if_absent=False) -> bool:
+        data = _dumps(value)
+
+        def run(bucket, key_hash, raw):
+            if not self._fits(raw, data):
+                return False
+            found, victim = self._find(bucket, key_hash, raw)
+            if found is not None and only_if_absent:
+                return False
+            self._write(found or victim, key_hash, raw, data, ttl)
+            return True
+        return self._op(key, run)
+
+    def delete(self, key):
+        def run(bucket, key_hash, raw):
+            found, _ = self._find(bucket, key_hash, raw)
+            if found is not None:
+                self.SLOT_HEAD.pack_into(self._map, found, 0, 0, 0, 0)
+        self._op(key, run)
+
+    def incr(self, key, ttl) -> int:
+        def run(bucket, key_hash, raw):
+            found, victim = self._find(bucket, key_hash, raw)
+            if found is None:
+                self._write(victim, key_hash, raw, b"1", ttl)
+                return 1
+            value = int(self._read(found)) + 1
+            # TTL window pehle increment se → expiry wahi rehti hai
+            expires = self.SLOT_HEAD.unpack_from(self._map, found)[1]
+            self._write(found, key_hash, raw, str(value).encode(), max(0.001, expires / 1000 - time.time()))
+            return value
+        return self._op(key, run)
+
+    # Invalidation log → header ke bytes 16-24 me sequence, entries ring me
+
+    def log_seq(self) -> int:
+        return struct.unpack_from("<Q", self._map, 16)[0]
+
+    def publish(self, key: str):
+        raw = key.encode()[:self.LOG_ENTRY - 10]
+
+        def run():
+            seq = self.log_seq() + 1
+            offset = self.log_offset + (seq % self.LOG_ENTRIES) * self.LOG_ENTRY
+            struct.pack_into("<QH", self._map, offset, seq, len(raw))
+            self._map[offset + 10:offset + 10 + len(raw)] = raw
+            struct.pack_into("<Q", self._map, 16, seq)
+        self._locked(self.STRIPES, run)
+
+    def read_log(self, after: int):
+        """
+        after ke baad ke invalidated keys → (new seq, keys); None keys → log
+        overflow (reader bahut peeche) → poora L1 clear karo
+        """
+        def run():
+            seq = self.log_seq()
+            if seq - after > self.LOG_ENTRIES:
+                return seq, None
+            keys = []
+            for number in range(after + 1, seq + 1):
+                offset = self.log_offset + (number % self.LOG_ENTRIES) * self.LOG_ENTRY
+                _, length = struct.unpack_from("<QH", self._map, offset)
+                keys.append(bytes(self._map[offset + 10:offset + 10 + length]).decode())
+            return seq, keys
+        return self._locked(self.STRIPES, run)
+
+
+#                    L2: REDIS PROTOCOL
+
+
+class RespClient:
+    """
+    Minimal RESP client (Redis ya local stand-in); har thread ka apna connection
+    Connection toote to agli call ek baar reconnect karke retry
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL, timeout=2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        if self.password:
+            self._call(conn, "AUTH", self.password)
+        if self.db:
+            self._call(conn, "SELECT", self.db)
+        return conn
+
+    @staticmethod
+    def encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    @classmethod
+    def read_reply(cls, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("cache server ne connection band kiya")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [cls.read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"RESP reply samajh nahi aaya: {line!r}")
+
+    def _call(self, conn, *args):
+        conn[0].sendall(self.encode(*args))
+        return self.read_reply(conn[1])
+
+    def call(self, *args):
+        conn = getattr(self._local, "conn", None)
+        for attempt in (1, 2):
+            if conn is None:
+                conn = self._local.conn = self.connect()
+            try:
+                return self._call(conn, *args)
+            except (ConnectionError, OSError):
+                conn[0].close()
+                conn = self._local.conn = None
+                if attempt == 2:
+                    raise
+
+    def subscribe(self, channel, on_message):
+        """
+        Alag daemon thread: channel ke messages → on_message(str)
+        Connection toote to 1 s baad dobara subscribe (beech ke messages miss →
+        L1 TTL bound)
+        """
+        def run():
+            while True:
+                try:
+                    conn = self.connect()
+                    conn[0].settimeout(None)
+                    conn[0].sendall(self.encode("SUBSCRIBE", channel))
+                    while True:
+                        reply = self.read_reply(conn[1])
+                        if isinstance(reply, list) and reply and reply[0] == b"message":
+                            on_message(reply[2].decode())
+                except (ConnectionError, OSError):
+                    time.sleep(1)
+
+        threading.Thread(target=run, name="cache-invalidate", daemon=True).start()
+
+
+class RedisStore:
+    def __init__(self, client: RespClient):
+        self.client = client
+
+    def get(self, key):
+        data = self.client.call("GET", key)
+        return None if data is None else _loads(data)
+
+    def set(self, key, value, ttl, only_if_absent=False) -> bool:
+        args = ["SET", key, _dumps(value), "PX", max(1, int(ttl * 1000))]
+        if only_if_absent:
+            args.append("NX")
+        return self.client.call(*args) is not None
+
+    def delete(self, key):
+        self.client.call("DEL", key)
+
+    def incr(self, key, ttl) -> int:
+        # Window pehle increment se: NX se key + expiry, phir INCR (expiry same rehti hai)
+        self.client.call("SET", key, 0, "PX", max(1, int(ttl * 1000)), "NX")
+        return self.client.call("INCR", key)
+
+    def publish(self, key):
+        self.client.call("PUBLISH", CACHE_CHANNEL, key)
+
+
+#                    TIERED CACHE
+
+
+class TieredCache:
+    """
+    L1 (LocalLRU) + optional L2 (ShmStore / RedisStore)
+
+      get    → L1, miss par L2 (mila to L1 me bhi); get_shared → sirf L2
+      add    → sirf key na ho to (DB se fill; authoritative value overwrite nahi hoti)
+      set    → L2 + apna L1, baaki workers ke L1 ko invalidation
+      delete → L2 + apna L1 + invalidation
+      incr   → rate limit counter (L2 ho to wahi, warna L1); count → padhna
+
+    L2 down / error → L1 se kaam chalta hai (cache kabhi request fail nahi karta)
+    """
+
+    def __init__(self, local: LocalLRU, shared=None):
+        self.local = local
+        self.shared = shared
+        self._log_seq = shared.log_seq() if isinstance(shared, ShmStore) else 0
+        self._subscribed = False
+
+    @property
+    def is_shared(self) -> bool:
+        """
+        L2 hai → set / delete sab workers tak pahunchte hai. Nahi (local) → sirf
+        is worker tak; jo cheez doosre workers par turant invalid honi chahiye
+        (principal, list ETag) woh local backend par cache mat karo
+        """
+        return self.shared is not None
+
+    def _key(self, key):
+        return CACHE_PREFIX + key
+
+    def _poll(self):
+        # shm: doosre workers ke set / delete → apne L1 se hatao (sirf counter badla ho to lock)
+        if isinstance(self.shared, ShmStore) and self.shared.log_seq() != self._log_seq:
+            self._log_seq, keys = self.shared.read_log(self._log_seq)
+            if keys is None:
+                self.local.clear()
+            else:
+                for key in keys:
+                    self.local.delete(key)
+
+    def _subscribe(self):
+        if isinstance(self.shared, RedisStore) and not self._subscribed:
+            self._subscribed = True
+            self.shared.client.subscribe(CACHE_CHANNEL, self.local.delete)
+
+    def _shared(self, method, *args, failed=None):
+        try:
+            self._subscribe()
+            return getattr(self.shared, method)(*args)
+        except (ConnectionError, OSError, RuntimeError) as e:
+            print(f"cache {method} failed: {e!r}")
+            return failed
+
+    def get(self, key):
+        key = self._key(key)
+        self._poll()
+        value = self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+
+        value = self._shared("get", key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def get_shared(self, key, failed=None):
+        """
+        L1 skip karke seedha L2 (jo value stale nahi chal sakti, jaise list
+        ETag token; invalidation message miss hua to bhi L1 ki purani copy nahi)
+        L2 unreachable → `failed` (miss → None, dono alag pehchaan sakte ho)
+        """
+        if self.shared is None:
+            return failed
+        return self._shared("get", self._key(key), failed=failed)
+
+    def add(self, key, value, ttl) -> bool:
+        key = self._key(key)
+        if self.shared is None:
+            return self.local.add(key, value, ttl)
+        added = self._shared("set", key, value, ttl, True)
+        if added:
+            self.local.set(key, value, ttl)
+        return bool(added)
+
+    def set(self, key, value, ttl):
+        key = self._key(key)
+        if self.shared is not None:
+            self._shared("set", key, value, ttl)
+            self._shared("publish", key)
+        self.local.set(key, value, ttl)
+
+    def delete(self, key):
+        key = self._key(key)
+        if self.shared is not None:
+            self._shared("delete", key)
+            self._shared("publish", key)
+        self.local.delete(key)
+
+    def incr(self, key, ttl) -> int:
+        key = self._key(key)
+        if self.shared is not None:
+            value = self._shared("incr", key, ttl)
+            if value is not None:
+                return value
+        return self.local.incr(key, ttl)
+
+    def count(self, key) -> int:
+        # incr wala counter; L1 me copy nahi (har worker turant sabka count dekhe)
+        key = self._key(key)
+        if self.shared is not None:
+            value = self._shared("get", key)
+            if value is not None:
+                return value
+        return self.local.get(key) or 0
+
+
+def create_cache(backend=CACHE_BACKEND) -> TieredCache:
+    local = LocalLRU()
+    if backend == "shm":
+        return TieredCache(local, ShmStore())
+    if backend == "redis":
+        return TieredCache(local, RedisStore(RespClient()))
+    return TieredCache(local)
+
+
+cache = create_cache()
+
+
+#                    RATE LIMITS
+
+
+def hit_limit(key: str, limit: int, window_seconds: float) -> bool:
+    """
+    key ka counter +1 (window pehle hit se) → limit paar → True
+    limit 0 → kabhi nahi
+    """
+    if not limit:
+        return False
+    return cache.incr(f"rate:{key}", window_seconds) > limit
+
+
+def over_limit(key: str, limit: int) -> bool:
+    """
+    Counter badhaye bina check (jaise login se pehle failures ginna)
+    """
+    if not limit:
+        return False
+    return cache.count(f"rate:{key}") >= limit
+
+
+def reset_limit(key: str):
+    cache.delete(f"rate:{key}")
+
+
+#                    LOCAL REDIS-PROTOCOL STAND-IN
+
+
+class StandInServer:
+    """
+    Dev / tests / single host ke liye chhota RESP server (asyncio, ek process):
+    PING, GET, SET [EX|PX] [NX], DEL, INCR, PEXPIRE, EXPIRE, TTL, PUBLISH,
+    SUBSCRIBE, DBSIZE, FLUSHALL, SELECT, AUTH (no-op). Persistence nahi
+    Real Redis aate hi CACHE_REDIS_URL badlo, code wahi
+    """
+
+    def __init__(self):
+        self.data = {}          # key → (value bytes, expires_at monotonic | None)
+        self.subscribers = {}   # channel → set(writer)
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _reply(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, bool):
+            return b":%d\r\n" % int(value)
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(StandInServer._reply(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(self, args, writer):
+        command = args[0].upper().decode()
+        if command == "PING":
+            return "PONG"
+        if command in ("SELECT", "AUTH"):
+            return "OK"
+        if command == "GET":
+            entry = self._get(args[1])
+            return None if entry is None else entry[0]
+        if command == "SET":
+            key, value = args[1], args[2]
+            options = [arg.upper() for arg in args[3:]]
+            expires = None
+            for name, scale in ((b"PX", 1000), (b"EX", 1)):
+                if name in options:
+                    expires = time.monotonic() + int(args[3 + options.index(name) + 1]) / scale
+            if b"NX" in options and self._get(key) is not None:
+                return None
+            self.data[key] = (value, expires)
+            return "OK"
+        if command == "DEL":
+            return sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+        if command == "INCR":
+            entry = self._get(args[1])
+            value = int(entry[0]) + 1 if entry else 1
+            self.data[args[1]] = (str(value).encode(), entry[1] if entry else None)
+            return value
+        if command in ("PEXPIRE", "EXPIRE"):
+            entry = self._get(args[1])
+            if entry is None:
+                return 0
+            scale = 1000 if command == "PEXPIRE" else 1
+            self.data[args[1]] = (entry[0], time.monotonic() + int(args[2]) / scale)
+            return 1
+        if command == "TTL":
+            entry = self._get(args[1])
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int(entry[1] - time.monotonic())
+        if command == "PUBLISH":
+            receivers = self.subscribers.get(args[1], set())
+            message = self._reply([b"message", args[1], args[2]])
+            for receiver in list(receivers):
+                receiver.write(message)
+            return len(receivers)
+        if command == "SUBSCRIBE":
+            replies = []
+            for channel in args[1:]:
+                self.subscribers.setdefault(channel, set()).add(writer)
+                replies.append(self._reply([b"subscribe", channel, 1]))
+            return b"".join(replies)
+        if command == "DBSIZE":
+            return len(self.data)
+        if command == "FLUSHALL":
+            self.data.clear()
+            return "OK"
+        raise ValueError(f"unknown command '{command}'")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.startswith(b"*"):
+                    args = line.split()      # inline command (redis-cli / telnet)
+                else:
+                    args = []
+                    for _ in range(int(line[1:-2])):
+                        length = int((await reader.readline())[1:-2])
+                        args.append((await reader.readexactly(length + 2))[:-2])
+                if not args:
+                    continue
+                try:
+                    result = self.execute(args, writer)
+                    writer.write(result if isinstance(result, bytes) and args[0].upper() == b"SUBSCRIBE"
+                                 else self._reply(result))
+                except (ValueError, IndexError) as e:
+                    writer.write(b"-ERR %s\r\n" % str(e).encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for receivers in self.subscribers.values():
+                receivers.discard(writer)
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+def start_stand_in(host="127.0.0.1", port=0) -> int:
+    """
+    Background thread me stand-in server (bench / tests) → port
+    """
+    started = threading.Event()
+    result = {}
+
+    def ready(bound):
+        result["port"] = bound
+        started.set()
+
+    threading.Thread(
+        target=lambda: asyncio.run(StandInServer().serve(host, port, ready)),
+        name="cache-stand-in", daemon=True
+    ).start()
+    started.wait(5)
+    return result["port"]
+
+
+#                    BENCHMARK
+
+
+def benchmark(operations: int = 20000):
+    """
+    Har tier ki get latency (hit) + do "workers" (do TieredCache instances,
+    same L2) ke beech invalidation kitni der me pahunchta hai
+    """
+    directory = tempfile.mkdtemp()
+    port = start_stand_in()
+
+    def timed(fn):
+        started = time.perf_counter()
+        for i in range(operations):
+            fn(i)
+        return (time.perf_counter() - started) * 1e6 / operations
+
+    value = {"id": 1, "name": "bench", "email": "bench@example.com", "created_at": "2025-01-01T00:00:00"}
+    backends = {
+        "L1 only (local)": lambda: TieredCache(LocalLRU()),
+        "shm (mmap)": lambda: TieredCache(LocalLRU(), ShmStore(os.path.join(directory, "shm"), 4096)),
+        "redis protocol": lambda: TieredCache(LocalLRU(), RedisStore(RespClient(f"redis://127.0.0.1:{port}/0"))),
+    }
+
+    print(f"{operations} ops per row (stand-in RESP server on 127.0.0.1:{port})")
+    print(f"{'backend':<18}{'L1 hit':>10}{'L2 hit':>10}{'set':>10}{'incr':>10}{'invalidate':>14}")
+    for name, make in backends.items():
+        first, second = make(), make()
+        first.set("user:1", value, 60)
+        l1 = timed(lambda i: first.get("user:1"))
+
+        if first.shared is not None:
+            def l2_get(i):
+                first.local.delete(CACHE_PREFIX + "user:1")
+                first.get("user:1")
+            l2 = f"{timed(l2_get):>8.1f}us"
+        else:
+            l2 = f"{'-':>10}"
+        set_us = timed(lambda i: first.set(f"k:{i % 500}", value, 60))
+        incr_us = timed(lambda i: first.incr("rate:bench", 60))
+
+        # Invalidation: second worker ke L1 me value, first delete kare → second kab miss karta hai
+        if first.shared is not None:
+            second.get("user:1")
+            started = time.perf_counter()
+            first.delete("user:1")
+            while second.get("user:1") is not None and time.perf_counter() - started < 5:
+                time.sleep(0.0005)
+            invalidate = f"{(time.perf_counter() - started) * 1000:>11.2f} ms"
+        else:
+            invalidate = f"{'-':>14}"
+        print(f"{name:<18}{l1:>8.2f}us{l2}{set_us:>8.1f}us{incr_us:>8.1f}us{invalidate}")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="local Redis-protocol stand-in server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=6379)
+
+    bench = sub.add_parser("bench", help="tier latencies + invalidation delay")
+    bench.add_argument("--operations", type=int, default=20000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"cache stand-in listening on {args.host}:{args.port}")
+        asyncio.run(StandInServer().serve(args.host, args.port))
+    else:
+        benchmark(args.operations)
+
+
+if __name__ == "__main__":
+    main()
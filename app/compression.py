@@ -0,0 +1,431 @@
+
+# Response compression (gzip / brotli / zstd)
+#
+# Client ke Accept-Encoding se encoding choose hoti hai (q-values ke saath;
+# barabar q par COMPRESSION_ENCODINGS ka order). brotli / zstandard package
+# install na ho to woh encoding skip → gzip (stdlib) hamesha available.
+# brotli / zstandard pehle encoder par import hote hai (startup par sirf
+# installed hai ya nahi check).
+#
+#   - COMPRESSION_MIN_SIZE se chhota response → as-is (header overhead > fayda)
+#   - Sirf text / JSON content types (attachments ke binary bytes nahi)
+#   - Range request / 206 / pehle se encoded response → as-is
+#   - Streaming response (SSE, /notes/{id}/content) → har chunk compress + flush,
+#     client ko data turant milta hai (poore response ka wait nahi)
+#
+#   python -m app.compression bench --notes 200 --size 2000 --mbps 10
+
+
+import argparse
+import importlib
+import importlib.util
+import os
+import random
+import time
+import zlib
+from functools import lru_cache
+
+from starlette.datastructures import Headers, MutableHeaders
+
+
+@lru_cache
+def _installed(module: str) -> bool:
+    # Optional package (brotli → "br", zstandard → "zstd"); import kiye bina check
+    return importlib.util.find_spec(module) is not None
+
+
+@lru_cache
+def _module(module: str):
+    # Pehle encoder / decoder par hi import
+    return importlib.import_module(module)
+
+
+#                    COMPRESSION CONFIG
+
+# 0 → middleware add hi nahi hota
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+
+# Isse chhote (bytes) responses compress nahi hote
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Server preference (client ke barabar q-values par)
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+
+# Levels → `python -m app.compression bench` dekh ke choose karo
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "4"))          # 1-9
+BROTLI_LEVEL = int(os.getenv("BROTLI_LEVEL", "4"))      # 0-11
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))          # 1-22
+
+# 0 → streaming responses (SSE, content stream) compress nahi hote
+COMPRESSION_STREAMING = os.getenv("COMPRESSION_STREAMING", "1") == "1"
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+)
+
+
+#                    ENCODERS
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._obj = _module("brotli").Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._zstd = _module("zstandard")
+        self._obj = self._zstd.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(self._zstd.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(self._zstd.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encoders():
+    """
+    encoding name → encoder class (sirf installed libraries)
+    """
+    encoders = {"gzip": _Gzip}
+    if _installed("brotli"):
+        encoders["br"] = _Brotli
+    if _installed("zstandard"):
+        encoders["zstd"] = _Zstd
+    return encoders
+
+
+def select_encoding(accept_encoding, preference):
+    """
+    Accept-Encoding header → sabse achhi supported encoding (ya None)
+    "gzip;q=0.5, br" → br;  "*" → preference ki pehli;  "gzip;q=0" → gzip nahi
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in preference:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+#                    MIDDLEWARE
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware (BaseHTTPMiddleware nahi → streaming responses
+    buffer nahi hote)
+
+    Pehla body message hi decide karta hai:
+      more_body=False → poora response ek saath, size threshold check
+      more_body=True  → streaming mode, har chunk compress + flush
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE,
+                 encodings=COMPRESSION_ENCODINGS, streaming=COMPRESSION_STREAMING,
+                 levels=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.streaming = streaming
+        self.levels = {"gzip": GZIP_LEVEL, "br": BROTLI_LEVEL, "zstd": ZSTD_LEVEL, **(levels or {})}
+
+        self.encoders = available_encoders()
+        self.preference = [
+            name.strip() for name in encodings.split(",")
+            if name.strip() in self.encoders
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = None
+        if "range" not in request_headers:
+            encoding = select_encoding(request_headers.get("accept-encoding"), self.preference)
+
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressedResponse(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponse:
+    """
+    Ek request ka send() wrapper (start message tab tak roka jaata hai jab
+    tak pehla body message na aa jaye)
+    """
+
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+
+        self.start = None
+        self.encoder = None      # None → passthrough
+        self.decided = False
+
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.wrapped_send)
+
+    def _compressible(self, headers):
+        if self.start["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        if "content-range" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _use_encoder(self, headers):
+        self.encoder = self.middleware.encoders[self.encoding](self.middleware.levels[self.encoding])
+        headers["Content-Encoding"] = self.encoding
+
+        # Compressed bytes alag hai → strong ETag weak (If-Match W/ samajhta hai)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        # Byte ranges uncompressed content ke hote hai
+        if "accept-ranges" in headers:
+            del headers["Accept-Ranges"]
+
+    async def wrapped_send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.decided:
+            if self.encoder is not None:
+                await self._send_stream_chunk(message)
+            else:
+                await self.send(message)
+            return
+
+        self.decided = True
+        headers = MutableHeaders(raw=self.start.setdefault("headers", []))
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        compressible = self._compressible(headers)
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+
+        if not compressible:
+            pass
+        elif not more_body:
+            # Poora response ek hi message me
+            if len(body) >= self.middleware.minimum_size:
+                self._use_encoder(headers)
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+                self.encoder = None
+                message = {**message, "body": body}
+        elif self.middleware.streaming:
+            length = headers.get("content-length")
+            if length is None or int(length) >= self.middleware.minimum_size:
+                self._use_encoder(headers)
+                del headers["Content-Length"]
+
+        await self.send(self.start)
+
+        if self.encoder is not None:
+            await self._send_stream_chunk(message)
+        else:
+            await self.send(message)
+
+    async def _send_stream_chunk(self, message):
+        body = self.encoder.compress(message.get("body", b""))
+        if message.get("more_body", False):
+            # Flush → ab tak ka data client tak (SSE event ruka nahi rehta)
+            body += self.encoder.flush()
+            if body:
+                await self.send({"type": "http.response.body", "body": body, "more_body": True})
+        else:
+            body += self.encoder.finish()
+            await self.send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+#                    BENCHMARK
+
+
+def _note_payload(notes, size, seed=1):
+    """
+    GET /notes jaisa JSON (NoteResponse list), text ek chhote vocabulary se
+    (lorem ipsum repeat jitna compressible nahi)
+    """
+    from datetime import datetime
+
+    from pydantic import TypeAdapter
+
+    from .schemas import NoteResponse
+
+    rng = random.Random(seed)
+    words = [
+        "meeting", "notes", "project", "deadline", "review", "todo", "client", "update",
+        "the", "and", "for", "with", "from", "this", "that", "will", "need", "next",
+        "week", "call", "design", "budget", "release", "bug", "fix", "deploy", "team",
+        "kal", "aaj", "karna", "hai", "baat", "phir", "sab", "check", "list",
+    ] + [f"item{i}" for i in range(200)]
+
+    def text(length):
+        out, total = [], 0
+        while total < length:
+            word = rng.choice(words)
+            out.append(word)
+            total += len(word) + 1
+        return " ".join(out)[:length]
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": i + 1, "title": text(40), "content": text(size), "created_at": now,
+            "version": rng.randint(1, 20), "updated_at": now, "change_seq": i + 1
+        }
+        for i in range(notes)
+    ]
+    adapter = TypeAdapter(list[NoteResponse])
+    return adapter.dump_json(adapter.validate_python(rows))
+
+
+def _decompressor(encoding):
+    if encoding == "gzip":
+        return lambda data: zlib.decompress(data, 31)
+    if encoding == "br":
+        return _module("brotli").decompress
+    return lambda data: _module("zstandard").ZstdDecompressor().decompressobj().decompress(data)
+
+
+def _run(encoding, level, payload, stream_chunk=None):
+    encoder = available_encoders()[encoding](level)
+    started = time.perf_counter()
+    if stream_chunk:
+        parts = [
+            encoder.compress(payload[i:i + stream_chunk]) + encoder.flush()
+            for i in range(0, len(payload), stream_chunk)
+        ]
+        compressed = b"".join(parts) + encoder.finish()
+    else:
+        compressed = encoder.compress(payload) + encoder.finish()
+    return compressed, time.perf_counter() - started
+
+
+def benchmark(notes, size, mbps, repeat=5, stream_chunk=4096):
+    """
+    Har encoding / level → ratio, compress + decompress time, aur `mbps`
+    link par total time (compress + transfer) → bandwidth vs CPU trade-off
+    """
+    payload = _note_payload(notes, size)
+    transfer = lambda nbytes: nbytes * 8 / (mbps * 1_000_000) * 1000
+
+    levels = {"gzip": (1, 4, 6, 9), "br": (1, 4, 6, 9, 11), "zstd": (1, 3, 6, 12, 19)}
+    encoders = available_encoders()
+    missing = [name for name in levels if name not in encoders]
+
+    print(f"{notes} notes x {size} chars → {len(payload) / 1024:.0f} KB JSON, {mbps} Mbps link")
+    if missing:
+        print(f"(not installed: {', '.join(missing)})")
+    print(f"{'encoding':>9} {'level':>5} {'size KB':>8} {'ratio':>6} {'comp ms':>8} "
+          f"{'MB/s':>6} {'decomp ms':>9} {'stream KB':>9} {'total ms':>9}")
+    print(f"{'identity':>9} {'-':>5} {len(payload) / 1024:>8.1f} {1:>6.2f} {0:>8.2f} "
+          f"{'-':>6} {0:>9.2f} {'-':>9} {transfer(len(payload)):>9.1f}")
+
+    for encoding, encoding_levels in levels.items():
+        if encoding not in encoders:
+            continue
+        decompress = _decompressor(encoding)
+        for level in encoding_levels:
+            compressed, seconds = min(
+                (_run(encoding, level, payload) for _ in range(repeat)),
+                key=lambda result: result[1]
+            )
+            streamed, _ = _run(encoding, level, payload, stream_chunk)
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                assert decompress(compressed) == payload
+            decomp_ms = (time.perf_counter() - started) * 1000 / repeat
+
+            comp_ms = seconds * 1000
+            print(f"{encoding:>9} {level:>5} {len(compressed) / 1024:>8.1f} "
+                  f"{len(payload) / len(compressed):>6.2f} {comp_ms:>8.2f} "
+                  f"{len(payload) / 1024 / 1024 / seconds:>6.0f} {decomp_ms:>9.2f} "
+                  f"{len(streamed) / 1024:>9.1f} {comp_ms + transfer(len(compressed)) + decomp_ms:>9.1f}")
+
+    print(f"stream KB → {stream_chunk // 1024} KB chunks, har chunk ke baad flush (streaming mode)")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.compression")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="encoding / level ka size vs CPU")
+    bench.add_argument("--notes", type=int, default=200)
+    bench.add_argument("--size", type=int, default=2000)
+    bench.add_argument("--mbps", type=float, default=10)
+    bench.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.notes, args.size, args.mbps, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@
 # status → HTTP status codes ke liye
 from fastapi import Depends, HTTPException, status
 
+import os
+from datetime import datetime
+from typing import Optional
+
 # JWT tools (token decode & error handling)
 
 # jwt → token decode karne ke liye
@@ -18,6 +22,9 @@ from jose import jwt, JWTError
 
 from sqlalchemy.orm import Session
 
+# OperationalError → replica down / connection fail
+from sqlalchemy.exc import OperationalError
+
 
 # OAuth2PasswordBearer
 # Authorization header se Bearer token nikalta hai
@@ -28,9 +35,11 @@ from fastapi.security import OAuth2PasswordBearer
 
 # Local project imports
 
-from .database import SessionLocal
+from .database import ReadSessionLocal, SessionLocal, engine, replica_router
 from .models import User
 from .auth import SECRET_KEY, ALGORITHM
+from .cache import cache
+from .tracing import span, traced
 
 
 # OAuth2 scheme configuration
@@ -39,6 +48,9 @@ from .auth import SECRET_KEY, ALGORITHM
 # token /login endpoint se milega
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Same scheme, lekin header na ho to error nahi (query token fallback ke liye)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+
 
 # DATABASE SESSION DEPENDENCY
 
@@ -53,11 +65,80 @@ def get_db():
     finally:
         db.close()
 
+# USER LOOKUP (READ REPLICA)
+
+def _load_user(user_id):
+    """
+    User ko replica se load karta hai (read-your-writes ke saath)
+    Replica fail hui → usko unhealthy mark karke primary se retry
+
+    Session close hone ke baad bhi User ke columns accessible rehte hain
+    """
+    bind = replica_router.engine_for_read(user_id)
+    try:
+        with SessionLocal(bind=bind) as db:
+            return db.get(User, user_id)
+    except OperationalError:
+        if bind is engine:
+            raise
+        replica_router.mark_unhealthy(bind)
+
+    with SessionLocal() as db:
+        return db.get(User, user_id)
+
+
+# PRINCIPAL CACHE
+
+# Har authenticated request par user row ka DB read → shared cache (app.cache)
+# se; sab workers ek hi entry dekhte hai. hashed_password cache nahi hota
+# Password badla → forget_principal; account delete → store_principal (deleted_at
+# ke saath write-through); dono sab workers ke L1 tak pahunchte hai
+# CACHE_BACKEND=local → cache nahi (DELETE /me doosre workers tak nahi pahunchta)
+PRINCIPAL_CACHE_SECONDS = float(os.getenv("PRINCIPAL_CACHE_SECONDS", "60"))
+
+PRINCIPAL_FIELDS = ("id", "name", "email", "created_at", "deleted_at")
+
+
+def _principal_key(user_id):
+    return f"principal:{user_id}"
+
+
+def _principal_data(user) -> dict:
+    data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    for field in ("created_at", "deleted_at"):
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+def _principal_user(data) -> User:
+    # Detached User (kisi session me nahi) → sirf columns padhne ke liye
+    values = dict(data)
+    for field in ("created_at", "deleted_at"):
+        if values[field] is not None:
+            values[field] = datetime.fromisoformat(values[field])
+    return User(**values)
+
+
+def store_principal(user):
+    """
+    Write-through (jaise DELETE /me ke baad deleted_at ke saath) → sab workers
+    ko turant nayi value; replica se aaya purana fill isko overwrite nahi karta
+    """
+    if cache.is_shared:
+        cache.set(_principal_key(user.id), _principal_data(user), PRINCIPAL_CACHE_SECONDS)
+
+
+def forget_principal(user_id):
+    if cache.is_shared:
+        cache.delete(_principal_key(user_id))
+
+
 # CURRENT USER DEPENDENCY (JWT Protected)
 
+@traced("auth.get_current_user")
 def get_current_user(
-    token: str = Depends(oauth2_scheme),   # Authorization: Bearer <token>
-    db: Session = Depends(get_db)           # Database session
+    token: str = Depends(oauth2_scheme)    # Authorization: Bearer <token>
 ):
     """
     Ye dependency:
@@ -74,11 +155,12 @@ def get_current_user(
         # JWT token decode
         # SECRET_KEY + ALGORITHM se verify hota hai
  
-        payload = jwt.decode(
-            token,
-            SECRET_KEY,
-            algorithms=[ALGORITHM]
-        )
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(
+                token,
+                SECRET_KEY,
+                algorithms=[ALGORITHM]
+            )
 
         # Token payload se user_id nikalna
      
@@ -100,9 +182,17 @@ def get_current_user(
         )
 
     
-    # Database se user fetch
+    # Cache se user (miss par database, replica par agar configured hai)
    
-    user = db.query(User).filter(User.id == user_id).first()
+    with span("auth.load_user", user_id=user_id):
+        data = cache.get(_principal_key(user_id)) if cache.is_shared else None
+        if data is not None:
+            user = _principal_user(data)
+        else:
+            user = _load_user(user_id)
+            if user is not None and cache.is_shared:
+                # add → beech me kisi ne write-through kiya ho to wahi rahe
+                cache.add(_principal_key(user_id), _principal_data(user), PRINCIPAL_CACHE_SECONDS)
 
     if not user:
         raise HTTPException(
@@ -110,6 +200,73 @@ def get_current_user(
             detail="User not found"
         )
 
+    # DELETE /me ho chuka → purane tokens turant band (data background me purge)
+    if user.deleted_at is not None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Account deleted"
+        )
+
     # Sab kuch sahi → authenticated user return
   
     return user
+
+
+# ADMIN USER DEPENDENCY
+
+# Admin endpoints (profiler) sirf in emails wale users ke liye (comma separated)
+# Khaali → koi admin nahi (admin APIs hamesha 403)
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+
+
+def get_admin_user(user: User = Depends(get_current_user)):
+    """
+    get_current_user + ADMIN_EMAILS check → warna 403
+    """
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin only"
+        )
+    return user
+
+
+# STREAM USER DEPENDENCY
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = None     # ?access_token=<jwt>
+):
+    """
+    Browser EventSource custom header nahi bhej sakta →
+    Bearer header na ho to ?access_token= query param
+    Verification wahi get_current_user wali hai
+    """
+    token = token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    return get_current_user(token)
+
+
+# READ-ONLY DATABASE SESSION DEPENDENCY
+
+def get_read_db(user: User = Depends(get_current_user)):
+    """
+    Sirf read karne wale routes (jaise GET /notes) ke liye session
+    Replica par route hota hai; user ne abhi write kiya ho to primary par
+    Replica query ke beech fail → agle replica / primary par wahi query (ReplicaSession)
+
+    Is session me kabhi write / commit mat karna
+    """
+    db = ReadSessionLocal(user_id=user.id)
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,10 +1,10 @@
 
 # Email bhejne ke liye required Python libraries
+# smtplib / email.mime (ssl ke saath) import mehenge hain →
+# module import par nahi, send_email() ke andar load hote hain
 
-
-import smtplib                           # SMTP protocol ke liye
-from email.mime.text import MIMEText     # Email body (plain text)
-from email.mime.multipart import MIMEMultipart  # Email structure (subject + body)
+# SMTP round-trips ka tracing span (TRACING_ENABLED=0 → koi wrapper nahi)
+from .tracing import traced
 
 
 # EMAIL CONFIGURATION
@@ -21,6 +21,7 @@ SENDER_PASSWORD = "your_app_password"        # Gmail App Password (NOT normal pa
 
 # COMMON EMAIL SENDER FUNCTION
 
+@traced("email.send")
 def send_email(receiver_email: str, subject: str, body: str):
     """
     Ye generic function hai jo kisi bhi type ka email bhej sakta hai
@@ -30,6 +31,9 @@ def send_email(receiver_email: str, subject: str, body: str):
     body           → email ka content
     """
 
+    import smtplib                                  # SMTP protocol ke liye
+    from email.mime.text import MIMEText            # Email body (plain text)
+    from email.mime.multipart import MIMEMultipart  # Email structure (subject + body)
 
     # Email message object
   
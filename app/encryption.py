@@ -0,0 +1,570 @@
+
+# Note encryption at rest (envelope encryption)
+#
+#   master key (NOTE_MASTER_KEYS env)  ──wraps──▶  per-user data key (user_keys table)
+#   data key (AES-256-GCM)             ──encrypts─▶ notes.title / notes.content
+#
+# Unwrapped data keys per worker LRU cache me rehte hai → list request par
+# ek user ki saari notes ek hi key se decrypt hoti hai, har note par key
+# unwrap / DB lookup nahi.
+#
+# Ciphertext format (TEXT / VARCHAR me hi store):
+#   $gcm$<generation>$<base64(nonce + ciphertext + tag)>
+# Prefix nahi → purana plaintext row (encryption on karne se pehle ka)
+#
+#   python -m app.encryption genkey                  → naya master key print
+#   python -m app.encryption reencrypt               → plaintext / purane key wale rows encrypt
+#   python -m app.encryption rotate --user-id 7      → naya data key + us user ke notes re-encrypt
+#   python -m app.encryption rewrap                  → data keys naye master key se wrap (notes nahi chhute)
+#   python -m app.encryption bench                   → list response p50 / p99 with vs without encryption
+
+
+import argparse
+import base64
+import binascii
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .archive import compress, decompress
+from .models import Note, NoteArchive, NoteRevision, UserKey
+
+
+#                    ENCRYPTION CONFIG
+
+# "id2:<base64 32 bytes>,id1:<base64 32 bytes>" → pehli key current (naye wraps),
+# baaki sirf purane wrapped keys kholne ke liye. Khali → encryption off
+NOTE_MASTER_KEYS = os.getenv("NOTE_MASTER_KEYS", "")
+
+# Per worker kitni unwrapped data keys cache me
+DATA_KEY_CACHE_SIZE = int(os.getenv("DATA_KEY_CACHE_SIZE", "10000"))
+
+# User ki "current generation" kitni der cache (rotation ke baad baaki workers
+# itni der me naya key use karne lagte hai)
+DATA_KEY_CACHE_SECONDS = float(os.getenv("DATA_KEY_CACHE_SECONDS", "60"))
+
+# Per worker decrypted title / content ka LRU (total characters); key =
+# (user_id, ciphertext) → har write ka naya nonce hai, isliye entry kabhi stale
+# nahi hoti. List request par base64 decode + AES-GCM repeat nahi. 0 → off
+DECRYPTED_CACHE_CHARS = int(os.getenv("DECRYPTED_CACHE_CHARS", str(32 * 1024 * 1024)))
+
+PREFIX = "$gcm$"
+
+NOTE_FIELDS = ("id", "title", "content", "created_at", "version", "updated_at", "change_seq",
+               "folder_id")
+
+
+@lru_cache
+def _aesgcm():
+    # cryptography import heavy hai → pehli encrypt / decrypt par hi
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    return AESGCM
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value.encode())
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.b64encode(value).decode()
+
+
+def _aad(user_id) -> bytes:
+    # AAD = user_id → ciphertext doosre user ki row me copy karke nahi khulega
+    return str(user_id).encode()
+
+
+def parse_master_keys(value: str) -> dict:
+    """
+    "id:base64,..." → {id: key bytes} (order same, pehla current)
+    """
+    keys = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key_id, _, encoded = item.partition(":")
+        key = _b64decode(encoded)
+        if len(key) != 32:
+            raise ValueError(f"Master key {key_id!r} 32 bytes (base64) ki honi chahiye")
+        keys[key_id] = key
+    return keys
+
+
+#                    NOTE CIPHER
+
+
+class NoteCipher:
+    """
+    Per-user data keys (wrap / unwrap + LRU cache) aur field encrypt / decrypt
+    Data keys primary DB ki user_keys table me (notes kisi bhi shard par ho)
+    """
+
+    def __init__(self, master_keys=NOTE_MASTER_KEYS, bind=None,
+                 cache_size=DATA_KEY_CACHE_SIZE, cache_seconds=DATA_KEY_CACHE_SECONDS,
+                 plain_cache_chars=DECRYPTED_CACHE_CHARS):
+        self.master_keys = parse_master_keys(master_keys)
+        self.master_key_id = next(iter(self.master_keys), None)
+        self.bind = bind
+        self.cache_size = cache_size
+        self.cache_seconds = cache_seconds
+
+        self._lock = threading.Lock()
+        self._keys = OrderedDict()       # (user_id, generation) → AESGCM
+        self._current = OrderedDict()    # user_id → (expires_at, generation)
+
+        self.plain_cache_chars = plain_cache_chars
+        self._plain = OrderedDict()      # (user_id, ciphertext) → plaintext
+        self._plain_chars = 0
+
+    @property
+    def enabled(self):
+        return self.master_key_id is not None
+
+    def _engine(self):
+        if self.bind is not None:
+            return self.bind
+        from .database import engine
+        return engine
+
+    #           KEY WRAPPING
+
+    def wrap(self, data_key: bytes):
+        nonce = os.urandom(12)
+        master = _aesgcm()(self.master_keys[self.master_key_id])
+        return self.master_key_id, _b64encode(nonce + master.encrypt(nonce, data_key, None))
+
+    def unwrap(self, master_key_id: str, wrapped_key: str) -> bytes:
+        if master_key_id not in self.master_keys:
+            raise RuntimeError(f"Master key {master_key_id!r} NOTE_MASTER_KEYS me nahi hai")
+        raw = _b64decode(wrapped_key)
+        master = _aesgcm()(self.master_keys[master_key_id])
+        return master.decrypt(raw[:12], raw[12:], None)
+
+    #           DATA KEY CACHE
+
+    def _remember(self, user_id, generation, aes):
+        with self._lock:
+            self._keys[(user_id, generation)] = aes
+            self._keys.move_to_end((user_id, generation))
+            while len(self._keys) > self.cache_size:
+                self._keys.popitem(last=False)
+
+    def data_key(self, user_id, generation):
+        """
+        Ek generation ki key (immutable → bina TTL cache)
+        """
+        with self._lock:
+            aes = self._keys.get((user_id, generation))
+            if aes is not None:
+                self._keys.move_to_end((user_id, generation))
+                return aes
+
+        with self._engine().connect() as conn:
+            row = conn.execute(
+                select(UserKey.master_key_id, UserKey.wrapped_key)
+                .where(UserKey.user_id == user_id, UserKey.generation == generation)
+            ).first()
+        if row is None:
+            raise RuntimeError(f"User {user_id} ki data key (generation {generation}) nahi mili")
+
+        aes = _aesgcm()(self.unwrap(row.master_key_id, row.wrapped_key))
+        self._remember(user_id, generation, aes)
+        return aes
+
+    def current_key(self, user_id):
+        """
+        Writes ke liye (generation, AESGCM); user ki key nahi hai to ban jati hai
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._current.get(user_id)
+            if cached and cached[0] > now:
+                self._current.move_to_end(user_id)
+                generation = cached[1]
+            else:
+                generation = None
+
+        if generation is None:
+            with self._engine().connect() as conn:
+                generation = conn.execute(
+                    select(func.max(UserKey.generation)).where(UserKey.user_id == user_id)
+                ).scalar()
+            if generation is None:
+                generation = self.create_key(user_id)
+
+            with self._lock:
+                self._current[user_id] = (now + self.cache_seconds, generation)
+                self._current.move_to_end(user_id)
+                while len(self._current) > self.cache_size:
+                    self._current.popitem(last=False)
+
+        return generation, self.data_key(user_id, generation)
+
+    def create_key(self, user_id) -> int:
+        """
+        User ke liye naya data key generation (pehli write ya rotation)
+        Dusra worker same generation pehle bana de → wahi use
+        """
+        with self._engine().connect() as conn:
+            generation = (conn.execute(
+                select(func.max(UserKey.generation)).where(UserKey.user_id == user_id)
+            ).scalar() or 0) + 1
+
+        master_key_id, wrapped_key = self.wrap(_aesgcm().generate_key(bit_length=256))
+        try:
+            with self._engine().begin() as conn:
+                conn.execute(
+                    UserKey.__table__.insert().values(
+                        user_id=user_id,
+                        generation=generation,
+                        master_key_id=master_key_id,
+                        wrapped_key=wrapped_key
+                    )
+                )
+        except IntegrityError:
+            pass
+
+        self.forget(user_id)
+        return generation
+
+    def forget(self, user_id):
+        with self._lock:
+            self._current.pop(user_id, None)
+
+    #           FIELD ENCRYPT / DECRYPT
+
+    def encrypt(self, user_id, value: str, key=None) -> str:
+        """
+        key → current_key() ka (generation, AESGCM) (ek write ke saare fields
+        ke liye ek hi lookup)
+        """
+        if not self.enabled:
+            return value
+        generation, aes = key or self.current_key(user_id)
+        nonce = os.urandom(12)
+        data = aes.encrypt(nonce, value.encode(), _aad(user_id))
+        return f"{PREFIX}{generation}${binascii.b2a_base64(nonce + data, newline=False).decode()}"
+
+    def decrypt(self, user_id, value: str, keys=None, aad=None) -> str:
+        """
+        keys → ek batch ke andar generation → AESGCM (lock / LRU bhi skip)
+        aad → batch me pehle se bana _aad(user_id)
+        """
+        if not value.startswith(PREFIX):
+            return value
+
+        generation, _, encoded = value[len(PREFIX):].partition("$")
+        aes = keys.get(generation) if keys is not None else None
+        if aes is None:
+            aes = self.data_key(user_id, int(generation))
+            if keys is not None:
+                keys[generation] = aes
+
+        # a2b_base64 str seedha leta hai (beech ka .encode() copy nahi)
+        raw = binascii.a2b_base64(encoded)
+        return aes.decrypt(raw[:12], raw[12:], aad or _aad(user_id)).decode()
+
+    def generation_of(self, value: str):
+        if not value.startswith(PREFIX):
+            return None
+        return int(value[len(PREFIX):].partition("$")[0])
+
+    def encrypt_values(self, user_id, values: dict) -> dict:
+        """
+        Note insert / update values me title + content encrypt (baaki same)
+        """
+        if not self.enabled:
+            return values
+        key = self.current_key(user_id)
+        return {
+            name: self.encrypt(user_id, value, key) if name in ("title", "content") else value
+            for name, value in values.items()
+        }
+
+    def decrypt_notes(self, user_id, notes):
+        """
+        Ek user ke notes (ORM objects ya dicts) → plaintext dicts
+        Poori list ke liye data key ek hi baar resolve hoti hai, aur pehle
+        decrypt ho chuke values LRU se (lock bhi poori list ke liye ek baar)
+        ORM objects change nahi hote (session flush me plaintext DB me na chala jaye)
+        """
+        if not self.enabled:
+            return notes
+
+        result = []
+        for note in notes:
+            result.append(dict(note) if isinstance(note, dict) else
+                          {name: getattr(note, name) for name in NOTE_FIELDS})
+
+        cached = {}
+        if self.plain_cache_chars > 0:
+            with self._lock:
+                for data in result:
+                    for field in ("title", "content"):
+                        key = (user_id, data[field])
+                        value = self._plain.get(key)
+                        if value is not None:
+                            self._plain.move_to_end(key)
+                            cached[key] = value
+
+        keys = {}
+        aad = _aad(user_id)
+        fresh = {}
+        for data in result:
+            for field in ("title", "content"):
+                value = data[field]
+                plain = cached.get((user_id, value))
+                if plain is None:
+                    plain = self.decrypt(user_id, value, keys, aad)
+                    if plain is not value:
+                        fresh[(user_id, value)] = plain
+                data[field] = plain
+
+        if fresh and self.plain_cache_chars > 0:
+            self._remember_plain(fresh)
+        return result
+
+    def _remember_plain(self, values):
+        with self._lock:
+            for key, plain in values.items():
+                if key in self._plain:
+                    continue
+                self._plain[key] = plain
+                self._plain_chars += len(key[1]) + len(plain)
+            while self._plain_chars > self.plain_cache_chars and self._plain:
+                key, plain = self._plain.popitem(last=False)
+                self._plain_chars -= len(key[1]) + len(plain)
+
+    def decrypt_note(self, user_id, note):
+        return self.decrypt_notes(user_id, [note])[0]
+
+
+note_cipher = NoteCipher()
+
+
+#                    RE-ENCRYPTION / ROTATION
+
+
+def _reencrypt_table(bind, cipher, model, fields, user_id=None, batch_size=500, log=print,
+                     codecs=None):
+    """
+    Table ko id order me batches me padh ke (memory constant) har woh row
+    jo plaintext hai ya purane generation ki hai, current key se likhta hai
+
+    UPDATE ... WHERE field = purana value → beech me app ne row badal di
+    to woh row skip (app already current key se likh chuki)
+
+    codecs → {field: (decode, encode)} jin columns me stored form text nahi
+    (notes_archive.content_z → zlib)
+    """
+    codecs = codecs or {}
+    plain = (lambda value: value, lambda value: value)
+    columns = [getattr(model, name) for name in fields]
+    rewritten = 0
+    after_id = 0
+
+    while True:
+        with Session(bind=bind) as db:
+            stmt = (
+                select(model.id, model.user_id, *columns)
+                .where(model.id > after_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            )
+            if user_id is not None:
+                stmt = stmt.where(model.user_id == user_id)
+
+            rows = db.execute(stmt).all()
+            if not rows:
+                break
+
+            for row in rows:
+                current, _ = cipher.current_key(row.user_id)
+                old = {name: getattr(row, name) for name in fields}
+                text = {name: codecs.get(name, plain)[0](value) for name, value in old.items()}
+                if all(cipher.generation_of(value) == current for value in text.values()):
+                    continue
+
+                new = {
+                    name: codecs.get(name, plain)[1](
+                        cipher.encrypt(row.user_id, cipher.decrypt(row.user_id, value))
+                    )
+                    for name, value in text.items()
+                }
+                rewritten += db.execute(
+                    update(model)
+                    .where(model.id == row.id, *(column == old[column.key] for column in columns))
+                    .values(**new)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+
+            db.commit()
+            after_id = rows[-1].id
+
+    log(f"  {model.__tablename__}: {rewritten} rows re-encrypted")
+    return rewritten
+
+
+def reencrypt(cipher=note_cipher, user_id=None, batch_size=500, log=print):
+    from .sharding import shard_engines
+
+    if not cipher.enabled:
+        raise RuntimeError("NOTE_MASTER_KEYS set nahi hai")
+
+    for shard_id, bind in enumerate(shard_engines):
+        log(f"shard {shard_id}:")
+        _reencrypt_table(bind, cipher, Note, ("title", "content"), user_id, batch_size, log)
+        _reencrypt_table(bind, cipher, NoteRevision, ("title", "data"), user_id, batch_size, log)
+        # Cold tier: content zlib me → decompress, re-encrypt, compress
+        _reencrypt_table(bind, cipher, NoteArchive, ("title", "content_z"), user_id, batch_size, log,
+                         codecs={"content_z": (decompress, compress)})
+
+
+def rotate(user_ids, cipher=note_cipher, batch_size=500, log=print):
+    """
+    Har user ka naya data key generation, phir unke notes re-encrypt
+    """
+    for user_id in user_ids:
+        generation = cipher.create_key(user_id)
+        log(f"user {user_id}: data key generation {generation}")
+
+    # Baaki workers ka current-generation cache expire hone do
+    time.sleep(cipher.cache_seconds)
+
+    for user_id in user_ids:
+        reencrypt(cipher, user_id, batch_size, log)
+
+
+def rewrap(cipher=note_cipher, log=print):
+    """
+    Master key rotation → sirf user_keys rows dobara wrap hote hai
+    (notes ka ciphertext same rehta hai)
+    """
+    bind = cipher._engine()
+    with Session(bind=bind) as db:
+        keys = db.execute(
+            select(UserKey).where(UserKey.master_key_id != cipher.master_key_id)
+        ).scalars().all()
+
+        for key in keys:
+            key.master_key_id, key.wrapped_key = cipher.wrap(
+                cipher.unwrap(key.master_key_id, key.wrapped_key)
+            )
+        db.commit()
+
+    log(f"{len(keys)} data keys rewrapped with master key {cipher.master_key_id!r}")
+
+
+#                    BENCHMARK
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def benchmark(notes: int, size: int, requests: int):
+    """
+    In-memory SQLite par do users (plaintext vs encrypted) ki `notes` notes
+    GET /notes jaisa path: query + decrypt + NoteResponse validation + JSON
+    """
+    from pydantic import TypeAdapter
+
+    from .database import Base, create_db_engine
+    from .schemas import NoteResponse
+
+    bind = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind)
+
+    master = _b64encode(_aesgcm().generate_key(bit_length=256))
+    plain = NoteCipher("", bind=bind)
+    encrypted = NoteCipher(f"bench:{master}", bind=bind)
+    # Same keys, decrypted LRU off → har request par poora base64 + AES-GCM
+    uncached = NoteCipher(f"bench:{master}", bind=bind, plain_cache_chars=0)
+
+    content = ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size]
+    with Session(bind=bind) as db:
+        for user_id, cipher in ((1, plain), (2, encrypted)):
+            for i in range(notes):
+                db.add(Note(**cipher.encrypt_values(
+                    user_id, {"title": f"note {i}", "content": content, "user_id": user_id}
+                ), change_seq=i + 1))
+        db.commit()
+
+    response = TypeAdapter(list[NoteResponse])
+
+    def list_notes(user_id, cipher):
+        with Session(bind=bind) as db:
+            rows = db.query(Note).filter(Note.user_id == user_id).all()
+            notes = cipher.decrypt_notes(user_id, rows)
+            return response.dump_json(response.validate_python(notes, from_attributes=True))
+
+    print(f"{notes} notes x {size} bytes, {requests} list requests")
+    print(f"{'mode':>10}  {'p50 ms':>8}  {'p99 ms':>8}")
+
+    modes = (("plaintext", 1, plain), ("encrypted", 2, encrypted), ("no-lru", 2, uncached))
+    for _, user_id, cipher in modes:
+        list_notes(user_id, cipher)    # warm (key cache, imports, LRU)
+
+    # Modes interleaved → machine ka noise / drift sab par barabar
+    latencies = {name: [] for name, _, _ in modes}
+    for _ in range(requests):
+        for name, user_id, cipher in modes:
+            started = time.perf_counter()
+            list_notes(user_id, cipher)
+            latencies[name].append((time.perf_counter() - started) * 1000)
+
+    results = {}
+    for name, _, _ in modes:
+        results[name] = (_percentile(latencies[name], 50), _percentile(latencies[name], 99))
+        print(f"{name:>10}  {results[name][0]:>8.2f}  {results[name][1]:>8.2f}")
+
+    for name in ("encrypted", "no-lru"):
+        overhead = [(results[name][i] / results["plaintext"][i] - 1) * 100 for i in (0, 1)]
+        print(f"{name} overhead: p50 {overhead[0]:+.1f}%  p99 {overhead[1]:+.1f}%")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.encryption")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("genkey", help="naya random master key (base64) print")
+
+    reenc = sub.add_parser("reencrypt", help="plaintext / purane key wale rows encrypt")
+    reenc.add_argument("--user-id", type=int)
+    reenc.add_argument("--batch-size", type=int, default=500)
+
+    rot = sub.add_parser("rotate", help="user ka naya data key + re-encrypt")
+    rot.add_argument("--user-id", type=int, action="append", required=True)
+    rot.add_argument("--batch-size", type=int, default=500)
+
+    sub.add_parser("rewrap", help="data keys current master key se dobara wrap")
+
+    bench = sub.add_parser("bench", help="list response latency with / without encryption")
+    bench.add_argument("--notes", type=int, default=200)
+    bench.add_argument("--size", type=int, default=2000, help="note content size (bytes)")
+    bench.add_argument("--requests", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "genkey":
+        print(_b64encode(os.urandom(32)))
+    elif args.command == "reencrypt":
+        reencrypt(user_id=args.user_id, batch_size=args.batch_size)
+    elif args.command == "rotate":
+        rotate(args.user_id, batch_size=args.batch_size)
+    elif args.command == "rewrap":
+        rewrap()
+    elif args.command == "bench":
+        benchmark(args.notes, args.size, args.requests)
+
+
+if __name__ == "__main__":
+    main()
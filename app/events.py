@@ -0,0 +1,273 @@
+
+# Note change events (real-time feed)
+#
+# GET /notes/stream par connected clients ko note create / update / delete
+# events push hote hain. Pub/sub pluggable hai:
+#
+#   EVENT_BUS=local → in-process (ek uvicorn worker)
+#   EVENT_BUS=db    → change_events table + har worker ka ek poller
+#                     (multiple workers / machines, bina extra broker ke)
+#
+# Har subscriber ki queue bounded hai. Slow client ki queue bhar gayi to
+# events drop karke ek "resync" event milta hai → client GET /notes/changes
+# se catch-up kare. Isliye 10k+ idle connections par bhi memory bounded rehti hai.
+
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, or_, select
+
+
+#                    EVENT BUS CONFIG
+
+EVENT_BUS = os.getenv("EVENT_BUS", "local")
+
+# Har connection ki queue me max events
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "64"))
+
+# DB bus poll interval (ms) aur purane events kitni der rakhne hai
+EVENT_POLL_MS = int(os.getenv("EVENT_POLL_MS", "250"))
+EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", "300"))
+
+# Auto-increment ids commit order me nahi aate (MySQL / Postgres, concurrent
+# publishers) → cursor se peeche chhoote ids itni der tak dobara dekhe jaate hai
+EVENT_GAP_SECONDS = float(os.getenv("EVENT_GAP_SECONDS", "5"))
+EVENT_GAP_MAX = int(os.getenv("EVENT_GAP_MAX", "1000"))
+
+
+#                    SUBSCRIPTION
+
+
+class Subscription:
+    """
+    Ek stream connection → ek bounded asyncio queue
+    """
+
+    __slots__ = ("user_id", "queue", "loop", "overflowed")
+
+    def __init__(self, user_id, maxsize=EVENT_QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+
+    def deliver(self, event: dict):
+        # Event loop thread me hi chalta hai (call_soon_threadsafe se)
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Purane events hatao, sirf resync marker rakho
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self, timeout: float):
+        event = await asyncio.wait_for(self.queue.get(), timeout)
+        if event.get("type") == "resync":
+            self.overflowed = False
+        return event
+
+
+#                    IN-PROCESS BUS
+
+
+class LocalBus:
+    """
+    Ek worker ke andar fan-out
+    publish() kisi bhi thread se call ho sakta hai (sync routes threadpool me)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}    # user_id → set(Subscription)
+
+    async def open(self, user_id) -> Subscription:
+        """
+        Stream endpoint isse subscribe kare (DbBus yahan cursor set karta hai)
+        """
+        return self.subscribe(user_id)
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, user_id, event: dict):
+        self._dispatch(user_id, event)
+
+    def _dispatch(self, user_id, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+#                    DB-BACKED BUS (MULTI WORKER)
+
+
+class DbBus(LocalBus):
+    """
+    publish() → change_events me ek row (primary DB)
+    Har worker ka ek background poller naye rows padh ke local
+    subscribers ko dispatch karta hai (apne worker ke events bhi isi raaste)
+
+    Poll tabhi hota hai jab is worker par koi subscriber ho
+
+    Cursor (last id) ke neeche jo ids abhi nahi dikhe (transaction commit
+    baad me hoga) → gap; EVENT_GAP_SECONDS tak har poll me unhe bhi padhte
+    hai (rollback hua insert ka gap timeout par chhod diya jaata hai)
+    """
+
+    def __init__(self, poll_ms=EVENT_POLL_MS, retention_seconds=EVENT_RETENTION_SECONDS,
+                 gap_seconds=EVENT_GAP_SECONDS, gap_max=EVENT_GAP_MAX):
+        super().__init__()
+        self.poll_interval = poll_ms / 1000
+        self.retention = timedelta(seconds=retention_seconds)
+        self.gap_seconds = gap_seconds
+        self.gap_max = gap_max
+        self._poller = None
+        self._last_id = None
+        self._gaps = {}     # missing id → deadline (monotonic)
+
+    def publish(self, user_id, event: dict):
+        from .database import engine
+        from .models import ChangeEvent
+
+        with engine.begin() as conn:
+            conn.execute(
+                ChangeEvent.__table__.insert().values(
+                    user_id=user_id,
+                    payload=json.dumps(event)
+                )
+            )
+
+    async def open(self, user_id) -> Subscription:
+        # Cursor subscription se pehle → iske baad publish hua har event poller
+        # ko milta hai (pehle poll tak ruk ke cursor lene se beech ke events chhoot jaate)
+        if self._last_id is None:
+            last_id = await asyncio.to_thread(self._max_id)
+            if self._last_id is None:
+                self._last_id = last_id
+        return self.subscribe(user_id)
+
+    def _max_id(self):
+        from .database import engine
+        from .models import ChangeEvent
+
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = super().subscribe(user_id)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    def _fetch(self):
+        from .database import engine
+        from .models import ChangeEvent
+
+        if self._last_id is None:
+            # open() ke bina subscribe → poller start se aage ke events
+            self._last_id = self._max_id()
+            return []
+
+        now = time.monotonic()
+        self._gaps = {gap: deadline for gap, deadline in self._gaps.items() if deadline > now}
+
+        condition = ChangeEvent.id > self._last_id
+        if self._gaps:
+            condition = or_(condition, ChangeEvent.id.in_(list(self._gaps)))
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(ChangeEvent.id, ChangeEvent.user_id, ChangeEvent.payload)
+                .where(condition)
+                .order_by(ChangeEvent.id)
+                .limit(1000)
+            ).all()
+
+        for row in rows:
+            if row.id <= self._last_id:
+                self._gaps.pop(row.id, None)
+                continue
+            # Cursor aur is row ke beech ke ids abhi nahi dikhe → gap
+            for gap in range(max(self._last_id + 1, row.id - self.gap_max), row.id):
+                if len(self._gaps) >= self.gap_max:
+                    break
+                self._gaps[gap] = now + self.gap_seconds
+            self._last_id = row.id
+        return rows
+
+    def _cleanup(self):
+        from .database import engine
+        from .models import ChangeEvent
+
+        with engine.begin() as conn:
+            conn.execute(
+                delete(ChangeEvent).where(
+                    ChangeEvent.created_at < datetime.utcnow() - self.retention
+                )
+            )
+
+    async def _poll(self):
+        last_cleanup = time.monotonic()
+        while self.connection_count():
+            try:
+                for row in await asyncio.to_thread(self._fetch):
+                    self._dispatch(row.user_id, json.loads(row.payload))
+
+                if time.monotonic() - last_cleanup > self.retention.total_seconds():
+                    last_cleanup = time.monotonic()
+                    await asyncio.to_thread(self._cleanup)
+            except Exception as e:
+                print(" Change event poll failed")
+                print(e)
+
+            await asyncio.sleep(self.poll_interval)
+
+        # Koi subscriber nahi bacha → agli baar fresh start
+        self._last_id = None
+        self._gaps = {}
+
+
+event_bus = DbBus() if EVENT_BUS == "db" else LocalBus()
+
+
+#                    PUBLISH HELPER
+
+
+def publish_note_event(user_id, event_type: str, note_id, change_seq=None):
+    """
+    Note write commit hone ke baad call karo
+    Bus fail ho to write fail nahi hota (client /notes/changes se catch-up karega)
+    """
+    event = {"type": event_type, "id": note_id}
+    if change_seq is not None:
+        event["change_seq"] = change_seq
+    try:
+        event_bus.publish(user_id, event)
+    except Exception as e:
+        print(" Change event publish failed")
+        print(e)
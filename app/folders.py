@@ -0,0 +1,365 @@
+
+# Folder hierarchy (materialized path) + incremental note counts
+#
+#   folders.path = "/3/17/42/"  → 42 ka parent 17, uska parent 3
+#   Subtree(17)  = path >= "/3/17/" AND path < "/3/170"   ('/' < '0')
+#
+# Ye range (user_id, path) index par seedha scan hoti hai → LIKE / recursive
+# CTE nahi. note_count (sirf is folder) aur total_count (poora subtree) note
+# add / move / delete ke same transaction me +n / -n (kabhi COUNT(*) nahi).
+# Commit hamesha caller karta hai.
+
+
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import String, case, delete, func, literal, select, update
+
+from .models import Folder, Note, NoteArchive
+from .sync import bump_change_seq, mark_changed, reserve_change_seqs
+
+
+#                    FOLDER CONFIG
+
+# Max nesting (path column 512 chars ka hai)
+FOLDER_MAX_DEPTH = int(os.getenv("FOLDER_MAX_DEPTH", "32"))
+
+
+#                    PATH HELPERS
+
+
+def path_ids(path: str) -> list:
+    # "/3/17/42/" → [3, 17, 42]
+    return [int(part) for part in path.strip("/").split("/") if part]
+
+
+def subtree(user_id, path: str):
+    """
+    Folder + uske saare descendants (index range conditions)
+    """
+    return (
+        Folder.user_id == user_id,
+        Folder.path >= path,
+        Folder.path < path[:-1] + "0"
+    )
+
+
+def get_folder(db, user_id, folder_id) -> Folder:
+    folder = db.execute(
+        select(Folder).where(Folder.id == folder_id, Folder.user_id == user_id)
+    ).scalar()
+    if folder is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return folder
+
+
+def note_filter(db, user_id, folder_id, recursive=False, column=Note.folder_id):
+    """
+    GET /notes?folder_id= ke liye Note condition (column → NoteArchive.folder_id cold listing ke liye)
+    recursive → subtree ke saare folders (ids pehle nikaal ke IN, folders
+    notes se bahut kam hote hai)
+    """
+    folder = get_folder(db, user_id, folder_id)
+    if not recursive:
+        return column == folder.id
+
+    ids = db.execute(select(Folder.id).where(*subtree(user_id, folder.path))).scalars().all()
+    return column.in_(ids)
+
+
+#                    NOTE COUNTS
+
+
+def add_note_counts(db, user_id, deltas: dict):
+    """
+    deltas → {folder_id: +n / -n}; folder ke note_count aur us folder +
+    saare ancestors ke total_count me (har folder ke liye ek UPDATE)
+    """
+    deltas = {folder_id: delta for folder_id, delta in deltas.items()
+              if folder_id is not None and delta}
+    if not deltas:
+        return
+
+    paths = dict(db.execute(
+        select(Folder.id, Folder.path)
+        .where(Folder.user_id == user_id, Folder.id.in_(list(deltas)))
+    ).all())
+
+    for folder_id, delta in deltas.items():
+        if folder_id not in paths:
+            continue
+        db.execute(
+            update(Folder)
+            .where(Folder.user_id == user_id, Folder.id.in_(path_ids(paths[folder_id])))
+            .values(
+                total_count=Folder.total_count + delta,
+                note_count=Folder.note_count + case((Folder.id == folder_id, delta), else_=0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def count_notes(db, notes):
+    """
+    Naye notes (ORM objects) ke folders ke counts +1 (insert ke transaction me)
+    """
+    deltas = {}
+    for note in notes:
+        if note.folder_id is not None:
+            key = (note.user_id, note.folder_id)
+            deltas[key] = deltas.get(key, 0) + 1
+
+    by_user = {}
+    for (user_id, folder_id), delta in deltas.items():
+        by_user.setdefault(user_id, {})[folder_id] = delta
+    for user_id, user_deltas in by_user.items():
+        add_note_counts(db, user_id, user_deltas)
+
+
+#                    FOLDER WRITES
+
+
+def create_folder(db, user_id, name, parent_id=None) -> Folder:
+    from .sharding import shard_router
+
+    parent_path = "/"
+    if parent_id is not None:
+        parent = get_folder(db, user_id, parent_id)
+        if len(path_ids(parent.path)) >= FOLDER_MAX_DEPTH:
+            raise HTTPException(status_code=400, detail="Folder nesting bahut gehri hai")
+        parent_path = parent.path
+
+    folder = Folder(user_id=user_id, parent_id=parent_id, name=name, path="",
+                    note_count=0, total_count=0)
+    if shard_router.enabled:
+        folder.id = shard_router.next_id(Folder.__table__)
+    db.add(folder)
+
+    # Path me apna id chahiye → flush ke baad
+    db.flush()
+    folder.path = f"{parent_path}{folder.id}/"
+    return folder
+
+
+def move_folder(db, user_id, folder: Folder, parent_id):
+    """
+    Folder (poore subtree ke saath) naye parent ke neeche
+    Subtree ke paths ek UPDATE me rewrite, counts purane ancestors se naye par
+    """
+    old_path = folder.path
+    new_parent_path = "/"
+    if parent_id is not None:
+        parent = get_folder(db, user_id, parent_id)
+        if parent.path.startswith(old_path):
+            raise HTTPException(status_code=400, detail="Folder apne hi subtree me move nahi ho sakta")
+        new_parent_path = parent.path
+
+    new_path = f"{new_parent_path}{folder.id}/"
+    if new_path == old_path:
+        return
+
+    depth = db.execute(
+        select(Folder.path).where(*subtree(user_id, old_path))
+    ).scalars().all()
+    extra = max(len(path_ids(path)) for path in depth) - len(path_ids(old_path))
+    if len(path_ids(new_path)) + extra > FOLDER_MAX_DEPTH:
+        raise HTTPException(status_code=400, detail="Folder nesting bahut gehri hai")
+
+    old_ancestors = path_ids(old_path)[:-1]
+    new_ancestors = path_ids(new_path)[:-1]
+    total = folder.total_count
+
+    db.execute(
+        update(Folder)
+        .where(*subtree(user_id, old_path))
+        .values(path=literal(new_path, String) + func.substr(Folder.path, len(old_path) + 1))
+        .execution_options(synchronize_session=False)
+    )
+    for ancestors, delta in ((old_ancestors, -total), (new_ancestors, total)):
+        if ancestors and delta:
+            db.execute(
+                update(Folder)
+                .where(Folder.user_id == user_id, Folder.id.in_(ancestors))
+                .values(total_count=Folder.total_count + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+    db.execute(
+        update(Folder)
+        .where(Folder.id == folder.id)
+        .values(parent_id=parent_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(folder)
+    mark_changed(db, user_id)     # ?recursive=true listings badli
+
+
+def delete_folder(db, user_id, folder_id, batch_size=500) -> int:
+    """
+    Folder + subfolders delete; unke notes root (folder_id NULL) par aa jaate hai
+    Notes delete nahi hote. Har moved note ko naya change_seq (delta sync me
+    dikhe) → batch me ek UPDATE ... CASE. Unfiled hue notes ki ginti return
+
+    Sabse pehle counter row lock (bump_change_seq ka contract) → folder /
+    notes ke SELECT lock ke baad; beech me is subtree me note create / move
+    commit nahi ho sakta (MySQL REPEATABLE READ snapshot bhi lock ke baad)
+    """
+    bump_change_seq(db, user_id, 0)
+    folder = get_folder(db, user_id, folder_id)
+
+    ids = db.execute(select(Folder.id).where(*subtree(user_id, folder.path))).scalars().all()
+
+    # Cold tier (notes_archive) ke notes bhi unfile → wapas hot hone par folder na mile
+    tiers = [
+        (model, db.execute(
+            select(model.id)
+            .where(model.user_id == user_id, model.folder_id.in_(ids))
+            .order_by(model.id)
+        ).scalars().all())
+        for model in (Note, NoteArchive)
+    ]
+    total = sum(len(note_ids) for _, note_ids in tiers)
+
+    if total:
+        first = reserve_change_seqs(db, user_id, total)
+        for model, note_ids in tiers:
+            for start in range(0, len(note_ids), batch_size):
+                batch = note_ids[start:start + batch_size]
+                db.execute(
+                    update(model)
+                    .where(model.user_id == user_id, model.id.in_(batch))
+                    .values(
+                        folder_id=None,
+                        change_seq=case(
+                            {note_id: first + start + i for i, note_id in enumerate(batch)},
+                            value=model.id
+                        )
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            first += len(note_ids)
+
+    ancestors = path_ids(folder.path)[:-1]
+    if ancestors and folder.total_count:
+        db.execute(
+            update(Folder)
+            .where(Folder.user_id == user_id, Folder.id.in_(ancestors))
+            .values(total_count=Folder.total_count - folder.total_count)
+            .execution_options(synchronize_session=False)
+        )
+
+    db.execute(
+        delete(Folder)
+        .where(Folder.user_id == user_id, Folder.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    mark_changed(db, user_id)     # ?folder_id= ab 404
+    return total
+
+
+#                    BENCHMARK
+
+
+def benchmark(notes: int, folders: int, repeat: int = 20):
+    """
+    In-memory SQLite par ek user ke `notes` notes `folders` folders (3 level
+    tree) me → folder listing (counts columns se) vs COUNT(*) GROUP BY, aur
+    subtree filter (sirf note ids) ka time
+    """
+    import random
+    import time
+
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    from .database import Base, create_db_engine
+
+    bind = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind)
+    rng = random.Random(1)
+    user_id = 1
+
+    with Session(bind=bind) as db:
+        created = []
+        for i in range(folders):
+            parent = rng.choice(created) if created and i % 3 else None
+            if parent is not None and len(path_ids(parent.path)) >= 3:
+                parent = None
+            created.append(create_folder(db, user_id, f"folder {i}",
+                                         parent.id if parent else None))
+        db.flush()
+
+        folder_ids = [folder.id for folder in created]
+        rows = [
+            {"title": f"note {i}", "content": "x" * 100, "user_id": user_id,
+             "folder_id": rng.choice(folder_ids), "change_seq": i + 1}
+            for i in range(notes)
+        ]
+        db.execute(insert(Note), rows)
+
+        deltas = {}
+        for row in rows:
+            deltas[row["folder_id"]] = deltas.get(row["folder_id"], 0) + 1
+        add_note_counts(db, user_id, deltas)
+        db.commit()
+
+        top = max((folder for folder in created if folder.parent_id is None),
+                  key=lambda folder: folder.total_count)
+        top_id, top_path = top.id, top.path
+
+    def timed(fn):
+        with Session(bind=bind) as db:
+            fn(db)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                result = fn(db)
+            return (time.perf_counter() - started) * 1000 / repeat, result
+
+    listing_ms, _ = timed(lambda db: db.execute(
+        select(Folder).where(Folder.user_id == user_id).order_by(Folder.path)
+    ).scalars().all())
+
+    counting_ms, _ = timed(lambda db: db.execute(
+        select(Note.folder_id, func.count())
+        .where(Note.user_id == user_id)
+        .group_by(Note.folder_id)
+    ).all())
+
+    subtree_ms, ids = timed(lambda db: db.execute(
+        select(Note.id).where(Note.user_id == user_id, note_filter(db, user_id, top_id, True))
+    ).scalars().all())
+
+    with bind.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM folders WHERE user_id = 1 "
+            f"AND path >= '{top_path}' AND path < '{top_path[:-1]}0'"
+        ).all()
+
+    print(f"{notes} notes, {folders} folders (1 user)")
+    print(f"folder list (counts columns)   : {listing_ms:>8.2f} ms")
+    print(f"folder counts via COUNT(*)     : {counting_ms:>8.2f} ms")
+    print(f"subtree note ids ({len(ids):>6} notes): {subtree_ms:>8.2f} ms")
+    print(f"subtree plan: {plan[0][-1]}")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.folders")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="folder listing / subtree filter timing")
+    bench.add_argument("--notes", type=int, default=100000)
+    bench.add_argument("--folders", type=int, default=300)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.notes, args.folders)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+
+# Idempotency-Key support (POST /notes/, POST /register/send-otp)
+#
+# Client retry par same "Idempotency-Key" header bhejta hai → pehli baar ka
+# response cache se wapas milta hai (duplicate note / OTP row / commit nahi).
+#
+#   - Same key + alag request body → 422
+#   - Same key ki pehli request abhi chal rahi hai → duplicate usi ka wait karta hai
+#   - Response IDEMPOTENCY_TTL_SECONDS tak yaad rehta hai
+#     (5xx / 403 / 409 / 429 nahi → key release, retry dobara chalta hai)
+#
+#   IDEMPOTENCY_STORE=local → per worker bounded LRU (DB touch nahi hota)
+#   IDEMPOTENCY_STORE=db    → local cache + idempotency_keys table
+#                             (retry doosre worker par pahunche tab bhi)
+
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .auth import SECRET_KEY
+
+
+#                    IDEMPOTENCY CONFIG
+
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "local")
+
+# Response kitni der replay hota hai
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Per worker max keys aur max stored response bytes (LRU eviction)
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_MAX_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Duplicate request pehli request ka max itna wait karti hai (phir 409)
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+
+# Yeh errors baad me khud theek ho jaate hai (quota free, OTP window, lock) →
+# store nahi hote; original exception (Retry-After header ke saath) jaata hai
+RETRYABLE_STATUS = {
+    status.HTTP_403_FORBIDDEN,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+
+def _conflict(detail):
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def _mismatch():
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key pehle alag request ke saath use ho chuki hai"
+    )
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "status_code", "body", "size")
+
+    def __init__(self, fingerprint, expires_at):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.status_code = None
+        self.body = None
+        self.size = 0
+
+
+#                    IDEMPOTENCY STORE
+
+
+class IdempotencyStore:
+    """
+    (scope, key) → stored (status_code, JSON body)
+
+    run() blocking hai → sync routes threadpool me chalte hain,
+    isliye duplicate ka wait event loop block nahi karta
+    """
+
+    def __init__(self, durable=IDEMPOTENCY_STORE == "db", ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+                 max_keys=IDEMPOTENCY_MAX_KEYS, max_bytes=IDEMPOTENCY_MAX_BYTES,
+                 wait_seconds=IDEMPOTENCY_WAIT_SECONDS):
+        self.durable = durable
+        self.ttl = ttl_seconds
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+        self.wait_seconds = wait_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # (scope, key) → _Entry
+        self._bytes = 0
+        self._last_cleanup = time.monotonic()
+
+    def run(self, scope, key, fingerprint, execute):
+        """
+        execute() → (status_code, JSON-able body); sirf pehli baar chalta hai
+        (status_code, body, replayed) return karta hai
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((scope, key))
+            if entry is not None and entry.expires_at <= now:
+                self._drop((scope, key))
+                entry = None
+
+            owner = entry is None
+            if owner:
+                entry = self._entries[(scope, key)] = _Entry(fingerprint, now + self.ttl)
+            else:
+                self._entries.move_to_end((scope, key))
+
+        if not owner:
+            if entry.fingerprint != fingerprint:
+                raise _mismatch()
+            if not entry.done.wait(self.wait_seconds):
+                raise _conflict("Isi Idempotency-Key ki request abhi chal rahi hai")
+            if entry.status_code is None:
+                raise _conflict("Isi Idempotency-Key ki pehli request fail hui, dobara try karo")
+            return entry.status_code, entry.body, True
+
+        claimed = False
+        try:
+            stored = self._claim(scope, key, fingerprint) if self.durable else None
+            claimed = self.durable and stored is None
+            if stored is not None:
+                status_code, body = stored
+                replayed = True
+            else:
+                try:
+                    status_code, body = execute()
+                except HTTPException as e:
+                    # 4xx bhi replay hota hai (retry ka result same rehna chahiye)
+                    # 5xx / RETRYABLE_STATUS → key release, retry dobara chalta hai
+                    if e.status_code >= 500 or e.status_code in RETRYABLE_STATUS:
+                        raise
+                    status_code, body = e.status_code, {"detail": e.detail}
+                replayed = False
+
+                if self.durable:
+                    self._finish(scope, key, status_code, body)
+        except BaseException:
+            with self._lock:
+                if self._entries.get((scope, key)) is entry:
+                    self._drop((scope, key))
+            if claimed:
+                self._abort(scope, key)
+            entry.done.set()
+            raise
+
+        size = len(json.dumps(body, default=str))
+        with self._lock:
+            entry.status_code, entry.body, entry.size = status_code, body, size
+            if self._entries.get((scope, key)) is entry:
+                self._bytes += size
+                while self._entries and (len(self._entries) > self.max_keys
+                                         or self._bytes > self.max_bytes):
+                    self._drop(next(iter(self._entries)))
+        entry.done.set()
+
+        return status_code, body, replayed
+
+    def _drop(self, cache_key):
+        entry = self._entries.pop(cache_key)
+        self._bytes -= entry.size
+
+    #           DB STORE (IDEMPOTENCY_STORE=db)
+
+    @staticmethod
+    def _row_id(scope, key):
+        return hashlib.sha256(f"{scope}\0{key}".encode()).hexdigest()
+
+    def _claim(self, scope, key, fingerprint):
+        """
+        Pending row insert → hum owner (None return)
+        Row pehle se hai → doosre worker ka stored response, ya uska wait
+        """
+        from .database import engine
+        from .models import IdempotencyKey
+
+        row_id = self._row_id(scope, key)
+        deadline = time.monotonic() + self.wait_seconds
+        self._cleanup()
+
+        while True:
+            now = datetime.utcnow()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        IdempotencyKey.__table__.insert().values(
+                            id=row_id,
+                            fingerprint=fingerprint,
+                            expires_at=now + timedelta(seconds=self.ttl)
+                        )
+                    )
+                return None
+            except IntegrityError:
+                pass
+
+            with engine.connect() as conn:
+                row = conn.execute(
+                    select(IdempotencyKey).where(IdempotencyKey.id == row_id)
+                ).first()
+
+            if row is None:
+                continue
+            if row.expires_at <= now:
+                with engine.begin() as conn:
+                    conn.execute(
+                        delete(IdempotencyKey).where(
+                            IdempotencyKey.id == row_id,
+                            IdempotencyKey.expires_at <= now
+                        )
+                    )
+                continue
+            if row.fingerprint != fingerprint:
+                raise _mismatch()
+            if row.status_code is not None:
+                return row.status_code, json.loads(row.response)
+            if time.monotonic() > deadline:
+                raise _conflict("Isi Idempotency-Key ki request abhi chal rahi hai")
+            time.sleep(0.05)
+
+    def _finish(self, scope, key, status_code, body):
+        from .database import engine
+        from .models import IdempotencyKey
+
+        with engine.begin() as conn:
+            conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.id == self._row_id(scope, key))
+                .values(status_code=status_code, response=json.dumps(body, default=str))
+            )
+
+    def _abort(self, scope, key):
+        from .database import engine
+        from .models import IdempotencyKey
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    delete(IdempotencyKey).where(
+                        IdempotencyKey.id == self._row_id(scope, key),
+                        IdempotencyKey.status_code.is_(None)
+                    )
+                )
+        except Exception as e:
+            print(" Idempotency key release failed")
+            print(e)
+
+    def _cleanup(self):
+        # Expired rows → har TTL me max ek baar (per worker)
+        from .database import engine
+        from .models import IdempotencyKey
+
+        with self._lock:
+            if time.monotonic() - self._last_cleanup < min(self.ttl, 3600):
+                return
+            self._last_cleanup = time.monotonic()
+
+        with engine.begin() as conn:
+            conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+            )
+
+
+idempotency_store = IdempotencyStore()
+
+
+#                    ROUTE HELPER
+
+
+def idempotent(key, scope, payload, execute, response_model=None, status_code=200):
+    """
+    Route body ko Idempotency-Key ke saath chalata hai
+    key None → seedha execute() (purana behaviour)
+
+    payload → request body (fingerprint), execute() → route ka result
+    """
+    if key is None:
+        return execute()
+    if not key or len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key 1-255 characters ki honi chahiye")
+
+    # HMAC (SECRET_KEY) → body me password ho (send-otp) to bhi stored
+    # fingerprint se offline guess nahi ho sakta
+    fingerprint = hmac.new(
+        SECRET_KEY.encode(),
+        json.dumps(jsonable_encoder(payload), sort_keys=True).encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+    def run():
+        result = execute()
+        if response_model is not None:
+            result = response_model.model_validate(result)
+        return status_code, jsonable_encoder(result)
+
+    code, body, replayed = idempotency_store.run(scope, key, fingerprint, run)
+    return JSONResponse(
+        status_code=code,
+        content=body,
+        headers={"Idempotent-Replayed": "true"} if replayed else None
+    )
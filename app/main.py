@@ -1,17 +1,65 @@
 
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
 # FastAPI core import
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 
 # Database related imports
 
-from .database import engine
-from .models import Base
+from .database import DATABASE_URL, engine, is_memory
+
+# Response compression (gzip / br / zstd)
+from .compression import COMPRESSION_ENABLED, CompressionMiddleware
+
+# Startup warm-up (pool, bcrypt, serializers)
+from .warmup import run_warmup, warmup_state
+
+# Request tracing (spans → local trace files)
+from .tracing import TRACING_ENABLED, TracedJSONResponse, instrument
+
+# On-demand sampling profiler (header mode ke liye middleware)
+from .profiler import install as install_profiler
 
 
 # Routers import
-from .routers import auth, notes, password
+from .routers import account, admin, attachments, auth, folders, notes, password, tags
+
+
+
+# STARTUP (LIFESPAN)
+
+# Import time par ab koi DB kaam nahi hota
+# Tables `python -m app.bootstrap migrate` se bante hain
+# SCHEMA_CHECK_ON_STARTUP=1 → worker start hote hi ek chhoti
+# MAX(version) query se schema version verify hota hai
+SCHEMA_CHECK_ON_STARTUP = os.getenv("SCHEMA_CHECK_ON_STARTUP", "0") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In-memory SQLite (tests) → har process ki DB khaali, migrate yahi
+    if is_memory(DATABASE_URL):
+        from .bootstrap import migrate
+        migrate(engine)
+
+    if SCHEMA_CHECK_ON_STARTUP:
+        from .bootstrap import check_schema
+        check_schema(engine)
 
+    # Warm-up background thread me → event loop block nahi hota,
+    # GET /ready warm-up complete hone tak 503 deta hai (fail → backoff se retry)
+    stop = threading.Event()
+    warmup = asyncio.get_running_loop().run_in_executor(
+        None, run_warmup, engine, app, stop
+    )
+    yield
+    stop.set()
+    await warmup
 
 
 # FastAPI app instance
@@ -19,17 +67,33 @@ from .routers import auth, notes, password
 app = FastAPI(
     title="Secure Notes API",
     description="FastAPI project with JWT Auth, OTP verification & Password Management",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Tracing on → JSON render ka bhi span
+    default_response_class=TracedJSONResponse if TRACING_ENABLED else JSONResponse
 )
 
 
-# DATABASE TABLE CREATE
+# RESPONSE COMPRESSION
 
-# Ye line sabhi SQLAlchemy models ki tables create karegi
-# (User, Notes, EmailOTP etc.)
-# NOTE:
-# Ye sirf first time ya new tables ke liye useful hoti hai
-Base.metadata.create_all(bind=engine)
+# Accept-Encoding ke hisaab se gzip / br / zstd (COMPRESSION_* env settings)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+
+# SAMPLING PROFILER
+
+# POST /admin/profiler mode "header" → X-Profile-Request wali requests ke threads hi
+# sample hote hai; profiler band → middleware sirf ek bool check karta hai
+install_profiler(app)
+
+
+# REQUEST TRACING
+
+# TRACING_ENABLED=1 → har request ka trace (X-Trace-Id header), sampled / slow
+# traces TRACE_EXPORT_DIR me; sabse bahar wala middleware (compression bhi andar)
+if TRACING_ENABLED:
+    instrument(app)
 
 
 # ROUTERS REGISTER
@@ -43,6 +107,23 @@ app.include_router(auth.router)
 # /notes/*
 app.include_router(notes.router)
 
+#  Note attachments APIs (JWT protected)
+# /notes/{note_id}/attachments/*, /notes/attachments/usage
+app.include_router(attachments.router)
+
+#  Folders & tags APIs (JWT protected)
+# /folders/*, /tags/*
+app.include_router(folders.router)
+app.include_router(tags.router)
+
+#  Account APIs (JWT protected)
+# /me/usage, DELETE /me
+app.include_router(account.router)
+
+#  Admin APIs (ADMIN_EMAILS)
+# /admin/profiler
+app.include_router(admin.router)
+
 #  Password APIs
 # /password/forgot
 # /password/reset
@@ -57,3 +138,21 @@ def root():
     return {
         "message": "Secure Notes API is running successfully "
     }
+
+
+# READINESS API
+
+# Load balancer / k8s readiness probe
+# Warm-up complete → 200, warna 503
+@app.get("/ready")
+def ready():
+    status_code = 200 if warmup_state["ready"] else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={
+            "ready": warmup_state["ready"],
+            "warmup_ms": warmup_state["steps"],
+            "error": warmup_state["error"],
+            "attempts": warmup_state["attempts"]
+        }
+    )
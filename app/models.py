@@ -1,7 +1,9 @@
 
 # SQLAlchemy ke columns aur data types
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, ForeignKey, DateTime, Text, Boolean, Index, LargeBinary
+)
 
 # relationship → tables ke beech relation banane ke liye
 
@@ -17,6 +19,11 @@ from datetime import datetime
 from .database import Base
 
 
+# Current schema version
+# Jab bhi models me table / column change ho → ye number badhao
+# aur app/bootstrap.py me matching migration step add karo
+SCHEMA_VERSION = 13
+
 
 #                    USER MODEL
 
@@ -49,13 +56,19 @@ class User(Base):
  
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # DELETE /me → set hote hi login / token band; data background purge hota hai
+    deleted_at = Column(DateTime, nullable=True)
+
     # Relationship: User → Notes (One-to-Many)
     # User delete hoga → uske notes bhi delete honge
+    # passive_deletes → ORM notes load karke ek-ek DELETE nahi karta,
+    # DB ka ON DELETE CASCADE hatata hai (bade users ka purge app/accounts.py me)
   
     notes = relationship(
         "Note",
         back_populates="owner",
-        cascade="all, delete"
+        cascade="all, delete",
+        passive_deletes=True
     )
 
   
@@ -65,7 +78,8 @@ class User(Base):
     otps = relationship(
         "EmailOTP",
         back_populates="user",
-        cascade="all, delete"
+        cascade="all, delete",
+        passive_deletes=True
     )
 
 
@@ -80,8 +94,8 @@ class Note(Base):
     id = Column(Integer, primary_key=True, index=True)
 
     # Note ka title
-    # VARCHAR(200)
-    title = Column(String(200), nullable=False)
+    # Plaintext max 200 chars; encryption on ho to ciphertext (base64) isse lamba
+    title = Column(String(1200), nullable=False)
 
     # Note ka content
     # TEXT → long content ke liye
@@ -90,12 +104,36 @@ class Note(Base):
 
   
     # Foreign key → kis user ka note hai
+    # Shard key bhi yahi hai (har note query user_id se scoped hai)
+    # index → shards par FK nahi hota, to index explicitly chahiye
 
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     # Note creation time
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Optimistic concurrency version
+    # Har update par +1 → client ETag / If-Match me bhejta hai
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Last update time
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # Per-user monotonic change sequence (delta sync cursor)
+    # Har create / update par user ke note_seq counter se next value
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Note kis folder me hai (NULL → root / unfiled)
+    # Shard table hai → FK nahi, folders bhi usi shard par
+    folder_id = Column(Integer, nullable=True)
+
+    # GET /notes/changes?since= → (user_id, change_seq) index range scan
+    # GET /notes?folder_id= → (user_id, folder_id) index
+    __table_args__ = (
+        Index("ix_notes_user_change_seq", "user_id", "change_seq"),
+        Index("ix_notes_user_folder", "user_id", "folder_id"),
+    )
+
 
     # Relationship: Note → User
 
@@ -105,6 +143,266 @@ class Note(Base):
     )
 
 
+#            DELTA SYNC MODELS (SHARD DB)
+
+# Per-user change counter
+# UPDATE ... SET last_seq = last_seq + 1 → row lock se per-user writes
+# commit order me number paate hain, isliye cursor kabhi change skip nahi karta
+class NoteSeq(Base):
+    __tablename__ = "note_seq"
+
+    # users table shard par nahi hai → FK nahi
+    user_id = Column(Integer, primary_key=True)
+
+    last_seq = Column(Integer, nullable=False, default=0)
+
+
+#            COLD NOTES (SHARD DB)
+
+# N din se untouched notes → notes table se yaha (same id / columns)
+# Content zlib compressed; hot notes table aur uske indexes chhote rehte hai
+# Edit / move / delete par note wapas notes me aata hai (app/archive.py)
+class NoteArchive(Base):
+    __tablename__ = "notes_archive"
+
+    # notes.id hi (autoincrement nahi)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+
+    user_id = Column(Integer, nullable=False, index=True)
+
+    title = Column(String(1200), nullable=False)
+
+    # zlib(content ke UTF-8 bytes)
+    content_z = Column(LargeBinary, nullable=False)
+
+    # Original content ke stored bytes (usage reconciliation)
+    content_size = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime)
+
+    version = Column(Integer, nullable=False, default=1)
+
+    updated_at = Column(DateTime)
+
+    change_seq = Column(Integer, nullable=False, default=0)
+
+    folder_id = Column(Integer, nullable=True)
+
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    # Delta sync full resync (since=0) me cold notes bhi
+    __table_args__ = (
+        Index("ix_notes_archive_user_change_seq", "user_id", "change_seq"),
+    )
+
+
+# Delete hue notes ka tombstone → sync clients ko delete bhi pata chale
+class NoteTombstone(Base):
+    __tablename__ = "note_tombstones"
+
+    # Delete hue note ka id
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, nullable=False)
+
+    # Delete ka change sequence
+    change_seq = Column(Integer, nullable=False)
+
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_note_tombstones_user_change_seq", "user_id", "change_seq"),
+    )
+
+
+#            NOTE REVISION MODEL (SHARD DB)
+
+# Har note version ka ek row (history / undo)
+# Write par full copy (INSERT ... SELECT, app tak data nahi aata);
+# compaction job baad me beech wale versions ko line-diff (delta) me badal
+# deta hai aur har REVISION_SNAPSHOT_EVERY versions par full snapshot rakhta hai
+class NoteRevision(Base):
+    __tablename__ = "note_revisions"
+
+    id = Column(Integer, primary_key=True)
+
+    note_id = Column(Integer, nullable=False)
+
+    user_id = Column(Integer, nullable=False)
+
+    # Note ka version number (Note.version)
+    revision = Column(Integer, nullable=False)
+
+    # "snapshot" → data = poora content (keyframe), "delta" → data = previous
+    # revision se diff (JSON), "full" → purana uncompacted poora content
+    kind = Column(String(10), nullable=False, default="full")
+
+    title = Column(String(1200), nullable=False)
+
+    data = Column(Text, nullable=False)
+
+    # Reconstructed content ki length (listing me bina decode kiye)
+    size = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_note_revisions_note_revision", "note_id", "revision", unique=True),
+    )
+
+
+#            FOLDER / TAG MODELS (SHARDED)
+
+# Folder hierarchy → materialized path ("/<root id>/<child id>/.../<id>/")
+# Subtree = path prefix → (user_id, path) index par ek range scan, recursive
+# query nahi. note_count / total_count note add / move / delete ke saath
+# incrementally update hote hai (listing me COUNT(*) nahi)
+class Folder(Base):
+    __tablename__ = "folders"
+
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, nullable=False)
+
+    # NULL → top level folder
+    parent_id = Column(Integer, nullable=True)
+
+    name = Column(String(255), nullable=False)
+
+    # Root se is folder tak ke ids (apna id bhi), "/" se alag
+    # 512 → MySQL utf8mb4 index limit ke andar (depth FOLDER_MAX_DEPTH tak)
+    path = Column(String(512), nullable=False)
+
+    # Sirf is folder ke notes / poore subtree ke notes
+    note_count = Column(Integer, nullable=False, default=0)
+    total_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_folders_user_path", "user_id", "path", unique=True),
+        Index("ix_folders_user_parent", "user_id", "parent_id"),
+    )
+
+
+# User ke tags (naam per user unique)
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, nullable=False)
+
+    name = Column(String(100), nullable=False)
+
+    # Is tag wale notes (note_tags insert / delete ke saath +1 / -1)
+    note_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_tags_user_name", "user_id", "name", unique=True),
+    )
+
+
+# Note ↔ Tag (many-to-many)
+class NoteTag(Base):
+    __tablename__ = "note_tags"
+
+    id = Column(Integer, primary_key=True)
+
+    note_id = Column(Integer, nullable=False)
+
+    tag_id = Column(Integer, nullable=False)
+
+    user_id = Column(Integer, nullable=False)
+
+    # GET /notes?tag= → (user_id, tag_id) range se note ids (covering index)
+    # Note ke tags / duplicate check → (note_id, tag_id) unique
+    __table_args__ = (
+        Index("ix_note_tags_user_tag_note", "user_id", "tag_id", "note_id"),
+        Index("ix_note_tags_note_tag", "note_id", "tag_id", unique=True),
+    )
+
+
+#            ATTACHMENT MODELS (SHARDED)
+
+# Note ki file attachment → metadata yaha, bytes blob store (app/blobstore.py) me
+class Attachment(Base):
+    __tablename__ = "attachments"
+
+    id = Column(Integer, primary_key=True)
+
+    note_id = Column(Integer, nullable=False, index=True)
+
+    user_id = Column(Integer, nullable=False, index=True)
+
+    filename = Column(String(255), nullable=False)
+
+    content_type = Column(String(100), nullable=False)
+
+    # Poori file ka size (bytes) aur sha256 (ETag)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# File = chunks ki ordered list; har chunk content hash se blob store me
+# Same chunk kai files / users me ho to bhi disk par ek hi baar
+class AttachmentChunk(Base):
+    __tablename__ = "attachment_chunks"
+
+    id = Column(Integer, primary_key=True)
+
+    attachment_id = Column(Integer, nullable=False)
+
+    user_id = Column(Integer, nullable=False, index=True)
+
+    seq = Column(Integer, nullable=False)
+
+    # Chunk ka sha256 (blob store key); GC isi index se live chunks dhoondta hai
+    chunk_hash = Column(String(64), nullable=False, index=True)
+
+    # File me chunk ka start byte → Range request sirf zaruri chunks padhti hai
+    offset = Column(BigInteger, nullable=False)
+    size = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_attachment_chunks_attachment_seq", "attachment_id", "seq", unique=True),
+    )
+
+
+# Per-user storage usage (incremental, attachment insert / delete ke
+# same transaction me update)
+class UserStorage(Base):
+    __tablename__ = "user_storage"
+
+    user_id = Column(Integer, primary_key=True)
+
+    bytes_used = Column(BigInteger, nullable=False, default=0)
+
+    attachment_count = Column(Integer, nullable=False, default=0)
+
+
+#            USER NOTE STATS (SHARD DB)
+
+# Note count / content bytes → note insert / update / delete ke same
+# transaction me +n / -n (quota check ek row read, kabhi COUNT(*) / SUM() nahi)
+# content_bytes = stored bytes (encryption on → ciphertext ke)
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, primary_key=True)
+
+    note_count = Column(Integer, nullable=False, default=0)
+
+    content_bytes = Column(BigInteger, nullable=False, default=0)
+
+    # Reconciliation job ne aakhri baar kab check kiya
+    reconciled_at = Column(DateTime, nullable=True)
+
+
 #            EMAIL OTP MODEL 
 
 """
@@ -135,7 +433,7 @@ class EmailOTP(Base):
 
     # OTP verify hone ke baad user_id fill hota hai
     
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
 
    
     # 6 digit OTP cod
@@ -165,3 +463,158 @@ class EmailOTP(Base):
         "User",
         back_populates="otps"
     )
+
+
+#            SCHEMA VERSION MODEL
+
+# Har applied migration ka ek row
+# Startup check sirf MAX(version) padhta hai (ek chhoti query)
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+
+    # Migration ka short description
+    description = Column(String(200), nullable=False)
+
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+#            SHARD ROUTING MODELS (PRIMARY DB)
+
+# User → shard mapping (routing table)
+# Pehle note write par consistent hash ring se shard assign hota hai,
+# uske baad user sirf explicit rebalance se hi move hota hai
+class ShardRoute(Base):
+    __tablename__ = "shard_routes"
+
+    user_id = Column(Integer, primary_key=True)
+
+    shard_id = Column(Integer, nullable=False)
+
+    # True → user ke notes move ho rahe hain, writes band (503)
+    moving = Column(Boolean, nullable=False, default=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Rebalancing progress (resumable)
+# state: copying → freezing → cleanup → done
+class ShardMove(Base):
+    __tablename__ = "shard_moves"
+
+    user_id = Column(Integer, primary_key=True)
+
+    source_shard = Column(Integer, nullable=False)
+    target_shard = Column(Integer, nullable=False)
+
+    state = Column(String(20), nullable=False, default="copying")
+
+    # Copy phase me last copy hua note id (resume yahi se)
+    last_note_id = Column(Integer, nullable=False, default=0)
+
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Hi/lo id allocator
+# Shards ke autoincrement alag-alag chalte hain → note ids globally unique
+# rakhne ke liye worker primary se ids ka block reserve karta hai
+class IdAllocator(Base):
+    __tablename__ = "id_allocator"
+
+    name = Column(String(50), primary_key=True)
+
+    next_id = Column(Integer, nullable=False)
+
+
+#            CHANGE EVENTS (PRIMARY DB)
+
+# EVENT_BUS=db → multi-worker fan-out ka DB-notify stand-in
+# Writer yaha ek row daalta hai, har worker ka ek poller id > last padhta hai
+class ChangeEvent(Base):
+    __tablename__ = "change_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    user_id = Column(Integer, nullable=False)
+
+    # JSON event (type, note id, change_seq)
+    payload = Column(String(255), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+#            NOTE DATA KEYS (PRIMARY DB)
+
+# Envelope encryption → har user ki apni AES-256 data key,
+# master key (NOTE_MASTER_KEYS) se wrapped form me store
+# Rotation → naya generation; purane generations purane ciphertext ke liye rehte hai
+class UserKey(Base):
+    __tablename__ = "user_keys"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    generation = Column(Integer, primary_key=True)
+
+    # Kis master key se wrap hua (rewrap ke liye)
+    master_key_id = Column(String(32), nullable=False)
+
+    # base64(nonce + AES-GCM(data key))
+    wrapped_key = Column(String(255), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+#            IDEMPOTENCY KEYS (PRIMARY DB)
+
+# IDEMPOTENCY_STORE=db → multiple workers ke beech Idempotency-Key state
+# status_code NULL → pehli request abhi chal rahi hai
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256(scope + key)
+    id = Column(String(64), primary_key=True)
+
+    # Request body ka sha256 → same key, alag body → 422
+    fingerprint = Column(String(64), nullable=False)
+
+    status_code = Column(Integer, nullable=True)
+
+    # Stored JSON response
+    response = Column(Text, nullable=True)
+
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+#            OTP SEND COUNTS (PRIMARY DB)
+
+# Email ke har ghante (window_start) ke OTP sends → limit check ek row par
+# Purani windows reconciliation job hatata hai
+class OtpSendCount(Base):
+    __tablename__ = "otp_send_counts"
+
+    email = Column(String(150), primary_key=True)
+
+    window_start = Column(DateTime, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+
+#            ACCOUNT DELETIONS (PRIMARY DB)
+
+# DELETE /me ka purge progress (users row purge ke end me hat jaata hai,
+# ye row rehti hai → purge rate / audit)
+class AccountDeletion(Base):
+    __tablename__ = "account_deletions"
+
+    user_id = Column(Integer, primary_key=True)
+
+    requested_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    started_at = Column(DateTime, nullable=True)
+
+    # NULL → purge baaki hai (crash ke baad `python -m app.accounts purge`)
+    finished_at = Column(DateTime, nullable=True)
+
+    rows_deleted = Column(BigInteger, nullable=False, default=0)
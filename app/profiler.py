@@ -0,0 +1,446 @@
+
+# On-demand sampling profiler (production CPU investigations)
+#
+# Admin endpoint se ek worker par N seconds ke liye profiler on:
+#
+#   mode "worker" → is worker ke saare threads (event loop + threadpool)
+#   mode "header" → sirf `X-Profile-Request: 1` wali requests ke threads:
+#                   threadpool thread jo flagged sync endpoint chala raha hai,
+#                   aur event loop thread tabhi jab woh flagged request ka hi
+#                   code chala raha ho (doosri requests sample nahi hoti)
+#
+# Sampler ek daemon thread hai jo har PROFILER_INTERVAL_MS par
+# sys._current_frames() se har thread ka stack padhta hai (tracing hooks /
+# setprofile nahi → profiled code ki speed par asar sirf ek thread ke jagne
+# jitna). Idle threads (lock / select / queue wait) skip.
+#
+# Output PROFILER_OUTPUT_DIR me:
+#   profile-<pid>-<time>.collapsed → "root;child;leaf count" (flamegraph.pl,
+#                                    speedscope, inferno sab padhte hai)
+#   profile-<pid>-<time>.svg       → flamegraph (browser me kholo)
+#
+# Disabled → koi thread nahi; middleware ek bool check karta hai
+#
+#   python -m app.profiler svg profiles/profile-1-....collapsed out.svg
+#   python -m app.profiler bench --seconds 3
+
+
+import contextvars
+import functools
+import html
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+#                    PROFILER CONFIG
+
+# Collapsed stacks + SVG yaha
+PROFILER_OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "profiles")
+
+# Default sampling interval (ms); 10 ms → 100 Hz
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+
+# Ek profile ki max length (seconds)
+PROFILER_MAX_SECONDS = int(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+# Header mode me is header wali requests profile hoti hai
+PROFILE_REQUEST_HEADER = os.getenv("PROFILE_REQUEST_HEADER", "X-Profile-Request")
+
+# Stack ke leaf frame (file, function) → thread idle hai, sample mat karo
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+#                    STACKS
+
+
+_labels = {}   # code object → "func (file:line)" (har sample par string format nahi)
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        # site-packages / stdlib ke lambe paths → package se shuru
+        for marker in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+                break
+        else:
+            filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+        label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def sample_stacks(skip_thread=None, threads=None) -> list:
+    """
+    Har (non-idle) thread ka stack → root se leaf tak labels ka tuple
+    threads → {thread id: required code object ya None}: sirf yahi threads,
+    aur required ho to sirf tab jab stack me woh frame ho
+    """
+    stacks = []
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == skip_thread:
+            continue
+        if threads is not None and thread_id not in threads:
+            continue
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+            continue
+
+        required = threads.get(thread_id) if threads is not None else None
+        stack = []
+        while frame is not None:
+            if frame.f_code is required:
+                required = None
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+        if required is not None:
+            continue
+        stack.reverse()
+        stacks.append(tuple(stack))
+    return stacks
+
+
+def write_collapsed(counts: dict, path: str):
+    with open(path, "w") as f:
+        for stack, count in sorted(counts.items(), key=lambda item: -item[1]):
+            f.write(f"{';'.join(stack)} {count}\n")
+
+
+def read_collapsed(path: str) -> dict:
+    counts = {}
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                key = tuple(stack.split(";"))
+                counts[key] = counts.get(key, 0) + int(count)
+    return counts
+
+
+#                    FLAMEGRAPH SVG
+
+
+def flamegraph_svg(counts: dict, title: str, width: int = 1200, row: int = 17,
+                   min_width: float = 0.5) -> str:
+    """
+    Collapsed stacks → self-contained SVG flamegraph (root neeche, leaves upar)
+    min_width px se patle frames draw nahi hote (file chhoti)
+    """
+    tree = {"children": {}, "count": 0}
+    for stack, count in counts.items():
+        node = tree
+        node["count"] += count
+        for label in stack:
+            node = node["children"].setdefault(label, {"children": {}, "count": 0})
+            node["count"] += count
+
+    total = tree["count"] or 1
+    scale = (width - 20) / total
+    rects = []
+
+    def depth_of(node):
+        return 1 + max((depth_of(child) for child in node["children"].values()), default=0)
+
+    depth = depth_of(tree)
+    height = (depth + 2) * row + 30
+
+    def draw(node, label, x, level):
+        w = node["count"] * scale
+        if w < min_width:
+            return
+        y = height - (level + 1) * row - 10
+        pct = node["count"] * 100 / total
+        # Naam se stable warm colour (flamegraph.pl jaisa)
+        seed = sum(map(ord, label)) if label else 0
+        colour = f"rgb({205 + seed % 50},{80 + seed * 7 % 130},{40 + seed * 13 % 50})"
+        text = html.escape(label)
+        chars = int(w / 7)
+        shown = text if len(label) <= chars else (html.escape(label[:chars - 2]) + ".." if chars > 3 else "")
+        rects.append(
+            f'<g><title>{text} ({node["count"]} samples, {pct:.2f}%)</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" fill="{colour}" rx="2"/>'
+            f'<text x="{x + 3:.1f}" y="{y + row - 5}">{shown}</text></g>'
+        )
+        child_x = x
+        for child_label, child in sorted(node["children"].items()):
+            draw(child, child_label, child_x, level + 1)
+            child_x += child["count"] * scale
+
+    draw(tree, "all", 10, 0)
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<rect width="100%" height="100%" fill="#fdfdf5"/>'
+        f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="15">{html.escape(title)}</text>'
+        + "".join(rects) + "</svg>\n"
+    )
+
+
+#                    SAMPLING PROFILER
+
+
+class SamplingProfiler:
+    """
+    Per-worker ek hi profile ek waqt par (start → stop / N seconds → files)
+    State sirf is process ka → jis worker par admin request gayi wahi profile hota hai
+    """
+
+    def __init__(self, output_dir=PROFILER_OUTPUT_DIR):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.active = None          # chal rahe profile ki info (dict)
+        self.last = None            # aakhri complete profile
+        self.header_mode = False    # middleware sirf yahi check karta hai
+        self._threads = {}          # header mode: thread id → [flagged calls, required code]
+
+    def start(self, seconds: float, interval_ms: float = PROFILER_INTERVAL_MS,
+              mode: str = "worker") -> dict:
+        """
+        Profile shuru → info dict; pehle se chal raha hai → None
+        """
+        with self._lock:
+            if self._thread is not None:
+                return None
+
+            now = datetime.utcnow()
+            stamp = now.strftime("%Y%m%d-%H%M%S-%f")[:-3]
+            base = os.path.join(self.output_dir, f"profile-{os.getpid()}-{stamp}")
+            self.active = {
+                "pid": os.getpid(), "mode": mode, "seconds": seconds,
+                "interval_ms": interval_ms, "started_at": now,
+                "collapsed_path": base + ".collapsed", "svg_path": base + ".svg",
+                "samples": 0
+            }
+            self._stop.clear()
+            self.header_mode = mode == "header"
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, interval_ms / 1000, mode),
+                name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+            return dict(self.active)
+
+    def stop(self):
+        """Chal raha profile jaldi band (files phir bhi likhi jaati hai)"""
+        self._stop.set()
+
+    def enter_thread(self, required=None):
+        """
+        Current thread flagged request ka kaam kar raha hai → header mode me
+        sirf aise threads sample hote hai. required → sirf tab jab stack me
+        is code object ka frame ho (event loop thread doosri requests bhi chalata hai)
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            entry = self._threads.setdefault(thread_id, [0, required])
+            entry[0] += 1
+
+    def exit_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            entry = self._threads[thread_id]
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del self._threads[thread_id]
+
+    def _flagged_threads(self):
+        with self._lock:
+            return {thread_id: entry[1] for thread_id, entry in self._threads.items()}
+
+    def _run(self, seconds, interval, mode):
+        counts = {}
+        samples = 0
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                threads = None if mode == "worker" else self._flagged_threads()
+                if threads is None or threads:
+                    for stack in sample_stacks(skip_thread=me, threads=threads):
+                        counts[stack] = counts.get(stack, 0) + 1
+                    samples += 1
+                    self.active["samples"] = samples
+                self._stop.wait(interval)
+        finally:
+            self.header_mode = False
+            info = self.active
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                write_collapsed(counts, info["collapsed_path"])
+                with open(info["svg_path"], "w") as f:
+                    f.write(flamegraph_svg(
+                        counts, f"pid {info['pid']} {info['mode']} {info['started_at']:%Y-%m-%d %H:%M:%S} "
+                                f"({samples} samples @ {info['interval_ms']} ms)"
+                    ))
+            except OSError as e:
+                info["error"] = repr(e)
+
+            with self._lock:
+                self.last = {**info, "finished_at": datetime.utcnow(), "samples": samples}
+                self.active = None
+                self._thread = None
+
+
+profiler = SamplingProfiler()
+
+
+#                    MIDDLEWARE
+
+
+# Flagged request ka context → threadpool me chalne wala endpoint bhi isse dekhta hai
+_profile_request = contextvars.ContextVar("profile_request", default=False)
+
+
+class ProfilerMiddleware:
+    """
+    Header mode me flagged request ke dauraan event loop thread register
+    (sirf is middleware ke frame ke andar wale samples); sync endpoint ka
+    threadpool thread install() wala wrapper register karta hai
+    Profiler band → sirf ek attribute check
+    """
+
+    def __init__(self, app, profiler=profiler, header=PROFILE_REQUEST_HEADER):
+        self.app = app
+        self.profiler = profiler
+        self.header = header.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.header_mode or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        flagged = any(
+            name == self.header and value.strip() not in (b"", b"0")
+            for name, value in scope["headers"]
+        )
+        if not flagged:
+            await self.app(scope, receive, send)
+            return
+
+        await self._flagged(scope, receive, send)
+
+    async def _flagged(self, scope, receive, send):
+        token = _profile_request.set(True)
+        self.profiler.enter_thread(required=ProfilerMiddleware._flagged.__code__)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.exit_thread()
+            _profile_request.reset(token)
+
+
+def install(app, profiler=profiler):
+    """
+    main.py se: middleware + FastAPI ke sync endpoint call ka wrapper
+    (flagged request ka endpoint jis threadpool thread par chale woh register)
+    """
+    import fastapi.routing
+    from starlette.concurrency import run_in_threadpool
+
+    # Route handler isse module-level naam se bulata hai (tracing.instrument jaisa)
+    run_endpoint_function = fastapi.routing.run_endpoint_function
+
+    @functools.wraps(run_endpoint_function)
+    async def profiled_run_endpoint_function(*, dependant, values, is_coroutine):
+        if is_coroutine or not _profile_request.get():
+            return await run_endpoint_function(
+                dependant=dependant, values=values, is_coroutine=is_coroutine
+            )
+
+        def call():
+            profiler.enter_thread()
+            try:
+                return dependant.call(**values)
+            finally:
+                profiler.exit_thread()
+
+        return await run_in_threadpool(call)
+
+    fastapi.routing.run_endpoint_function = profiled_run_endpoint_function
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+
+
+#                    BENCHMARK
+
+
+def benchmark(seconds: float = 3.0, intervals=(10.0, 1.0)):
+    """
+    CPU-bound kaam (json + pydantic jaisa dict churn) ka throughput:
+    profiler off vs on (har interval par) → overhead %
+    """
+    import json
+    import tempfile
+
+    def work():
+        data = [{"id": i, "title": f"note {i}", "tags": ["a", "b"]} for i in range(200)]
+        return len(json.loads(json.dumps(data)))
+
+    def throughput():
+        done = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            work()
+            done += 1
+        return done / seconds
+
+    bench = SamplingProfiler(output_dir=os.path.join(tempfile.mkdtemp(), "profiles"))
+    throughput()    # warm-up (CPU frequency, allocator)
+    baseline = throughput()
+    print(f"profiler off            : {baseline:>10.0f} ops/s")
+    for interval in intervals:
+        bench.start(seconds * 2, interval)
+        result = throughput()
+        bench.stop()
+        while bench.active is not None:
+            time.sleep(0.01)
+        print(f"profiler on @ {interval:>5.1f} ms : {result:>10.0f} ops/s  "
+              f"({(baseline - result) * 100 / baseline:+.1f}% overhead, "
+              f"{bench.last['samples']} samples)")
+    print(f"last flamegraph: {bench.last['svg_path']}")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.profiler")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    svg = sub.add_parser("svg", help="collapsed stacks file → flamegraph SVG")
+    svg.add_argument("collapsed")
+    svg.add_argument("output")
+
+    bench = sub.add_parser("bench", help="profiler on / off throughput")
+    bench.add_argument("--seconds", type=float, default=3.0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "svg":
+        with open(args.output, "w") as f:
+            f.write(flamegraph_svg(read_collapsed(args.collapsed), os.path.basename(args.collapsed)))
+        print(f"wrote {args.output}")
+    else:
+        benchmark(args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+
+# Bulk user provisioning (CSV import)
+#
+# Enterprise onboarding me hazaaron accounts → /register/send-otp +
+# /register/verify-otp se har user ka ek bcrypt hash aur kai commits, ek ke
+# baad ek. Ye admin command:
+#
+#   - CSV stream karta hai (poori file memory me nahi), chunk by chunk
+#   - har row UserRegisterRequest schema se validate (email format waghera)
+#   - bcrypt hashes process pool me parallel (hash CPU-bound hai, GIL ke
+#     bahar har core par ek)
+#   - users chunk ke ek bulk INSERT me; duplicates (CSV ke andar / DB me
+#     pehle se) report hote hai, insert nahi
+#
+#   python -m app.provisioning import users.csv --report report.csv
+#   python -m app.provisioning bench --users 200 --workers 1,4
+#
+# CSV columns: name,email[,password]. Password khaali → random password;
+# user /password/forgot se apna set karta hai.
+
+
+import csv
+import os
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from .auth import hash_password
+from .models import User
+from .schemas import UserRegisterRequest
+
+
+#                    IMPORT CONFIG
+
+# Ek bulk INSERT (aur ek hashing round) me kitne users
+PROVISION_CHUNK_SIZE = int(os.getenv("PROVISION_CHUNK_SIZE", "500"))
+
+# Hashing processes (default → saare cores)
+PROVISION_WORKERS = int(os.getenv("PROVISION_WORKERS", str(os.cpu_count() or 1)))
+
+# bcrypt 72 bytes se lamba password reject karta hai (ValueError);
+# users.email String(150) → lamba email INSERT par DataError
+MAX_PASSWORD_BYTES = 72
+MAX_EMAIL_LENGTH = User.__table__.c.email.type.length
+
+
+#                    CSV → VALID ROWS
+
+
+def _rows(path):
+    """
+    (line, name, email, password | None) ya (line, None, raw email, error)
+    File line by line padhi jaati hai
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            line = reader.line_num
+            password = (row.get("password") or "").strip()
+            try:
+                user = UserRegisterRequest(
+                    name=(row.get("name") or "").strip(),
+                    email=(row.get("email") or "").strip(),
+                    password=password or secrets.token_urlsafe(24)
+                )
+            except ValidationError as e:
+                error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                yield line, None, row.get("email"), error
+                continue
+
+            if not user.name or len(user.name) > 100:
+                yield line, None, user.email, "name: 1-100 characters ka hona chahiye"
+                continue
+            if len(user.email) > MAX_EMAIL_LENGTH:
+                yield line, None, user.email, f"email: {MAX_EMAIL_LENGTH} characters se lamba nahi"
+                continue
+            if len(user.password.encode("utf-8")) > MAX_PASSWORD_BYTES:
+                yield line, None, user.email, f"password: {MAX_PASSWORD_BYTES} bytes (UTF-8) se lamba nahi"
+                continue
+            # Lowercase store → exact (indexed) match; "Bob@x.com" aur "bob@x.com" ek hi user
+            yield line, user.name, user.email.lower(), user.password
+
+
+#                    IMPORT
+
+
+class ImportReport:
+    """
+    Counts + (line, email, status, detail) rows report CSV ke liye
+    """
+
+    def __init__(self, writer=None):
+        self.writer = writer
+        self.counts = {"created": 0, "duplicate": 0, "invalid": 0}
+
+    def add(self, line, email, status, detail=""):
+        self.counts[status] += 1
+        if self.writer is not None:
+            self.writer.writerow([line, email, status, detail])
+
+
+def _insert_chunk(bind, chunk, hashes, report):
+    """
+    Chunk ka ek bulk INSERT; kisi row par IntegrityError (beech me kisi ne
+    wahi email register kar liya) → chunk row-by-row taaki baaki users bane
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"name": name, "email": email, "hashed_password": hashed, "created_at": now}
+        for (_, name, email, _), hashed in zip(chunk, hashes)
+    ]
+
+    try:
+        with bind.begin() as conn:
+            conn.execute(insert(User), rows)
+    except IntegrityError:
+        for (line, _, email, _), row in zip(chunk, rows):
+            try:
+                with bind.begin() as conn:
+                    conn.execute(insert(User), [row])
+            except IntegrityError:
+                report.add(line, email, "duplicate", "email pehle se registered")
+                continue
+            report.add(line, email, "created")
+        return
+
+    for line, _, email, _ in chunk:
+        report.add(line, email, "created")
+
+
+def import_users(bind, path, report: ImportReport, workers=PROVISION_WORKERS,
+                 chunk_size=PROVISION_CHUNK_SIZE, log=print) -> dict:
+    """
+    CSV se users → counts dict (+ seconds, users_per_min)
+    Har chunk: DB duplicates ek IN query se hatao, baaki ke hashes pool me,
+    phir ek bulk INSERT (hashing hi bottleneck hai, insert ms ka)
+    """
+    started = time.perf_counter()
+    seen = set()
+
+    def flush(chunk, pool):
+        # Emails _rows() me lowercase ho chuke → users.email index wala IN lookup
+        with bind.connect() as conn:
+            existing = set(conn.execute(
+                select(User.email).where(User.email.in_([email for _, _, email, _ in chunk]))
+            ).scalars())
+
+        fresh = []
+        for item in chunk:
+            if item[2] in existing:
+                report.add(item[0], item[2], "duplicate", "email pehle se registered")
+            else:
+                fresh.append(item)
+        if not fresh:
+            return
+
+        passwords = [password for _, _, _, password in fresh]
+        if pool is None:
+            hashes = [hash_password(password) for password in passwords]
+        else:
+            hashes = list(pool.map(hash_password, passwords,
+                                   chunksize=max(1, len(passwords) // (workers * 4))))
+        _insert_chunk(bind, fresh, hashes, report)
+
+        done = report.counts["created"]
+        log(f"{done} created ({done * 60 / (time.perf_counter() - started):.0f} users/min)")
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        chunk = []
+        for line, name, email, value in _rows(path):
+            if name is None:
+                report.add(line, email, "invalid", value)
+                continue
+            if email in seen:
+                report.add(line, email, "duplicate", "CSV me pehle aa chuka")
+                continue
+            seen.add(email)
+
+            chunk.append((line, name, email, value))
+            if len(chunk) >= chunk_size:
+                flush(chunk, pool)
+                chunk = []
+        if chunk:
+            flush(chunk, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    seconds = time.perf_counter() - started
+    return {
+        **report.counts,
+        "seconds": seconds,
+        "users_per_min": report.counts["created"] * 60 / seconds if seconds else 0
+    }
+
+
+#                    BENCHMARK
+
+
+def benchmark(users: int, workers_list, chunk_size=PROVISION_CHUNK_SIZE):
+    """
+    Temp CSV (5% invalid emails, 5% duplicate) + temp SQLite file par import,
+    har workers count ke liye users/min. Saath me insert path alag se:
+    per-user commit (verify-otp jaisa) vs chunked bulk INSERT (hash pehle se)
+    """
+    import tempfile
+
+
+    from .database import Base, create_db_engine
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "users.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "password"])
+        for i in range(users):
+            if i % 20 == 7:
+                writer.writerow([f"user {i}", f"not-an-email-{i}", "pw"])
+            elif i % 20 == 13:
+                writer.writerow([f"user {i}", f"user{i - 1}@example.com", "pw"])
+            else:
+                writer.writerow([f"user {i}", f"user{i}@example.com", f"password-{i}"])
+
+    print(f"{users} CSV rows, chunk {chunk_size}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}  {'seconds':>8}  {'users/min':>10}  created / duplicate / invalid")
+    for workers in workers_list:
+        bind = create_db_engine(f"sqlite:///{os.path.join(tmp, f'bench_{workers}.db')}")
+        Base.metadata.create_all(bind)
+        result = import_users(bind, path, ImportReport(), workers, chunk_size, log=lambda msg: None)
+        print(f"{workers:>8}  {result['seconds']:>8.1f}  {result['users_per_min']:>10.0f}  "
+              f"{result['created']} / {result['duplicate']} / {result['invalid']}")
+
+    hashed = hash_password("x")
+    rows = [{"name": f"u{i}", "email": f"insert{i}@example.com", "hashed_password": hashed}
+            for i in range(max(users, 2000))]
+    for label, chunked in (("per-user commit", False), ("bulk insert", True)):
+        bind = create_db_engine(f"sqlite:///{os.path.join(tmp, f'insert_{chunked}.db')}")
+        Base.metadata.create_all(bind)
+        started = time.perf_counter()
+        if chunked:
+            for start in range(0, len(rows), chunk_size):
+                with bind.begin() as conn:
+                    conn.execute(insert(User), rows[start:start + chunk_size])
+        else:
+            for row in rows:
+                with bind.begin() as conn:
+                    conn.execute(insert(User), [row])
+        seconds = time.perf_counter() - started
+        print(f"insert only, {label:<16}: {len(rows) * 60 / seconds:>10.0f} users/min")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.provisioning")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="CSV (name,email[,password]) se users")
+    imp.add_argument("csv_path")
+    imp.add_argument("--report", help="line,email,status,detail CSV yaha likho")
+    imp.add_argument("--workers", type=int, default=PROVISION_WORKERS)
+    imp.add_argument("--chunk-size", type=int, default=PROVISION_CHUNK_SIZE)
+
+    bench = sub.add_parser("bench", help="hashing workers / bulk insert throughput")
+    bench.add_argument("--users", type=int, default=200)
+    bench.add_argument("--workers", default=f"1,{PROVISION_WORKERS}",
+                       help="comma separated process counts")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        workers = sorted({int(w) for w in args.workers.split(",")})
+        benchmark(args.users, workers)
+        return
+
+    from .database import engine
+
+    report_file = open(args.report, "w", newline="") if args.report else None
+    try:
+        writer = None
+        if report_file is not None:
+            writer = csv.writer(report_file)
+            writer.writerow(["line", "email", "status", "detail"])
+        result = import_users(engine, args.csv_path, ImportReport(writer),
+                              args.workers, args.chunk_size)
+    finally:
+        if report_file is not None:
+            report_file.close()
+
+    print(f"created {result['created']}, duplicate {result['duplicate']}, "
+          f"invalid {result['invalid']} in {result['seconds']:.1f}s "
+          f"({result['users_per_min']:.0f} users/min)")
+
+
+if __name__ == "__main__":
+    main()
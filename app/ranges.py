@@ -0,0 +1,52 @@
+
+# HTTP Range header helpers (attachments / large note bodies)
+
+
+from fastapi import HTTPException, status
+
+
+def parse_range(header, size: int):
+    """
+    "bytes=a-b" / "bytes=a-" / "bytes=-n" → (start, end) inclusive
+    Header nahi, multi-range ya samajh nahi aaya → None (poora content, 200)
+    Range file ke bahar → 416
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range → aakhri n bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start > end and first and last:
+        return None
+    if start >= size or size == 0:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range content ke bahar hai",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    return start, min(end, size - 1)
+
+
+def range_headers(byte_range, size: int) -> dict:
+    """
+    Response headers (Content-Length, aur partial ho to Content-Range)
+    """
+    start, end = byte_range if byte_range else (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(max(end - start + 1, 0))
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return headers
@@ -0,0 +1,479 @@
+# Note revision history (delta-encoded)
+#
+# Har write same transaction me ek revision likhta hai:
+#   - create → "snapshot" (full content, INSERT ... SELECT FROM notes)
+#   - update → previous version se line-based "delta"; har
+#     REVISION_SNAPSHOT_EVERY versions par (ya previous na mile / delta content
+#     ke aadhe se bada ho) "snapshot" keyframe
+# Storage edit ke size se badhta hai, note ke size se nahi.
+# Kisi bhi version ka reconstruction → nearest snapshot + max
+# (REVISION_SNAPSHOT_EVERY - 1) deltas.
+#
+# Compaction job ab sirf purane "full" rows (write-time encoding se pehle ke)
+# ko snapshot / delta me badalta hai aur retention lagata hai:
+#   - REVISION_KEEP / REVISION_KEEP_DAYS se purane versions delete
+#
+# Encryption on ho to snapshot / delta bhi encrypt hoke likhe jaate hai.
+#
+#   python -m app.revisions compact                        → saare shards
+#   python -m app.revisions bench --revisions 1000         → write amplification + reconstruction time
+
+
+import argparse
+import difflib
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, literal, or_, select
+
+from .encryption import note_cipher
+from .models import Note, NoteRevision
+
+
+#                    REVISION CONFIG
+
+# Har kitne versions par full snapshot
+REVISION_SNAPSHOT_EVERY = int(os.getenv("REVISION_SNAPSHOT_EVERY", "20"))
+
+# Per note max revisions (0 → unlimited)
+REVISION_KEEP = int(os.getenv("REVISION_KEEP", "1000"))
+
+# Isse purane revisions delete (0 → unlimited); latest hamesha rehta hai
+REVISION_KEEP_DAYS = int(os.getenv("REVISION_KEEP_DAYS", "0"))
+
+FULL_KINDS = ("full", "snapshot")
+
+
+#                    DELTA ENCODING
+
+
+def make_delta(base: str, new: str) -> str:
+    """
+    Line-based diff → compact JSON list
+      [i, j]  → base ki lines i..j copy
+      "text"  → naya text
+    """
+    base_lines = base.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+
+    # Common prefix / suffix pehle hi → difflib sirf badle hue beech ke hisse par
+    # (write path par chalta hai; ek line ka edit poore note ka diff na ho)
+    head = 0
+    limit = min(len(base_lines), len(new_lines))
+    while head < limit and base_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while (tail < limit - head
+           and base_lines[len(base_lines) - 1 - tail] == new_lines[len(new_lines) - 1 - tail]):
+        tail += 1
+
+    ops = [[0, head]] if head else []
+    matcher = difflib.SequenceMatcher(
+        None, base_lines[head:len(base_lines) - tail], new_lines[head:len(new_lines) - tail],
+        autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([head + i1, head + i2])
+        elif j2 > j1:
+            ops.append("".join(new_lines[head + j1:head + j2]))
+    if tail:
+        ops.append([len(base_lines) - tail, len(base_lines)])
+
+    return json.dumps(ops, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return "".join(parts)
+
+
+#                    WRITE PATH
+
+
+def _insert_from_notes(db, note_ids, kind, data=Note.content, size=None):
+    """
+    notes rows se revisions (same transaction, title / version DB se)
+    data na diya ho → note ka stored content
+    size → plaintext length (int, ya {note_id: length}); na diya ho to stored
+    content ki length (sirf plaintext rows ke liye sahi)
+    """
+    from .sharding import shard_router
+
+    now = datetime.utcnow()
+    table = NoteRevision.__table__
+    columns = ["note_id", "user_id", "revision", "kind", "title", "data", "size", "created_at"]
+
+    source = (
+        Note.id, Note.user_id, Note.version, literal(kind), Note.title,
+        data if data is Note.content else literal(data),
+        func.length(Note.content) if size is None
+        else case(size, value=Note.id) if isinstance(size, dict) else literal(size),
+        literal(now)
+    )
+
+    if not shard_router.enabled:
+        db.execute(
+            table.insert().from_select(
+                columns, select(*source).where(Note.id.in_(note_ids))
+            )
+        )
+        return
+
+    # Sharding on → revision id bhi hi/lo se (shards me unique)
+    for note_id in note_ids:
+        revision_id = shard_router.next_id(table)
+        db.execute(
+            table.insert().from_select(
+                ["id"] + columns,
+                select(literal(revision_id), *source).where(Note.id == note_id)
+            )
+        )
+
+
+def record_revisions(db, note_ids, sizes=None):
+    """
+    Naye notes ka pehla revision (snapshot keyframe, server-side copy)
+    Note insert ke flush ke baad, commit se pehle call karo
+    sizes → {note_id: plaintext content length} (encryption on ho to
+    stored content ciphertext hai, uski length nahi chahiye)
+    """
+    _insert_from_notes(db, note_ids, "snapshot", size=sizes)
+
+
+def record_update(db, user_id, note_id, version, content,
+                  snapshot_every=REVISION_SNAPSHOT_EVERY):
+    """
+    Update ke baad (same transaction) naya revision: previous version se delta
+    Keyframe (snapshot) → chain me snapshot_every ho gaye, previous version
+    nahi mila (retention / purana data) ya delta content ke aadhe se bada
+    content → naya plaintext content
+    """
+    rows, previous = _chain(db, note_id, user_id, version - 1)
+
+    kind, data = "snapshot", content
+    if previous is not None and len(rows) < snapshot_every:
+        delta = make_delta(previous, content)
+        if len(delta) * 2 <= len(content):
+            kind, data = "delta", delta
+
+    _insert_from_notes(db, [note_id], kind, note_cipher.encrypt(user_id, data), len(content))
+
+
+#                    READ PATH
+
+
+def _chain(db, note_id, user_id, revision):
+    """
+    Nearest snapshot se `revision` tak ki rows (ek query) aur us version ka
+    content. Version nahi mila (ya retention me delete) → (rows, None)
+    """
+    snapshot = (
+        select(func.max(NoteRevision.revision))
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.user_id == user_id,
+            NoteRevision.kind.in_(FULL_KINDS),
+            NoteRevision.revision <= revision
+        )
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(NoteRevision)
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.user_id == user_id,
+            NoteRevision.revision >= snapshot,
+            NoteRevision.revision <= revision
+        )
+        .order_by(NoteRevision.revision)
+    ).scalars().all()
+
+    if not rows or rows[-1].revision != revision:
+        return rows, None
+
+    content = None
+    keys = {}
+    for row in rows:
+        data = note_cipher.decrypt(user_id, row.data, keys)
+        content = data if row.kind in FULL_KINDS else apply_delta(content, data)
+    return rows, content
+
+
+def reconstruct(db, note_id, user_id, revision):
+    """
+    Ek version ka (row, content) → nearest snapshot + deltas
+    Version nahi mila (ya retention me delete) → None
+    """
+    rows, content = _chain(db, note_id, user_id, revision)
+    if content is None:
+        return None
+    return rows[-1], content
+
+
+#                    COMPACTION / RETENTION
+
+
+def _apply_retention(db, note_id, keep, keep_days, stats):
+    revisions = db.execute(
+        select(NoteRevision.revision, NoteRevision.created_at)
+        .where(NoteRevision.note_id == note_id)
+        .order_by(NoteRevision.revision.desc())
+    ).all()
+    if not revisions:
+        return
+
+    oldest_kept = revisions[-1].revision
+    if keep and len(revisions) > keep:
+        oldest_kept = revisions[keep - 1].revision
+    if keep_days:
+        cutoff = datetime.utcnow() - timedelta(days=keep_days)
+        recent = [r.revision for r in revisions if r.created_at and r.created_at >= cutoff]
+        # Latest revision hamesha rakho
+        oldest_kept = max(oldest_kept, min(recent) if recent else revisions[0].revision)
+
+    if oldest_kept == revisions[-1].revision:
+        return
+
+    # Naya sabse purana revision delta ho sakta hai → delete se pehle full bana do
+    user_id = _user_of(db, note_id)
+    row, content = reconstruct(db, note_id, user_id, oldest_kept)
+    if row.kind == "delta":
+        row.kind = "snapshot"
+        row.data = note_cipher.encrypt(user_id, content)
+
+    stats["deleted"] += db.query(NoteRevision).filter(
+        NoteRevision.note_id == note_id,
+        NoteRevision.revision < oldest_kept
+    ).delete(synchronize_session=False)
+
+
+def _user_of(db, note_id):
+    return db.execute(
+        select(NoteRevision.user_id).where(NoteRevision.note_id == note_id).limit(1)
+    ).scalar()
+
+
+def compact_note(db, note_id, snapshot_every=REVISION_SNAPSHOT_EVERY,
+                 keep=REVISION_KEEP, keep_days=REVISION_KEEP_DAYS):
+    """
+    Ek note ke naye "full" revisions ko snapshot / delta me badalta hai
+    Sirf last snapshot (pehle "full" se pehle wala) se aage ki rows padhi jaati hai
+    """
+    stats = {"rewritten": 0, "deleted": 0}
+    _apply_retention(db, note_id, keep, keep_days, stats)
+
+    first_full = db.execute(
+        select(func.min(NoteRevision.revision))
+        .where(NoteRevision.note_id == note_id, NoteRevision.kind == "full")
+    ).scalar()
+    if first_full is None:
+        db.commit()
+        return stats
+
+    start = db.execute(
+        select(func.max(NoteRevision.revision))
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.kind == "snapshot",
+            NoteRevision.revision < first_full
+        )
+    ).scalar()
+
+    rows = db.execute(
+        select(NoteRevision)
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.revision >= (start if start is not None else first_full)
+        )
+        .order_by(NoteRevision.revision)
+    ).scalars().all()
+
+    previous = None
+    since_snapshot = 0
+    keys = {}
+    for row in rows:
+        data = note_cipher.decrypt(row.user_id, row.data, keys)
+        content = data if row.kind in FULL_KINDS else apply_delta(previous, data)
+
+        if row.kind == "full":
+            row.size = len(content)
+            if previous is None or since_snapshot + 1 >= snapshot_every:
+                row.kind = "snapshot"
+            else:
+                delta = make_delta(previous, content)
+                # Diff content ke aadhe se bada → snapshot hi sasta hai
+                if len(delta) * 2 > len(content):
+                    row.kind = "snapshot"
+                else:
+                    row.kind = "delta"
+                    row.data = note_cipher.encrypt(row.user_id, delta)
+            stats["rewritten"] += 1
+
+        since_snapshot = 0 if row.kind == "snapshot" else since_snapshot + 1
+        previous = content
+
+    db.commit()
+    return stats
+
+
+def compact_all(bind, batch_size=100, keep=REVISION_KEEP, keep_days=REVISION_KEEP_DAYS,
+                log=print):
+    """
+    Ek DB (shard) ke saare notes jinke naye "full" revisions hai ya jo
+    retention limit ke bahar hai
+    """
+    from sqlalchemy.orm import Session
+
+    conditions = [func.sum(case((NoteRevision.kind == "full", 1), else_=0)) > 0]
+    if keep:
+        conditions.append(func.count() > keep)
+    if keep_days:
+        conditions.append(and_(
+            func.count() > 1,
+            func.min(NoteRevision.created_at) < datetime.utcnow() - timedelta(days=keep_days)
+        ))
+
+    totals = {"notes": 0, "rewritten": 0, "deleted": 0}
+    started = time.perf_counter()
+    after_id = 0
+    while True:
+        with Session(bind=bind) as db:
+            note_ids = db.execute(
+                select(NoteRevision.note_id)
+                .where(NoteRevision.note_id > after_id)
+                .group_by(NoteRevision.note_id)
+                .having(or_(*conditions))
+                .order_by(NoteRevision.note_id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not note_ids:
+                break
+
+            for note_id in note_ids:
+                try:
+                    stats = compact_note(db, note_id, keep=keep, keep_days=keep_days)
+                except Exception as e:
+                    # Beech me note delete ho gaya etc. → agli run me dobara
+                    db.rollback()
+                    log(f" note {note_id} compaction failed: {e}")
+                    continue
+                totals["notes"] += 1
+                totals["rewritten"] += stats["rewritten"]
+                totals["deleted"] += stats["deleted"]
+            after_id = note_ids[-1]
+
+    log(f"compacted {totals['notes']} notes: {totals['rewritten']} revisions encoded, "
+        f"{totals['deleted']} deleted in {time.perf_counter() - started:.1f}s")
+    return totals
+
+
+#                    BENCHMARK
+
+
+def benchmark(revisions: int, size: int, snapshot_every: int, samples: int = 200):
+    """
+    In-memory SQLite par ek note ke `revisions` edits (har edit ek line badalta
+    hai, write path wahi record_update)
+
+    Report:
+      - write amplification: stored bytes / edited bytes (full copies vs write-time deltas)
+      - per edit revision write time
+      - random version reconstruction time (p50 / p99 / worst)
+    """
+    from sqlalchemy.orm import Session
+
+    from .database import Base, create_db_engine
+
+    bind = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind)
+
+    line = "lorem ipsum dolor sit amet consectetur adipiscing elit\n"
+    lines = [line] * max(1, size // len(line))
+    rng = random.Random(42)
+
+    edited_bytes = 0
+    full_bytes = 0
+    write_seconds = 0.0
+    with Session(bind=bind) as db:
+        note = Note(title="bench", content="".join(lines), user_id=1, version=1)
+        db.add(note)
+        db.flush()
+        record_revisions(db, [note.id])
+        full_bytes += len(note.content)
+
+        for version in range(2, revisions + 1):
+            i = rng.randrange(len(lines))
+            lines[i] = f"edit {version} {line}"
+            edited_bytes += len(lines[i])
+            content = "".join(lines)
+            full_bytes += len(content)
+            db.query(Note).filter(Note.id == note.id).update(
+                {Note.content: content, Note.version: version}
+            )
+            started = time.perf_counter()
+            record_update(db, 1, note.id, version, content, snapshot_every=snapshot_every)
+            write_seconds += time.perf_counter() - started
+        db.commit()
+
+        stored = db.execute(select(func.sum(func.length(NoteRevision.data)))).scalar()
+
+        timings = []
+        for version in [rng.randint(1, revisions) for _ in range(samples)]:
+            started = time.perf_counter()
+            reconstruct(db, note.id, 1, version)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        # Worst case → snapshot ke theek pehle wala version
+        started = time.perf_counter()
+        reconstruct(db, note.id, 1, snapshot_every)
+        worst_ms = (time.perf_counter() - started) * 1000
+
+    print(f"note size {len(note.content)} bytes, {revisions} revisions, snapshot every {snapshot_every}")
+    print(f"full copies  : {full_bytes:>12} bytes  ({full_bytes / max(edited_bytes, 1):.1f}x edited bytes)")
+    print(f"stored       : {stored:>12} bytes  ({stored / max(edited_bytes, 1):.1f}x edited bytes, "
+          f"{full_bytes / stored:.1f}x smaller)")
+    print(f"write        : {write_seconds * 1000 / max(revisions - 1, 1):.2f} ms per edit (delta encode)")
+    print(f"reconstruct  : p50 {timings[len(timings) // 2]:.2f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.2f} ms, worst {worst_ms:.2f} ms")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.revisions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact = sub.add_parser("compact", help="revisions ko delta encode + retention")
+    compact.add_argument("--batch-size", type=int, default=100)
+
+    bench = sub.add_parser("bench", help="write amplification + reconstruction benchmark")
+    bench.add_argument("--revisions", type=int, default=1000)
+    bench.add_argument("--size", type=int, default=20000, help="note size (bytes)")
+    bench.add_argument("--snapshot-every", type=int, default=REVISION_SNAPSHOT_EVERY)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        from .sharding import shard_engines
+
+        for shard_id, bind in enumerate(shard_engines):
+            print(f"shard {shard_id}:", end=" ")
+            compact_all(bind, args.batch_size)
+    elif args.command == "bench":
+        benchmark(args.revisions, args.size, args.snapshot_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Account APIs (/me)
+# Usage numbers counter rows se aate hai (user_stats, user_storage,
+# otp_send_counts) → COUNT(*) / SUM() kabhi nahi, user kitna bhi bada ho
+# DELETE /me → turant revoke, data background me batches me purge
+from fastapi import APIRouter, Depends
+
+# SQLAlchemy Session → database se communication ke liye
+from sqlalchemy.orm import Session
+
+from ..accounts import account_purger, request_deletion   # account delete + purge
+from ..attachments import get_usage   # attachment storage counters
+from ..database import SessionLocal, replica_router
+from ..dependencies import get_current_user, store_principal   # current user + principal cache
+from ..schemas import AccountDeletionResponse, UsageResponse
+from ..sharding import get_shard_read_db   # user ke shard ka session
+from ..usage import (   # note counters + quotas
+    NOTE_QUOTA_BYTES, NOTE_QUOTA_COUNT, OTP_SENDS_PER_HOUR, get_stats, otp_sends
+)
+
+router = APIRouter(
+    prefix="/me",
+    tags=["Account"]
+)
+
+
+# Primary DB session (otp_send_counts primary par hai)
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------------- USAGE API ----------------
+# GET /me/usage → notes / content bytes / attachments / is ghante ke OTP + limits
+# Quota 0 → limit nahi
+@router.get("/usage", response_model=UsageResponse)
+def usage(
+    db: Session = Depends(get_shard_read_db),
+    primary: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    stats = get_stats(db, user.id)
+    storage = get_usage(db, user.id)
+    return {
+        "note_count": stats["note_count"],
+        "note_quota": NOTE_QUOTA_COUNT,
+        "content_bytes": stats["content_bytes"],
+        "content_quota_bytes": NOTE_QUOTA_BYTES,
+        "attachment_count": storage["attachment_count"],
+        "attachment_bytes": storage["bytes_used"],
+        "otp_sends_this_hour": otp_sends(primary, user.email),
+        "otp_sends_per_hour": OTP_SENDS_PER_HOUR
+    }
+
+
+# ---------------- DELETE ACCOUNT API ----------------
+# DELETE /me → 202; isi waqt se token / login band
+# Notes, attachments, history waghera background thread batches me hatata hai
+@router.delete("", response_model=AccountDeletionResponse, status_code=202)
+def delete_account(
+    primary: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    deletion = request_deletion(primary, user.id)
+
+    # Is worker ke is user ke reads primary par → replica lag se token chalta na rahe
+    replica_router.mark_write(user.id)
+    # Cached principal bhi deleted (sab workers) → token cache se bhi nahi chalta
+    user.deleted_at = deletion.requested_at
+    store_principal(user)
+    account_purger.submit(user.id)
+
+    return {"status": "deleting", "requested_at": deletion.requested_at}
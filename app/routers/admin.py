@@ -0,0 +1,59 @@
+# Admin APIs (ADMIN_EMAILS wale users)
+# On-demand sampling profiler → jis worker par request gayi sirf wahi profile hota hai
+# (uvicorn --workers N → response ka pid dekho; har worker alag se start karna padta hai)
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..dependencies import get_admin_user   # current user + ADMIN_EMAILS
+from ..profiler import PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, profiler   # sampling profiler
+from ..schemas import ProfileInfo, ProfilerStartRequest, ProfilerStatusResponse
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"]
+)
+
+
+def _status():
+    return {"pid": os.getpid(), "active": profiler.active, "last": profiler.last}
+
+
+# ---------------- PROFILER APIs ----------------
+# POST /admin/profiler  {"seconds": 30, "interval_ms": 10, "mode": "worker" | "header"}
+# 202 → profile chal raha hai; khatam hone par collapsed + SVG PROFILER_OUTPUT_DIR me
+# mode "header" → sirf X-Profile-Request: 1 wali requests ke dauran sampling
+@router.post("/profiler", response_model=ProfileInfo, status_code=202)
+def start_profiler(
+    body: ProfilerStartRequest,
+    admin = Depends(get_admin_user)
+):
+    if body.mode not in ("worker", "header"):
+        raise HTTPException(status_code=400, detail='mode "worker" ya "header" hona chahiye')
+    if not 1 <= body.seconds <= PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds 1-{PROFILER_MAX_SECONDS} hone chahiye")
+
+    interval_ms = body.interval_ms or PROFILER_INTERVAL_MS
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms 1-1000 hona chahiye")
+
+    info = profiler.start(body.seconds, interval_ms, body.mode)
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Is worker par profile pehle se chal raha hai"
+        )
+    return info
+
+
+# GET /admin/profiler → is worker ka chal raha + aakhri profile
+@router.get("/profiler", response_model=ProfilerStatusResponse)
+def profiler_status(admin = Depends(get_admin_user)):
+    return _status()
+
+
+# DELETE /admin/profiler → chal raha profile abhi band (files phir bhi likhi jaati hai)
+@router.delete("/profiler", response_model=ProfilerStatusResponse)
+def stop_profiler(admin = Depends(get_admin_user)):
+    profiler.stop()
+    return _status()
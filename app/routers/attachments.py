@@ -0,0 +1,210 @@
+# Note attachments APIs
+# Upload raw request body se stream hota hai (multipart nahi → poori file
+# kabhi memory / temp file me nahi aati), download Range ke saath stream
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+# Upload ke time poori file ka hash
+import hashlib
+
+# Content-Disposition me non-ASCII filename
+from urllib.parse import quote
+
+# Typing helpers
+from typing import Optional
+
+# SQLAlchemy Session → database se communication ke liye
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..archive import is_archived   # cold tier notes
+from ..attachments import (   # metadata + storage accounting
+    ATTACHMENT_MAX_BYTES, delete_attachments, get_usage, save_attachment
+)
+from ..blobstore import BLOB_CHUNK_SIZE, blob_store   # content-addressed chunks
+from ..dependencies import get_current_user   # current user
+from ..models import Attachment, AttachmentChunk, Note
+from ..ranges import parse_range, range_headers   # HTTP Range
+from ..schemas import AttachmentResponse, StorageUsageResponse
+from ..sharding import get_shard_db, get_shard_read_db   # user ke shard ka session
+
+router = APIRouter(
+    prefix="/notes",
+    tags=["Attachments"]
+)
+
+
+def _require_note(db: Session, user_id: int, note_id: int):
+    exists = db.execute(
+        select(Note.id).where(Note.id == note_id, Note.user_id == user_id)
+    ).first()
+    # Cold tier (archive) ka note bhi chalega → attachments note_id se, note hot nahi hota
+    if exists is None and not is_archived(db, user_id, note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+
+
+def _check_note(db: Session, user_id: int, note_id: int):
+    # Upload stream se pehle chhota check → connection / read transaction
+    # streaming ke dauraan pakde nahi rehte (metadata insert nayi transaction me)
+    try:
+        _require_note(db, user_id, note_id)
+    finally:
+        db.close()
+
+
+def _save(db: Session, user_id: int, note_id: int, *args):
+    # Streaming ke beech note delete ho gaya ho → 404 (chunks GC job hata dega)
+    _require_note(db, user_id, note_id)
+    return save_attachment(db, user_id, note_id, *args)
+
+
+# ---------------- STORAGE USAGE API ----------------
+# GET /notes/attachments/usage
+@router.get("/attachments/usage", response_model=StorageUsageResponse)
+def storage_usage(
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    return get_usage(db, user.id)
+
+
+# ---------------- UPLOAD API ----------------
+# POST /notes/{note_id}/attachments?filename=report.pdf
+# Body = file ke raw bytes, Content-Type = file ka type
+#   curl -T report.pdf -X POST -H "Content-Type: application/pdf" ".../notes/5/attachments?filename=report.pdf"
+@router.post("/{note_id}/attachments", response_model=AttachmentResponse, status_code=201)
+async def upload_attachment(
+    note_id: int,
+    filename: str,
+    request: Request,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    if not filename or len(filename) > 255:
+        raise HTTPException(status_code=400, detail="filename 1-255 characters ka hona chahiye")
+
+    await run_in_threadpool(_check_note, db, user.id, note_id)
+
+    # Memory me max ek chunk; har poora chunk blob store me (threadpool → hash + disk IO)
+    file_hash = hashlib.sha256()
+    chunks = []
+    size = 0
+    buffer = bytearray()
+
+    def put(data: bytes):
+        file_hash.update(data)
+        return blob_store.put(data)
+
+    async def flush(data: bytes):
+        nonlocal size
+        chunks.append((await run_in_threadpool(put, data), size, len(data)))
+        size += len(data)
+
+    async for piece in request.stream():
+        if size + len(buffer) + len(piece) > ATTACHMENT_MAX_BYTES:
+            # Likhe ja chuke chunks GC job hata dega
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Attachment {ATTACHMENT_MAX_BYTES} bytes se bada nahi ho sakta"
+            )
+        buffer += piece
+        while len(buffer) >= BLOB_CHUNK_SIZE:
+            data = bytes(buffer[:BLOB_CHUNK_SIZE])
+            del buffer[:BLOB_CHUNK_SIZE]
+            await flush(data)
+
+    if buffer:
+        await flush(bytes(buffer))
+
+    return await run_in_threadpool(
+        _save,
+        db, user.id, note_id, filename,
+        request.headers.get("content-type", "application/octet-stream")[:100],
+        size, file_hash.hexdigest(), chunks
+    )
+
+
+# ---------------- LIST API ----------------
+# GET /notes/{note_id}/attachments
+@router.get("/{note_id}/attachments", response_model=list[AttachmentResponse])
+def list_attachments(
+    note_id: int,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    return (
+        db.query(Attachment)
+        .filter(Attachment.note_id == note_id, Attachment.user_id == user.id)
+        .order_by(Attachment.id)
+        .all()
+    )
+
+
+# ---------------- DOWNLOAD API ----------------
+# GET /notes/{note_id}/attachments/{attachment_id}
+# Range: bytes=0-1023 → 206 + sirf wahi bytes (sirf zaruri chunks padhe jaate hai)
+@router.get("/{note_id}/attachments/{attachment_id}")
+def download_attachment(
+    note_id: int,
+    attachment_id: int,
+    range: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    attachment = (
+        db.query(Attachment)
+        .filter(
+            Attachment.id == attachment_id,
+            Attachment.note_id == note_id,
+            Attachment.user_id == user.id
+        )
+        .first()
+    )
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    byte_range = parse_range(range, attachment.size)
+    start, end = byte_range if byte_range else (0, attachment.size - 1)
+
+    chunks = db.execute(
+        select(AttachmentChunk.chunk_hash, AttachmentChunk.offset, AttachmentChunk.size)
+        .where(
+            AttachmentChunk.attachment_id == attachment.id,
+            AttachmentChunk.offset <= end,
+            AttachmentChunk.offset + AttachmentChunk.size > start
+        )
+        .order_by(AttachmentChunk.seq)
+    ).all()
+
+    headers = range_headers(byte_range, attachment.size)
+    headers["ETag"] = f'"{attachment.sha256}"'
+    headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(attachment.filename)}"
+
+    # Sync generator → StreamingResponse threadpool me iterate karta hai
+    # (disk reads / page faults event loop block nahi karte)
+    return StreamingResponse(
+        blob_store.iter_range(chunks, start, end),
+        status_code=206 if byte_range else 200,
+        media_type=attachment.content_type,
+        headers=headers
+    )
+
+
+# ---------------- DELETE API ----------------
+# DELETE /notes/{note_id}/attachments/{attachment_id}
+@router.delete("/{note_id}/attachments/{attachment_id}", status_code=204)
+def delete_attachment(
+    note_id: int,
+    attachment_id: int,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    deleted = delete_attachments(
+        db, user.id, Attachment.id == attachment_id, Attachment.note_id == note_id
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    db.commit()
+    return Response(status_code=204)
@@ -6,7 +6,11 @@
 # Depends → dependency injection (jaise DB session)
 # HTTPException → error raise karne ke liye
 # status → HTTP status codes (200, 400, 401, etc.)
-from fastapi import APIRouter, Depends, HTTPException, status
+# Header → Idempotency-Key header read karne ke liye
+from fastapi import APIRouter, Depends, HTTPException, Header, status
+
+import os
+from typing import Optional
 
 
 
@@ -53,6 +57,9 @@ from ..schemas import (
 # SessionLocal → database session banane ke liye
 from ..database import SessionLocal
 
+# Failed login counter (shared cache → sab workers ka ek hi count)
+from ..cache import hit_limit, over_limit, reset_limit
+
 # User → users table model
 # EmailOTP → OTP store karne wali table
 from ..models import User, EmailOTP
@@ -61,6 +68,13 @@ from ..models import User, EmailOTP
 # Auth helper functions
 
 
+# idempotent → same Idempotency-Key ka retry dobara OTP nahi banata
+from ..idempotency import idempotent
+
+# charge_otp_send → email par ghante ki OTP limit
+from ..usage import charge_otp_send
+
+
 from ..auth import (
     hash_password,         # plain password → hashed password
     verify_password,       # login ke time password match
@@ -97,38 +111,47 @@ def get_db():
 @router.post("/register/send-otp", status_code=200)
 def send_otp(
     user: UserRegisterRequest,      # frontend se: name, email, password
-    db: Session = Depends(get_db)   # database session
+    db: Session = Depends(get_db),  # database session
+    idempotency_key: Optional[str] = Header(None)   # client retry → same OTP response
 ):
-    #  Check → email pehle se registered to nahi?
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(
-            status_code=400,
-            detail="Email already registered"
+    def execute():
+        #  Check → email pehle se registered to nahi?
+        if db.query(User).filter(User.email == user.email).first():
+            raise HTTPException(
+                status_code=400,
+                detail="Email already registered"
+            )
+
+        #  Email par ghante ki OTP limit (counter OTP ke saath commit, limit par 429)
+        charge_otp_send(db, user.email)
+
+        # 6-digit OTP generate
+        otp_code = generate_otp()
+
+        #  OTP ka expiry time calculate (ex: 5 min)
+        expiry_time = get_otp_expiry_time()
+
+        #  OTP ko database me save karna
+        otp_entry = EmailOTP(
+            email=user.email,
+            otp_code=otp_code,
+            expires_at=expiry_time,
+            is_verified=0           # 0 = not verified
         )
 
-    # 6-digit OTP generate
-    otp_code = generate_otp()
+        db.add(otp_entry)
+        db.commit()
 
-    #  OTP ka expiry time calculate (ex: 5 min)
-    expiry_time = get_otp_expiry_time()
+        #  DEMO PURPOSE ONLY
+        # Production me OTP email / SMS pe bhejna chahiye
+        return {
+            "message": "OTP sent to email",
+            "otp_demo": otp_code
+        }
 
-    #  OTP ko database me save karna
-    otp_entry = EmailOTP(
-        email=user.email,
-        otp_code=otp_code,
-        expires_at=expiry_time,
-        is_verified=0           # 0 = not verified
-    )
-
-    db.add(otp_entry)
-    db.commit()
-
-    #  DEMO PURPOSE ONLY
-    # Production me OTP email / SMS pe bhejna chahiye
-    return {
-        "message": "OTP sent to email",
-        "otp_demo": otp_code
-    }
+    #  Key email ke scope me (alag users ki same key clash nahi karti)
+    #  Fingerprint body ka HMAC (SECRET_KEY) hai → password na plain store hota, na unsalted hash
+    return idempotent(idempotency_key, f"send-otp:{user.email}", user.model_dump(), execute)
 
 
 
@@ -192,6 +215,10 @@ def verify_otp_and_register(
 
 # Ye API user ko login karwati hai
 # Agar email + password sahi ho to JWT token return karti hai
+# Ek email par window me itne galat password → window khatam hone tak 429
+# (counter pehli galti se window bhar; sahi login par reset). 0 → limit nahi
+LOGIN_FAILURES_PER_WINDOW = int(os.getenv("LOGIN_FAILURES_PER_WINDOW", "10"))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "300"))
 
 @router.post(
     "/login",                      # API endpoint → /login
@@ -212,6 +239,17 @@ def login(
     # """
 
    
+    # STEP 0: bahut saare galat password → bcrypt / DB tak jaaye bina 429
+
+    limit_key = f"login_fail:{form_data.username.lower()}"
+    if over_limit(limit_key, LOGIN_FAILURES_PER_WINDOW):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(LOGIN_FAILURE_WINDOW_SECONDS)}
+        )
+
+   
     # STEP 1: Email se user fetch karna
     
     # Database me check karo ki ye email exist karti hai ya nahi
@@ -228,16 +266,20 @@ def login(
     # Agar:
     # - user nahi mila
     # - ya password match nahi hua
-    if not db_user or not verify_password(
+    # - ya account delete ho chuka hai (purge chal raha hai)
+    if not db_user or db_user.deleted_at is not None or not verify_password(
         form_data.password,        # User ka entered password
         db_user.hashed_password    # Database me stored hashed password
     ):
-        # Unauthorized error return karo
+        # Failure count karo, phir Unauthorized error return karo
+        hit_limit(limit_key, LOGIN_FAILURES_PER_WINDOW, LOGIN_FAILURE_WINDOW_SECONDS)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
 
+    reset_limit(limit_key)
+
  
     # STEP 3: JWT token generate karna
 
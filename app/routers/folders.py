@@ -0,0 +1,123 @@
+# Folders APIs
+# Folder tree materialized path se (app/folders.py); listing me counts
+# columns se aate hai → user ke 100k notes ho tab bhi COUNT(*) nahi
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+# SQLAlchemy Session → database se communication ke liye
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..dependencies import get_current_user   # current user
+from ..folders import create_folder, delete_folder, get_folder, move_folder
+from ..models import Folder
+from ..schemas import FolderCreate, FolderResponse, FolderUpdate
+from ..sharding import get_shard_db, get_shard_read_db   # user ke shard ka session
+
+router = APIRouter(
+    prefix="/folders",
+    tags=["Folders"]
+)
+
+
+def _check_name(name):
+    if not name or not name.strip() or len(name) > 255:
+        raise HTTPException(status_code=400, detail="Folder name 1-255 characters ka hona chahiye")
+    return name.strip()
+
+
+# ---------------- CREATE FOLDER API ----------------
+# POST /folders  {"name": "Work", "parent_id": null}
+@router.post("/", response_model=FolderResponse, status_code=201)
+def add_folder(
+    body: FolderCreate,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    folder = create_folder(db, user.id, _check_name(body.name), body.parent_id)
+    db.commit()
+    db.refresh(folder)
+    return folder
+
+
+# ---------------- LIST FOLDERS API ----------------
+# GET /folders → poora tree, path order me (parent hamesha children se pehle)
+# (user_id, path) index scan
+@router.get("/", response_model=list[FolderResponse])
+def list_folders(
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    return db.execute(
+        select(Folder).where(Folder.user_id == user.id).order_by(Folder.path)
+    ).scalars().all()
+
+
+# GET /folders/{folder_id}
+@router.get("/{folder_id}", response_model=FolderResponse)
+def read_folder(
+    folder_id: int,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    return get_folder(db, user.id, folder_id)
+
+
+# GET /folders/{folder_id}/children → sirf direct subfolders
+# (user_id, parent_id) index
+@router.get("/{folder_id}/children", response_model=list[FolderResponse])
+def list_children(
+    folder_id: int,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    get_folder(db, user.id, folder_id)
+    return db.execute(
+        select(Folder)
+        .where(Folder.user_id == user.id, Folder.parent_id == folder_id)
+        .order_by(Folder.name)
+    ).scalars().all()
+
+
+# ---------------- RENAME / MOVE FOLDER API ----------------
+# PATCH /folders/{folder_id}  {"name": "..."} aur / ya {"parent_id": 3 | null}
+# Move → subtree ke saare paths ek UPDATE me, counts ancestors par shift
+@router.patch("/{folder_id}", response_model=FolderResponse)
+def change_folder(
+    folder_id: int,
+    body: FolderUpdate,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    values = body.model_dump(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="Update karne ke liye koi field nahi")
+
+    folder = get_folder(db, user.id, folder_id)
+
+    if "name" in values:
+        db.execute(
+            update(Folder)
+            .where(Folder.id == folder.id)
+            .values(name=_check_name(values["name"]))
+            .execution_options(synchronize_session=False)
+        )
+    if "parent_id" in values:
+        move_folder(db, user.id, folder, values["parent_id"])
+
+    db.commit()
+    db.refresh(folder)
+    return folder
+
+
+# ---------------- DELETE FOLDER API ----------------
+# DELETE /folders/{folder_id}
+# Subfolders bhi delete; notes delete nahi hote, root par aa jaate hai
+@router.delete("/{folder_id}", status_code=204)
+def remove_folder(
+    folder_id: int,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    delete_folder(db, user.id, folder_id)
+    db.commit()
+    return Response(status_code=204)
@@ -2,15 +2,57 @@
 # APIRouter → APIs ka group banane ke liye
 # Depends → dependency injection ke liye
 # HTTPException → error handle karne ke liye
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# SSE stream ke liye
+import asyncio
+import json
+
+# Env config (large content threshold)
+import os
+
+# GET /notes ETag (query params ka checksum)
+import zlib
+
+# Typing helpers
+from typing import Optional
+
+# updated_at ke liye
+from datetime import datetime
 
 # SQLAlchemy Session → database se communication ke liye
 from sqlalchemy.orm import Session
 
+# Single-statement UPDATE / DELETE ke liye Core constructs
+from sqlalchemy import LargeBinary, case, cast, delete, func, select, update
+
 #  Correct relative imports (.. ka matlab ek folder upar = app/)
-from ..schemas import NoteCreate, NoteResponse   # note create & response schemas
-from ..dependencies import get_current_user, get_db  # current user & db session
-from ..models import Note   # Note model (notes table)
+from ..schemas import (   # note schemas
+    NoteCreate, NoteUpdate, NotePatch, NoteResponse, NoteChangesResponse,
+    NoteRevisionInfo, NoteRevisionResponse, NoteFolderUpdate, NoteTagsUpdate,
+    RelatedNoteResponse, NoteBatchGetRequest, NoteBatchGetResponse
+)
+from ..dependencies import get_current_user, get_stream_user  # current user
+from ..idempotency import idempotent   # Idempotency-Key replay
+from ..events import event_bus, publish_note_event   # real-time change feed
+from ..attachments import delete_attachments   # note delete par attachments bhi
+from ..database import replica_router   # read-your-writes tracking
+from ..encryption import PREFIX as CIPHER_PREFIX, note_cipher   # title / content encryption at rest
+from ..sharding import get_shard_db, get_shard_read_db, shard_router  # user ke shard ka session
+from ..ranges import parse_range, range_headers   # GET /notes/{id}/content Range
+from ..folders import add_note_counts, count_notes, get_folder, note_filter as folder_filter   # folders
+from ..tags import (   # tags (many-to-many)
+    ensure_tags, get_note_tags, normalize as normalize_tags, note_filter as tag_filter,
+    remove_note_tags, set_note_tags
+)
+from ..models import Attachment, Note, NoteArchive, NoteRevision, NoteTombstone   # notes + history + attachments + tombstones + cold tier
+from ..archive import archived_note, archived_notes, is_archived, unarchive   # hot / cold tiering
+from ..revisions import reconstruct, record_revisions, record_update   # revision history
+from ..similarity import INDEX_BUILDING, SIMILARITY_DUPLICATE_THRESHOLD, related_index   # related notes
+from ..sync import bump_change_seq, current_seq, note_list_version   # per-user change sequence + list ETag
+from ..usage import byte_length, charge_notes, content_size, ensure_stats_row   # usage counters + quotas
+from ..write_pipeline import note_pipeline   # group-commit (opt-in)
 
 # Notes ke liye router banaya
 # prefix="/notes" → saari APIs /notes se start hongi
@@ -26,38 +68,941 @@ router = APIRouter(
 @router.post("/", response_model=NoteResponse)
 def create_note(
     note: NoteCreate,                # Client se aane wala data (title, content)
-    db: Session = Depends(get_db),    # Database connection
-    user = Depends(get_current_user)  # JWT token se current logged-in user
+    db: Session = Depends(get_shard_db),  # User ke shard ka session
+    user = Depends(get_current_user),     # JWT token se current logged-in user
+    idempotency_key: Optional[str] = Header(None)   # retry par same key → same note
 ):
-    # Naya note object bana rahe hain
-    # **note.dict() se title aur content aa raha hai
-    # user_id=user.id se note ko logged-in user se jod rahe hain
-    new_note = Note(
-        title=note.title,
-        content=note.content,
-        user_id=user.id
+    def execute():
+        # Naye tags pehle (alag short transactions) → note transaction me sirf link
+        tag_names = normalize_tags(note.tags)
+        if tag_names:
+            ensure_tags(db.get_bind(), user.id, tag_names)
+
+        # Folder isi user ka hona chahiye (warna 404)
+        if note.folder_id is not None:
+            get_folder(db, user.id, note.folder_id)
+
+        # Usage counter row (quota check note ke transaction me isi row par)
+        ensure_stats_row(db.get_bind(), user.id)
+
+        # Naya note object bana rahe hain
+        # **note.dict() se title aur content aa raha hai
+        # user_id=user.id se note ko logged-in user se jod rahe hain
+        # Encryption on ho to title / content ciphertext ban ke jaate hai
+        values = note_cipher.encrypt_values(user.id, {
+            "title": note.title,
+            "content": note.content,
+            "user_id": user.id,
+            "folder_id": note.folder_id
+        })
+
+        # Sharding on → id primary ke hi/lo allocator se (shards me unique)
+        if shard_router.enabled:
+            values["id"] = shard_router.next_note_id()
+
+        if note_pipeline.enabled:
+            # Group commit → concurrent notes ke saath ek hi transaction me save
+            # (folder counts bhi usi transaction me; tags alag chhoti transaction me)
+            new_note = note_pipeline.submit(db.get_bind(), values)
+            if tag_names:
+                set_note_tags(db, user.id, new_note.id, tag_names)
+                db.commit()
+        else:
+            # User ka change counter +1 → note ko wahi change_seq milta hai
+            bump_change_seq(db, user.id)
+
+            # Note count / bytes +1 → quota khatam ho to yahi 403 (rollback)
+            charge_notes(db, user.id, 1, content_size(values["content"]))
+            new_note = Note(**values, change_seq=current_seq(user.id))
+
+            # Note ko database session me add kar rahe hain
+            db.add(new_note)
+
+            # Flush → id mil jaati hai, phir pehla revision, folder count
+            # aur tags (same transaction)
+            db.flush()
+            record_revisions(db, [new_note.id], {new_note.id: len(note.content)})
+            count_notes(db, [new_note])
+            if tag_names:
+                set_note_tags(db, user.id, new_note.id, tag_names)
+
+            # Database me note permanently save kar rahe hain
+            db.commit()
+
+            # Database se latest data (id ke saath) wapas le rahe hain
+            db.refresh(new_note)
+
+        # Is user ke agle reads kuch der primary par (replica lag)
+        replica_router.mark_write(user.id)
+
+        # /notes/stream subscribers ko event
+        publish_note_event(user.id, "created", new_note.id, new_note.change_seq)
+
+        # Client ko newly created note return (plaintext)
+        return note_cipher.decrypt_note(user.id, new_note)
+
+    # Idempotency-Key header ho to duplicate retry pehla response replay karta hai
+    return idempotent(
+        idempotency_key, f"notes:{user.id}", note.model_dump(), execute,
+        response_model=NoteResponse
     )
 
-    # Note ko database session me add kar rahe hain
-    db.add(new_note)
 
-    # Database me note permanently save kar rahe hain
-    db.commit()
+# ---------------- LARGE CONTENT HELPERS ----------------
+# List / detail me isse bade content (characters) ki sirf shuruaat aati hai
+# (content_truncated=True) → poora content GET /notes/{id}/content se stream
+# 0 → kabhi truncate nahi (purana behaviour)
+NOTE_INLINE_CONTENT_MAX = int(os.getenv("NOTE_INLINE_CONTENT_MAX", str(256 * 1024)))
 
-    # Database se latest data (id ke saath) wapas le rahe hain
-    db.refresh(new_note)
+# GET /notes/{id}/content ek query me kitne bytes padhta hai
+NOTE_CONTENT_CHUNK = int(os.getenv("NOTE_CONTENT_CHUNK", str(64 * 1024)))
 
-    # Client ko newly created note return
-    return new_note
+
+def _char_length(db: Session, column):
+    # MySQL LENGTH() bytes deta hai, CHAR_LENGTH() characters; SQLite / Postgres LENGTH() characters
+    if db.get_bind().dialect.name == "mysql":
+        return func.char_length(column)
+    return func.length(column)
+
+
+def _truncate(notes, content_max: Optional[int]):
+    # Plaintext notes (objects / dicts) → content_max se bada content kaat ke dicts
+    if content_max is None:
+        return notes
+
+    result = []
+    for note in notes:
+        data = note if isinstance(note, dict) else \
+            {column.key: getattr(note, column.key) for column in NOTE_COLUMNS}
+        length = len(data["content"])
+        result.append({
+            **data,
+            "content": data["content"][:content_max],
+            "content_length": length,
+            "content_truncated": length > content_max
+        })
+    return result
+
+
+def _archived_notes(db: Session, user_id: int, content_max: Optional[int], *conditions):
+    """
+    Cold tier (notes_archive) ke notes → _inline_notes jaise dicts (archived=True)
+    Content compressed hai → SQL me SUBSTR nahi, decompress + decrypt ke baad truncate
+    """
+    if content_max is None:
+        content_max = NOTE_INLINE_CONTENT_MAX or None
+
+    notes = note_cipher.decrypt_notes(user_id, archived_notes(db, user_id, *conditions))
+    return [{**note, "archived": True} for note in _truncate(notes, content_max)]
+
+
+def _inline_notes(db: Session, user_id: int, content_max: Optional[int], *conditions):
+    """
+    User ke notes (dicts) → content_max se bada content truncate
+    Plaintext DB par truncation SQL me (SUBSTR) → bada content worker tak aata hi nahi
+    Encryption on ho to ciphertext ka substring nahi ho sakta → decrypt ke baad truncate
+    """
+    if content_max is None:
+        content_max = NOTE_INLINE_CONTENT_MAX or None
+
+    if content_max is None or note_cipher.enabled:
+        notes = db.query(Note).filter(Note.user_id == user_id, *conditions).all()
+        return _truncate(note_cipher.decrypt_notes(user_id, notes), content_max)
+
+    length = _char_length(db, Note.content)
+    rows = db.execute(
+        select(
+            Note.id, Note.title,
+            case(
+                (length > content_max, func.substr(Note.content, 1, content_max)),
+                else_=Note.content
+            ).label("content"),
+            length.label("content_length"),
+            Note.created_at, Note.version, Note.updated_at, Note.change_seq, Note.folder_id
+        )
+        .where(Note.user_id == user_id, *conditions)
+    ).mappings().all()
+
+    return [
+        {**row, "content_truncated": row["content_length"] > content_max}
+        for row in rows
+    ]
 
 
 # ---------------- GET ALL NOTES API ----------------
 # GET /notes
 # Ye sirf logged-in user ke saare notes return karta hai
+# ?folder_id=<id>[&recursive=true] / ?tag=<name> → filter
+# ?content_max=<chars> → isse bada content truncate (0 → content omit)
+# ?archived=true → sirf cold tier (archive) ke notes; default sirf hot tier
+# Response me ETag (user ka note-list version + query params); If-None-Match
+# same → 304 bina list query ke (version shared cache me, app.sync; primary /
+# shard read par hi, CACHE_BACKEND=shm / redis ke saath)
 @router.get("/", response_model=list[NoteResponse])
 def get_notes(
-    db: Session = Depends(get_db),     # Database session
-    user = Depends(get_current_user)   # JWT token se current user
+    response: Response,
+    content_max: Optional[int] = Query(None, ge=0),
+    folder_id: Optional[int] = None,           # sirf is folder ke notes
+    recursive: bool = False,                   # folder_id + subfolders
+    tag: Optional[str] = None,                 # sirf is tag wale notes
+    archived: bool = False,                    # cold tier listing
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_read_db),  # User ka shard (ya read replica)
+    user = Depends(get_current_user)           # JWT token se current user
 ):
+    # Version query se pehle → beech ka write agle request me naya ETag deta hai
+    # Read replica par ETag nahi → lag wala result naye version ke saath pin na ho
+    # Shared cache nahi → version None → ETag nahi
+    version = None
+    if db.get_bind() not in replica_router.replicas:
+        version = note_list_version(user.id)
+    if version is not None:
+        params = f"{content_max}|{folder_id}|{recursive}|{tag}|{archived}".encode()
+        etag = f'W/"{version}-{zlib.crc32(params):08x}"'
+        if if_none_match and etag in [value.strip() for value in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+
+    model = NoteArchive if archived else Note
+
+    # Filters → (user_id, folder_id) / (user_id, tag_id, note_id) index
+    conditions = []
+    if folder_id is not None:
+        conditions.append(folder_filter(db, user.id, folder_id, recursive, model.folder_id))
+    if tag is not None:
+        conditions.append(tag_filter(db, user.id, tag, model.id))
+
+    if archived:
+        return _archived_notes(db, user.id, content_max, *conditions)
+
     # Database se sirf current user ke notes fetch kar rahe hain
-    return db.query(Note).filter(Note.user_id == user.id).all()
+    # Decrypt poori list ke liye ek hi data key se
+    return _inline_notes(db, user.id, content_max, *conditions)
+
+
+# ---------------- BATCH GET API ----------------
+# POST /notes/batch-get  {"ids": [5, 3, 9], "fields": ["id", "title", "version"]}
+# Change feed / search / links se mile ids → ek round-trip me poori screen
+# Hot tier par ek IN (...) query (user_id scoped, primary key lookups); jo ids
+# nahi mile unke liye cold tier par ek aur IN. Notes request ke order me,
+# duplicate ids ek baar; nahi mile (ya kisi aur user ke) ids → missing
+
+# Ek request me max kitne ids
+NOTE_BATCH_MAX = int(os.getenv("NOTE_BATCH_MAX", "200"))
+
+# Content se bane fields → inme se koi na maanga ho to content column padha hi nahi jaata
+CONTENT_FIELDS = {"content", "content_truncated", "content_length"}
+
+
+def _projected_rows(db: Session, user_id: int, model, ids, fields):
+    # Sirf maange gaye (non-content) columns; title encrypted ho to decrypt
+    columns = [getattr(model, name) for name in sorted(fields | {"id"}) if name != "archived"]
+    rows = db.execute(
+        select(*columns).where(model.user_id == user_id, model.id.in_(ids))
+    ).mappings().all()
+
+    keys = {}
+    result = []
+    for row in rows:
+        data = dict(row)
+        if "title" in data:
+            data["title"] = note_cipher.decrypt(user_id, data["title"], keys)
+        data["archived"] = model is NoteArchive
+        result.append(data)
+    return result
+
+
+@router.post("/batch-get", response_model=NoteBatchGetResponse)
+def batch_get_notes(
+    body: NoteBatchGetRequest,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    ids = list(dict.fromkeys(body.ids))     # order same, duplicates hata ke
+    if len(ids) > NOTE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Ek request me max {NOTE_BATCH_MAX} ids")
+    if body.content_max is not None and body.content_max < 0:
+        raise HTTPException(status_code=400, detail="content_max 0 ya zyada hona chahiye")
+
+    fields = None
+    if body.fields is not None:
+        fields = set(body.fields)
+        unknown = fields - set(NoteResponse.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    if not ids:
+        return {"notes": [], "missing": []}
+
+    if fields is not None and not fields & CONTENT_FIELDS:
+        found = {row["id"]: row for row in _projected_rows(db, user.id, Note, ids, fields)}
+        rest = [note_id for note_id in ids if note_id not in found]
+        if rest:
+            found.update((row["id"], row) for row in _projected_rows(db, user.id, NoteArchive, rest, fields))
+    else:
+        found = {}
+        for note in _inline_notes(db, user.id, body.content_max, Note.id.in_(ids)):
+            data = NoteResponse.model_validate(note).model_dump()
+            found[data["id"]] = data
+        rest = [note_id for note_id in ids if note_id not in found]
+        if rest:
+            found.update(
+                (note["id"], NoteResponse.model_validate(note).model_dump())
+                for note in _archived_notes(db, user.id, body.content_max, NoteArchive.id.in_(rest))
+            )
+
+    notes = []
+    for note_id in ids:
+        note = found.get(note_id)
+        if note is not None:
+            notes.append(note if fields is None else {name: note[name] for name in body.fields if name in note})
+
+    return {
+        "notes": notes,
+        "missing": [note_id for note_id in ids if note_id not in found]
+    }
+
+
+# ---------------- DELTA SYNC API ----------------
+# GET /notes/changes?since=<cursor>&limit=<n>
+# Sirf since ke baad badle / delete hue notes → (user_id, change_seq) index
+# Response ka cursor agli request me since bhejo; has_more=True → turant dobara
+@router.get("/changes", response_model=NoteChangesResponse)
+def get_note_changes(
+    since: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    limit = max(1, min(limit, 1000))
+
+    # limit + 1 → has_more pata chale
+    notes = (
+        db.query(Note)
+        .filter(Note.user_id == user.id, Note.change_seq > since)
+        .order_by(Note.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+    # Cold tier ke notes bhi badalte hai (folder delete par unfile)
+    cold = [
+        {**note, "archived": True}
+        for note in archived_notes(db, user.id, NoteArchive.change_seq > since, limit=limit + 1)
+    ]
+    deleted = (
+        db.query(NoteTombstone)
+        .filter(NoteTombstone.user_id == user.id, NoteTombstone.change_seq > since)
+        .order_by(NoteTombstone.change_seq)
+        .limit(limit + 1)
+        .all()
+    )
+
+    # Teeno lists ko change_seq order me merge karke pehle `limit` changes
+    changes = sorted(
+        notes + cold + deleted,
+        key=lambda row: row["change_seq"] if isinstance(row, dict) else row.change_seq
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    return {
+        "notes": note_cipher.decrypt_notes(
+            user.id, [row for row in changes if not isinstance(row, NoteTombstone)]
+        ),
+        "deleted": [row for row in changes if isinstance(row, NoteTombstone)],
+        "cursor": (
+            changes[-1]["change_seq"] if isinstance(changes[-1], dict) else changes[-1].change_seq
+        ) if changes else since,
+        "has_more": has_more
+    }
+
+
+# ---------------- REAL-TIME CHANGE STREAM ----------------
+# GET /notes/stream  (Server-Sent Events)
+# Auth: Authorization: Bearer <token>  ya  ?access_token=<token> (EventSource)
+#
+# Events: {"type": "created" | "updated" | "deleted", "id": ..., "change_seq": ...}
+# {"type": "resync"} → client peeche reh gaya, GET /notes/changes se catch-up kare
+#
+# Connect ke baad koi DB session / connection hold nahi hota
+
+# Idle connection par har itne seconds me heartbeat comment
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+@router.get("/stream")
+async def stream_note_changes(
+    request: Request,
+    user = Depends(get_stream_user)
+):
+    subscription = await event_bus.open(user.id)
+
+    async def events():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await subscription.get(STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+
+                lines = f"event: {event['type']}\ndata: {json.dumps(event)}\n"
+                if "change_seq" in event:
+                    lines = f"id: {event['change_seq']}\n" + lines
+                yield lines + "\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ---------------- UPDATE / DELETE HELPERS ----------------
+# Har update / delete ek hi statement hai:
+#   UPDATE notes SET ..., version = version + 1 WHERE id = :id AND user_id = :uid [AND version = :v]
+# Read-modify-write nahi → concurrent edits me koi change lost nahi hota
+
+# Response ke liye columns
+NOTE_COLUMNS = (
+    Note.id, Note.title, Note.content, Note.created_at,
+    Note.version, Note.updated_at, Note.change_seq, Note.folder_id
+)
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    If-Match header → expected version
+    Header nahi / "*" → None (version check nahi hoga)
+    "3", "\"3\"" aur W/"3" teeno chalte hain
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def _raise_not_found_or_conflict(db: Session, user_id: int, note_id: int):
+    """
+    rowcount 0 ke baad hi call hota hai (sirf failure path par extra query)
+    Note hi nahi hai (na hot na cold tier me) → 404, version match nahi hua → 412
+    """
+    current = db.execute(
+        select(Note.version).where(Note.id == note_id, Note.user_id == user_id)
+    ).scalar()
+    if current is None:
+        current = db.execute(
+            select(NoteArchive.version)
+            .where(NoteArchive.id == note_id, NoteArchive.user_id == user_id)
+        ).scalar()
+
+    if current is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"Note badal chuka hai (current version {current})",
+        headers={"ETag": f'"{current}"'}
+    )
+
+
+def _select_hot(db: Session, user_id: int, note_id: int, *columns):
+    """
+    Note ke columns; note cold tier me ho to pehle unarchive (caller ke transaction me)
+    """
+    query = select(*columns).where(Note.id == note_id, Note.user_id == user_id)
+    row = db.execute(query).first()
+    if row is None and unarchive(db, user_id, note_id):
+        row = db.execute(query).first()
+    return row
+
+
+def update_note_values(db: Session, user_id: int, note_id: int, values: dict,
+                       expected_version: Optional[int]):
+    """
+    Ek UPDATE statement (RETURNING support ho to wahi round-trip note bhi
+    wapas deta hai; MySQL par same transaction me ek SELECT)
+    Usse pehle user ke change counter ka bump (delta sync)
+    Note cold tier me ho → UPDATE miss, unarchive (same transaction), phir wahi UPDATE
+    """
+    bump_change_seq(db, user_id)
+    values = note_cipher.encrypt_values(user_id, values)
+
+    def old_size():
+        # Content badla → purane aur naye stored bytes ka farak usage me (quota check bhi)
+        if "content" not in values:
+            return None
+        return db.execute(
+            select(byte_length(db.get_bind(), Note.content))
+            .where(Note.id == note_id, Note.user_id == user_id)
+        ).scalar()
+
+    stmt = (
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == user_id)
+        .values(
+            **values,
+            version=Note.version + 1,
+            updated_at=datetime.utcnow(),
+            change_seq=current_seq(user_id)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Note.version == expected_version)
+
+    def execute():
+        if db.get_bind().dialect.update_returning:
+            return db.execute(stmt.returning(*NOTE_COLUMNS)).mappings().first()
+        if db.execute(stmt).rowcount:
+            return db.execute(
+                select(*NOTE_COLUMNS).where(Note.id == note_id)
+            ).mappings().first()
+        return None
+
+    size = old_size()
+    row = execute()
+    if row is None and unarchive(db, user_id, note_id):
+        size = old_size()
+        row = execute()
+
+    if row is None:
+        db.rollback()
+        _raise_not_found_or_conflict(db, user_id, note_id)
+
+    if size is not None:
+        charge_notes(db, user_id, 0, content_size(values["content"]) - size)
+
+    # Naya version history me (same transaction, previous version se delta)
+    note = note_cipher.decrypt_note(user_id, dict(row))
+    record_update(db, user_id, note_id, note["version"], note["content"])
+
+    db.commit()
+    return note
+
+
+# ---------------- REPLACE NOTE API ----------------
+# PUT /notes/{note_id}
+# If-Match: "<version>" → sirf usi version par update (warna 412)
+@router.put("/{note_id}", response_model=NoteResponse)
+def replace_note(
+    note_id: int,
+    note: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    row = update_note_values(
+        db, user.id, note_id, note.model_dump(), parse_if_match(if_match)
+    )
+    replica_router.mark_write(user.id)
+    publish_note_event(user.id, "updated", note_id, row["change_seq"])
+
+    response.headers["ETag"] = f'"{row["version"]}"'
+    return row
+
+
+# ---------------- PARTIAL UPDATE API ----------------
+# PATCH /notes/{note_id}
+# Sirf bheje gaye fields update hote hain
+@router.patch("/{note_id}", response_model=NoteResponse)
+def patch_note(
+    note_id: int,
+    note: NotePatch,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    values = note.model_dump(exclude_unset=True)
+
+    if not values:
+        raise HTTPException(status_code=400, detail="Update karne ke liye koi field nahi")
+    if any(value is None for value in values.values()):
+        raise HTTPException(status_code=400, detail="title / content null nahi ho sakte")
+
+    row = update_note_values(db, user.id, note_id, values, parse_if_match(if_match))
+    replica_router.mark_write(user.id)
+    publish_note_event(user.id, "updated", note_id, row["change_seq"])
+
+    response.headers["ETag"] = f'"{row["version"]}"'
+    return row
+
+
+# ---------------- DELETE NOTE API ----------------
+# DELETE /notes/{note_id}
+# Ek DELETE statement; If-Match diya hai to version bhi match hona chahiye
+# Same transaction me tombstone insert → sync clients ko delete dikhta hai
+@router.delete("/{note_id}", status_code=204)
+def delete_note(
+    note_id: int,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    bump_change_seq(db, user.id)
+
+    # Counter row lock ke baad → user ka koi aur write beech me folder / content nahi badal sakta
+    current = _select_hot(
+        db, user.id, note_id,
+        Note.folder_id, byte_length(db.get_bind(), Note.content).label("size")
+    )
+
+    stmt = (
+        delete(Note)
+        .where(Note.id == note_id, Note.user_id == user.id)
+        .execution_options(synchronize_session=False)
+    )
+    expected_version = parse_if_match(if_match)
+    if expected_version is not None:
+        stmt = stmt.where(Note.version == expected_version)
+
+    if not db.execute(stmt).rowcount:
+        db.rollback()
+        _raise_not_found_or_conflict(db, user.id, note_id)
+
+    db.execute(
+        NoteTombstone.__table__.insert().values(
+            id=note_id,
+            user_id=user.id,
+            change_seq=current_seq(user.id),
+            deleted_at=datetime.utcnow()
+        )
+    )
+    db.execute(
+        delete(NoteRevision)
+        .where(NoteRevision.note_id == note_id)
+        .execution_options(synchronize_session=False)
+    )
+    delete_attachments(db, user.id, Attachment.note_id == note_id)
+    add_note_counts(db, user.id, {current.folder_id: -1})
+    remove_note_tags(db, user.id, [note_id])
+    charge_notes(db, user.id, -1, -(current.size or 0))
+    # Tombstone wala change_seq → event me bhi (SSE id, client catch-up cursor)
+    change_seq = db.scalar(select(current_seq(user.id)))
+    db.commit()
+    replica_router.mark_write(user.id)
+    publish_note_event(user.id, "deleted", note_id, change_seq)
+
+    return Response(status_code=204)
+
+
+# ---------------- FOLDER / TAGS APIs ----------------
+# PUT /notes/{note_id}/folder  {"folder_id": 5}  (null → root)
+# Note ka change_seq badhta hai (sync clients ko move dikhe), version nahi
+@router.put("/{note_id}/folder", response_model=NoteResponse)
+def move_note(
+    note_id: int,
+    body: NoteFolderUpdate,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    if body.folder_id is not None:
+        get_folder(db, user.id, body.folder_id)
+
+    bump_change_seq(db, user.id)
+
+    current = _select_hot(db, user.id, note_id, Note.folder_id)
+    if current is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    db.execute(
+        update(Note)
+        .where(Note.id == note_id, Note.user_id == user.id)
+        .values(folder_id=body.folder_id, change_seq=current_seq(user.id))
+        .execution_options(synchronize_session=False)
+    )
+    if current.folder_id != body.folder_id:
+        add_note_counts(db, user.id, {current.folder_id: -1, body.folder_id: 1})
+    db.commit()
+
+    note = _inline_notes(db, user.id, None, Note.id == note_id)[0]
+    change_seq = note["change_seq"] if isinstance(note, dict) else note.change_seq
+    replica_router.mark_write(user.id)
+    publish_note_event(user.id, "updated", note_id, change_seq)
+    return note
+
+
+def _note_exists(db: Session, user_id: int, note_id: int) -> bool:
+    # Hot ya cold tier (tags note_tags me hai → archived note ko hot karne ki zarurat nahi)
+    found = db.execute(select(Note.id).where(Note.id == note_id, Note.user_id == user_id)).first()
+    return found is not None or is_archived(db, user_id, note_id)
+
+
+# GET /notes/{note_id}/tags
+@router.get("/{note_id}/tags", response_model=NoteTagsUpdate)
+def get_tags_of_note(
+    note_id: int,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    if not _note_exists(db, user.id, note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+    return {"tags": get_note_tags(db, user.id, [note_id])[note_id]}
+
+
+# PUT /notes/{note_id}/tags  {"tags": ["work", "todo"]}
+# Note ke tags exactly yahi (naye tags khud ban jaate hai, counts incremental)
+@router.put("/{note_id}/tags", response_model=NoteTagsUpdate)
+def set_tags_of_note(
+    note_id: int,
+    body: NoteTagsUpdate,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    names = normalize_tags(body.tags)
+    if names:
+        ensure_tags(db.get_bind(), user.id, names)
+
+    if not _note_exists(db, user.id, note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    names = set_note_tags(db, user.id, note_id, names)
+    db.commit()
+    return {"tags": names}
+
+
+# ---------------- RELATED NOTES API ----------------
+# GET /notes/{note_id}/related?limit=10
+# ?duplicates=true → sirf near-duplicates (MinHash Jaccard order)
+# Per-worker in-memory index (pehli call par background me build → tab tak
+# 202 + khaali list + Retry-After; phir change_seq se incremental)
+# Archived (cold tier) notes bhi index me hai
+@router.get("/{note_id}/related", response_model=list[RelatedNoteResponse])
+def related_notes(
+    note_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    duplicates: bool = False,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    found = related_index.related(db, user.id, note_id, limit, duplicates)
+    if found is INDEX_BUILDING:
+        return JSONResponse(status_code=202, content=[], headers={"Retry-After": "1"})
+    if found is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if not found:
+        return []
+
+    ids = [row[0] for row in found]
+    titles = {}
+    for model in (Note, NoteArchive):
+        missing = [related_id for related_id in ids if related_id not in titles]
+        if missing:
+            titles.update(db.execute(
+                select(model.id, model.title).where(model.user_id == user.id, model.id.in_(missing))
+            ).all())
+
+    keys = {}
+    return [
+        {
+            "id": related_id,
+            "title": note_cipher.decrypt(user.id, titles[related_id], keys),
+            "score": round(score, 4),
+            "jaccard": round(jaccard, 4),
+            "near_duplicate": jaccard >= SIMILARITY_DUPLICATE_THRESHOLD
+        }
+        for related_id, score, jaccard in found
+        if related_id in titles
+    ]
+
+
+# ---------------- REVISION HISTORY APIs ----------------
+# GET /notes/{note_id}/revisions?before=<revision>&limit=<n>
+# Newest first; agla page → ?before=<last revision>
+@router.get("/{note_id}/revisions", response_model=list[NoteRevisionInfo])
+def list_note_revisions(
+    note_id: int,
+    before: Optional[int] = None,
+    limit: int = 50,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    limit = max(1, min(limit, 200))
+
+    stmt = (
+        select(
+            NoteRevision.revision, NoteRevision.title,
+            NoteRevision.size, NoteRevision.created_at
+        )
+        .where(NoteRevision.note_id == note_id, NoteRevision.user_id == user.id)
+        .order_by(NoteRevision.revision.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(NoteRevision.revision < before)
+
+    rows = db.execute(stmt).mappings().all()
+
+    if not rows and before is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return [{**row, "title": note_cipher.decrypt(user.id, row["title"])} for row in rows]
+
+
+# GET /notes/{note_id}/revisions/{revision}
+# Nearest snapshot + deltas se us version ka content
+@router.get("/{note_id}/revisions/{revision}", response_model=NoteRevisionResponse)
+def get_note_revision(
+    note_id: int,
+    revision: int,
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    found = reconstruct(db, note_id, user.id, revision)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    row, content = found
+    return {
+        "revision": row.revision,
+        "title": note_cipher.decrypt(user.id, row.title),
+        "size": len(content),
+        "created_at": row.created_at,
+        "content": content
+    }
+
+
+# POST /notes/{note_id}/revisions/{revision}/restore
+# Purana version naye version ke roop me wapas (history nahi mitti)
+@router.post("/{note_id}/revisions/{revision}/restore", response_model=NoteResponse)
+def restore_note_revision(
+    note_id: int,
+    revision: int,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    found = reconstruct(db, note_id, user.id, revision)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    old, content = found
+    row = update_note_values(
+        db, user.id, note_id,
+        {"title": note_cipher.decrypt(user.id, old.title), "content": content},
+        parse_if_match(if_match)
+    )
+    replica_router.mark_write(user.id)
+    publish_note_event(user.id, "updated", note_id, row["change_seq"])
+
+    response.headers["ETag"] = f'"{row["version"]}"'
+    return row
+
+
+# ---------------- GET NOTE API ----------------
+# GET /notes/{note_id}
+# Bada content list ki tarah truncate (content_truncated=True)
+# Hot tier me nahi → cold tier (archived=True), unarchive nahi hota
+@router.get("/{note_id}", response_model=NoteResponse)
+def get_note(
+    note_id: int,
+    response: Response,
+    content_max: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    notes = _inline_notes(db, user.id, content_max, Note.id == note_id) or \
+        _archived_notes(db, user.id, content_max, NoteArchive.id == note_id)
+    if not notes:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    note = notes[0]
+    version = note["version"] if isinstance(note, dict) else note.version
+    response.headers["ETag"] = f'"{version}"'
+    return note
+
+
+# ---------------- NOTE CONTENT STREAM API ----------------
+# GET /notes/{note_id}/content
+# Content UTF-8 bytes me stream hota hai; Range: bytes=a-b → 206
+# Har chunk ek SUBSTR query → poora content kabhi ek saath memory me nahi
+
+
+def _stream_content(bind, note_id: int, version: int, start: int, end: int):
+    content_bytes = cast(Note.content, LargeBinary)
+
+    # Ek connection + transaction → saare chunks ek hi snapshot se
+    with bind.connect() as conn:
+        for position in range(start, end + 1, NOTE_CONTENT_CHUNK):
+            length = min(NOTE_CONTENT_CHUNK, end + 1 - position)
+            piece = conn.execute(
+                select(func.substr(content_bytes, position + 1, length))
+                .where(Note.id == note_id, Note.version == version)
+            ).scalar()
+            if piece is None:
+                # Stream ke beech note badal gaya → connection band (client retry kare)
+                raise RuntimeError(f"Note {note_id} stream ke beech update hua")
+            yield bytes(piece)
+
+
+def _stream_bytes(data: bytes, start: int, end: int):
+    view = memoryview(data)
+    for position in range(start, end + 1, NOTE_CONTENT_CHUNK):
+        yield view[position:min(position + NOTE_CONTENT_CHUNK, end + 1)]
+
+
+@router.get("/{note_id}/content")
+def get_note_content(
+    note_id: int,
+    range: Optional[str] = Header(None),
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    row = db.execute(
+        select(
+            Note.version,
+            func.length(cast(Note.content, LargeBinary)).label("size"),
+            func.substr(Note.content, 1, len(CIPHER_PREFIX)).label("head")
+        )
+        .where(Note.id == note_id, Note.user_id == user.id)
+    ).first()
+
+    cold = archived_note(db, user.id, note_id) if row is None else None
+    if row is None and cold is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    if cold is not None:
+        # Cold tier → compressed blob ek hi baar decompress (+ decrypt), phir slice
+        data = note_cipher.decrypt(user.id, cold["content"]).encode()
+        byte_range = parse_range(range, len(data))
+        start, end = byte_range if byte_range else (0, len(data) - 1)
+        body = _stream_bytes(data, start, end)
+        size = len(data)
+        version = cold["version"]
+    elif row.head == CIPHER_PREFIX:
+        # Encrypted → GCM ka substring decrypt nahi hota, poora decrypt karke slice
+        content = db.execute(select(Note.content).where(Note.id == note_id)).scalar()
+        data = note_cipher.decrypt(user.id, content).encode()
+        byte_range = parse_range(range, len(data))
+        start, end = byte_range if byte_range else (0, len(data) - 1)
+        body = _stream_bytes(data, start, end)
+        size = len(data)
+        version = row.version
+    else:
+        size = row.size
+        byte_range = parse_range(range, size)
+        start, end = byte_range if byte_range else (0, size - 1)
+        body = _stream_content(db.get_bind(), note_id, row.version, start, end)
+        version = row.version
+
+    headers = range_headers(byte_range, size)
+    headers["ETag"] = f'"{version}"'
+
+    return StreamingResponse(
+        body,
+        status_code=206 if byte_range else 200,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
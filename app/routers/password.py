@@ -23,8 +23,10 @@ from ..schemas import (
 )
 # Database & Models
 
-from ..database import SessionLocal
+from ..database import SessionLocal, replica_router
 from ..models import User, EmailOTP
+# OTP send limit (per email per hour)
+from ..usage import charge_otp_send
 
 # Auth utilities
 
@@ -37,7 +39,7 @@ from ..auth import (
 
 # Current user dependency (JWT based)
 
-from ..dependencies import get_current_user
+from ..dependencies import forget_principal, get_current_user
 
 
 # Router
@@ -74,11 +76,14 @@ def forgot_password(
             detail="User with this email does not exist"
         )
 
-    # 🔹 Step 2: generate OTP
+    # 🔹 Step 2: ghante ki OTP limit (counter OTP insert ke transaction me, limit par 429)
+    charge_otp_send(db, data.email)
+
+    # 🔹 Step 3: generate OTP
     otp_code = generate_otp()
     expiry_time = get_otp_expiry_time()
 
-    # 🔹 Step 3: save OTP in database
+    # 🔹 Step 4: save OTP in database
     otp_entry = EmailOTP(
         email=data.email,
         otp_code=otp_code,
@@ -145,6 +150,9 @@ def reset_password(
     otp_record.is_verified = 1
 
     db.commit()
+    replica_router.mark_write(user.id)
+    # Cached principal hatao (sab workers) → agla request DB se fresh row
+    forget_principal(user.id)
 
     return {
         "message": "Password reset successfully"
@@ -162,15 +170,22 @@ def change_password(
     db: Session = Depends(get_db)
 ):
     # 🔹 Step 1: old password verify
-    if not verify_password(data.old_password, current_user.hashed_password):
+    # current_user cache se aa sakta hai (hashed_password cache nahi hota) → primary se
+    hashed = db.query(User.hashed_password).filter(User.id == current_user.id).scalar()
+    if not verify_password(data.old_password, hashed):
         raise HTTPException(
             status_code=400,
             detail="Old password is incorrect"
         )
 
     # 🔹 Step 2: new password hash & save
-    current_user.hashed_password = hash_password(data.new_password)
+    # current_user replica session se aaya hai → update primary session par
+    db.query(User).filter(User.id == current_user.id).update(
+        {User.hashed_password: hash_password(data.new_password)}
+    )
     db.commit()
+    replica_router.mark_write(current_user.id)
+    forget_principal(current_user.id)
 
     return {
         "message": "Password changed successfully"
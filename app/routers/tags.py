@@ -0,0 +1,45 @@
+# Tags APIs
+# Tag note ke saath khud banta hai (POST /notes, PUT /notes/{id}/tags);
+# yaha listing (incremental note_count ke saath) aur delete
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+# SQLAlchemy Session → database se communication ke liye
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..dependencies import get_current_user   # current user
+from ..models import Tag
+from ..schemas import TagResponse
+from ..sharding import get_shard_db, get_shard_read_db   # user ke shard ka session
+from ..tags import delete_tag
+
+router = APIRouter(
+    prefix="/tags",
+    tags=["Tags"]
+)
+
+
+# ---------------- LIST TAGS API ----------------
+# GET /tags → naam order me, har tag ke notes ki ginti (column, COUNT(*) nahi)
+@router.get("/", response_model=list[TagResponse])
+def list_tags(
+    db: Session = Depends(get_shard_read_db),
+    user = Depends(get_current_user)
+):
+    return db.execute(
+        select(Tag).where(Tag.user_id == user.id).order_by(Tag.name)
+    ).scalars().all()
+
+
+# ---------------- DELETE TAG API ----------------
+# DELETE /tags/{tag_id} → tag notes se bhi hat jaata hai (notes delete nahi hote)
+@router.delete("/{tag_id}", status_code=204)
+def remove_tag(
+    tag_id: int,
+    db: Session = Depends(get_shard_db),
+    user = Depends(get_current_user)
+):
+    if not delete_tag(db, user.id, tag_id):
+        raise HTTPException(status_code=404, detail="Tag not found")
+    db.commit()
+    return Response(status_code=204)
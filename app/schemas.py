@@ -5,6 +5,7 @@
 
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from typing import Optional
 
 
 #                USER REGISTRATION (OTP BASED)
@@ -65,25 +66,186 @@ class TokenSchema(BaseModel):
 class NoteCreate(BaseModel):
     title: str
     content: str
+    folder_id: Optional[int] = None      # NULL → root
+    tags: list[str] = []                 # naye tags khud ban jaate hai
 
 
-# Note update request
+# Note update request (PUT → poora note replace)
 class NoteUpdate(BaseModel):
     title: str
     content: str
 
 
+# Note partial update request (PATCH → sirf bheje gaye fields)
+class NotePatch(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+
 # Note response
 class NoteResponse(BaseModel):
     id: int
     title: str
     content: str
     created_at: datetime
+    version: int                 # ETag / If-Match ke liye
+    updated_at: Optional[datetime] = None
+    change_seq: int              # Delta sync cursor
+    folder_id: Optional[int] = None
+
+    # Bada content list / detail me truncate hota hai → poora GET /notes/{id}/content se
+    content_truncated: bool = False
+    content_length: Optional[int] = None    # poore content ke characters (truncation par)
+
+    # Cold tier (notes_archive) se aaya note; edit / move / delete par wapas hot
+    archived: bool = False
+
+    class Config:
+        from_attributes = True
+
+
+# Delete hua note (delta sync tombstone)
+class NoteTombstoneResponse(BaseModel):
+    id: int
+    change_seq: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# GET /notes/changes response
+class NoteChangesResponse(BaseModel):
+    notes: list[NoteResponse]               # naye / badle notes
+    deleted: list[NoteTombstoneResponse]    # delete hue notes
+    cursor: int                             # agli request ka ?since=
+    has_more: bool                          # aur changes baaki hai
+
+
+# Note attachment (file) metadata
+class AttachmentResponse(BaseModel):
+    id: int
+    note_id: int
+    filename: str
+    content_type: str
+    size: int                # bytes
+    sha256: str              # download ETag
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# GET /notes/attachments/usage
+class StorageUsageResponse(BaseModel):
+    bytes_used: int
+    attachment_count: int
+
+
+# GET /me/usage → counters + limits (quota 0 → limit nahi)
+class UsageResponse(BaseModel):
+    note_count: int
+    note_quota: int
+    content_bytes: int
+    content_quota_bytes: int
+    attachment_count: int
+    attachment_bytes: int
+    otp_sends_this_hour: int
+    otp_sends_per_hour: int
+
+
+# DELETE /me → purge background me
+class AccountDeletionResponse(BaseModel):
+    status: str
+    requested_at: datetime
+
+
+# GET /notes/{id}/revisions → sirf metadata (content nahi)
+class NoteRevisionInfo(BaseModel):
+    revision: int          # us waqt ka note version
+    title: str
+    size: int              # content size
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# GET /notes/{id}/revisions/{revision} → reconstructed content
+class NoteRevisionResponse(NoteRevisionInfo):
+    content: str
+
+
+
+#                FOLDERS / TAGS SCHEMAS
+
+
+# POST /folders
+class FolderCreate(BaseModel):
+    name: str
+    parent_id: Optional[int] = None      # NULL → top level
+
+
+# PATCH /folders/{id} → rename aur / ya move (parent_id null → top level)
+class FolderUpdate(BaseModel):
+    name: Optional[str] = None
+    parent_id: Optional[int] = None
+
+
+class FolderResponse(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    path: str                  # "/<root id>/.../<id>/"
+    note_count: int            # sirf is folder ke notes
+    total_count: int           # subfolders ke notes ke saath
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TagResponse(BaseModel):
+    id: int
+    name: str
+    note_count: int
 
     class Config:
         from_attributes = True
 
 
+# PUT /notes/{id}/folder
+class NoteFolderUpdate(BaseModel):
+    folder_id: Optional[int] = None
+
+
+# PUT /notes/{id}/tags → note ke tags exactly yahi
+class NoteTagsUpdate(BaseModel):
+    tags: list[str]
+
+
+# POST /notes/batch-get
+# fields → sirf ye NoteResponse fields (None → saare); content na maanga ho to DB se aata hi nahi
+class NoteBatchGetRequest(BaseModel):
+    ids: list[int]
+    fields: Optional[list[str]] = None
+    content_max: Optional[int] = None     # GET /notes jaisa truncation
+
+
+class NoteBatchGetResponse(BaseModel):
+    notes: list[dict]            # request ke ids ke order me (projected)
+    missing: list[int]           # nahi mile / kisi aur user ke ids
+
+
+# GET /notes/{id}/related
+class RelatedNoteResponse(BaseModel):
+    id: int
+    title: str
+    score: float               # TF-IDF cosine (0-1)
+    jaccard: float             # MinHash Jaccard estimate (0-1)
+    near_duplicate: bool       # jaccard >= SIMILARITY_DUPLICATE_THRESHOLD
+
+
 
 #           FORGOT / RESET / CHANGE PASSWORD
 
@@ -105,3 +267,34 @@ class ResetPasswordRequest(BaseModel):
 class ChangePasswordRequest(BaseModel):
     old_password: str            # Purana password
     new_password: str            # Naya password
+
+
+#           ADMIN (PROFILER)
+
+
+# POST /admin/profiler
+# mode "worker" → is worker ke saare threads; "header" → sirf X-Profile-Request wali requests
+class ProfilerStartRequest(BaseModel):
+    seconds: float = 30
+    interval_ms: Optional[float] = None     # None → PROFILER_INTERVAL_MS
+    mode: str = "worker"
+
+
+class ProfileInfo(BaseModel):
+    pid: int
+    mode: str
+    seconds: float
+    interval_ms: float
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    samples: int
+    collapsed_path: str
+    svg_path: str
+    error: Optional[str] = None
+
+
+# GET /admin/profiler
+class ProfilerStatusResponse(BaseModel):
+    pid: int
+    active: Optional[ProfileInfo] = None
+    last: Optional[ProfileInfo] = None
@@ -0,0 +1,580 @@
+
+# Horizontal sharding of notes by user_id
+#
+# Har note query Note.user_id se scoped hai → user_id hi shard key hai.
+#
+#   - Consistent hash ring naye users ko shard assign karta hai
+#   - shard_routes table (primary DB) assignment ko pin kar deti hai,
+#     isliye shard add karne par purane users apne aap move nahi hote
+#   - Users ko move karne ke liye resumable online rebalancer:
+#
+#       python -m app.sharding plan                      → kaun se users ring se alag shard par hai
+#       python -m app.sharding move --user-id 7 --to 2   → ek user move
+#       python -m app.sharding rebalance                 → plan ke saare users move
+#
+# DATABASE_SHARD_URLS set nahi hai → ek hi shard (primary), routing table
+# ko koi query nahi jaati
+
+
+import argparse
+import bisect
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, status
+
+from sqlalchemy import MetaData, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import DATABASE_URL, ReadSessionLocal, SessionLocal, create_db_engine, engine
+from .dependencies import get_current_user
+from .models import (
+    Attachment, AttachmentChunk, Base, Folder, IdAllocator, Note, NoteArchive, NoteRevision,
+    NoteSeq, NoteTag, NoteTombstone, ShardMove, ShardRoute, Tag, UserStats, UserStorage
+)
+
+
+#                    SHARD CONFIG
+
+# Comma separated shard URLs → shard id = list me position
+# Example: DATABASE_SHARD_URLS="sqlite:///shard0.db,sqlite:///shard1.db"
+DATABASE_SHARD_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_SHARD_URLS", "").split(",")
+    if url.strip()
+]
+
+SHARDING_ENABLED = bool(DATABASE_SHARD_URLS)
+
+# Har shard ke ring par kitne virtual nodes (load evenly spread ho)
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "64"))
+
+# Worker routing table ko itne seconds cache karta hai
+# Rebalancer har phase ke baad itna wait karta hai taaki sab workers naya route dekh lein
+SHARD_ROUTE_CACHE_SECONDS = float(os.getenv("SHARD_ROUTE_CACHE_SECONDS", "5"))
+
+# Note ids ek baar me kitne reserve hon
+NOTE_ID_BLOCK_SIZE = int(os.getenv("NOTE_ID_BLOCK_SIZE", "1000"))
+
+# Shard par sirf ye tables hoti hai (users / otps primary par hi rehte hain)
+SHARDED_TABLES = [
+    "notes", "notes_archive", "note_seq", "note_tombstones", "note_revisions",
+    "attachments", "attachment_chunks", "user_storage", "user_stats", "folders", "tags",
+    "note_tags", "schema_version"
+]
+
+# Rebalance me move hone wali tables (sabme user_id column hona chahiye)
+MOVED_TABLES = [
+    Note.__table__, NoteArchive.__table__, NoteSeq.__table__, NoteTombstone.__table__,
+    NoteRevision.__table__, Attachment.__table__, AttachmentChunk.__table__,
+    UserStorage.__table__, UserStats.__table__, Folder.__table__, Tag.__table__,
+    NoteTag.__table__
+]
+
+
+#                    SHARD ENGINES
+
+
+def _create_shard_engine(url):
+    # Primary hi shard list me hai → wahi engine reuse (alag pool nahi)
+    if url == DATABASE_URL:
+        return engine
+    return create_db_engine(url, pool_pre_ping=True)
+
+
+shard_engines = (
+    [_create_shard_engine(url) for url in DATABASE_SHARD_URLS]
+    if SHARDING_ENABLED
+    else [engine]
+)
+
+
+def shard_metadata():
+    """
+    Shard DB ka schema → SHARDED_TABLES ki copy, bina un foreign keys ke
+    jo primary wali tables (users) ko point karti hai
+    """
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        if table.name in SHARDED_TABLES:
+            table.to_metadata(metadata)
+
+    for table in metadata.tables.values():
+        for fk in list(table.foreign_key_constraints):
+            if fk.elements[0].target_fullname.split(".")[0] in SHARDED_TABLES:
+                continue
+            table.constraints.discard(fk)
+            for element in fk.elements:
+                element.parent.foreign_keys.discard(element)
+                table.foreign_keys.discard(element)
+
+    return metadata
+
+
+#                    CONSISTENT HASH RING
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hashing → shard add karne par sirf ~1/N keys ka shard badalta hai
+    """
+
+    def __init__(self, shard_ids, virtual_nodes=SHARD_VIRTUAL_NODES):
+        points = sorted(
+            (_hash(f"shard-{shard_id}#{v}"), shard_id)
+            for shard_id in shard_ids
+            for v in range(virtual_nodes)
+        )
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    def shard_for(self, user_id) -> int:
+        i = bisect.bisect(self._keys, _hash(f"user-{user_id}"))
+        return self._shards[i % len(self._shards)]
+
+
+#                    SHARD ROUTER
+
+
+class ShardRouter:
+    """
+    user_id → shard engine
+
+    Routing table lookups per worker LRU cache me SHARD_ROUTE_CACHE_SECONDS
+    tak rehte hain (route nahi hai wala result bhi cache hota hai)
+    """
+
+    def __init__(self, engines, cache_seconds=SHARD_ROUTE_CACHE_SECONDS,
+                 cache_size=50000):
+        self.engines = engines
+        self.ring = HashRing(range(len(engines)))
+        self.cache_seconds = cache_seconds
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()    # user_id → (expires_at, shard_id, moving, pinned)
+        self._id_blocks = {}           # table name → (next, end) hi/lo ids
+
+    @property
+    def enabled(self):
+        return len(self.engines) > 1 or self.engines[0] is not engine
+
+    def route_for(self, user_id):
+        """
+        (shard_id, moving, pinned) return karta hai
+        pinned=False → routing table me entry nahi, ring ka shard
+        """
+        if not self.enabled:
+            return 0, False, True
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and cached[0] > now:
+                self._cache.move_to_end(user_id)
+                return cached[1:]
+
+        with SessionLocal() as db:
+            route = db.get(ShardRoute, user_id)
+
+        if route is None:
+            result = (self.ring.shard_for(user_id), False, False)
+        else:
+            result = (route.shard_id, bool(route.moving), True)
+
+        self._remember(user_id, result)
+        return result
+
+    def _remember(self, user_id, result):
+        with self._lock:
+            self._cache[user_id] = (time.monotonic() + self.cache_seconds, *result)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def assign(self, user_id):
+        """
+        Write se pehle call hota hai → user ka route pin karta hai
+        (pehle se pinned hai to koi query nahi)
+        (shard_id, moving) return karta hai
+        """
+        shard_id, moving, pinned = self.route_for(user_id)
+        if pinned:
+            return shard_id, moving
+
+        with SessionLocal() as db:
+            db.add(ShardRoute(user_id=user_id, shard_id=shard_id, moving=False))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Dusre worker ne pehle pin kar diya → wahi route use karo
+                db.rollback()
+                route = db.get(ShardRoute, user_id)
+                shard_id, moving = route.shard_id, bool(route.moving)
+
+        self._remember(user_id, (shard_id, moving, True))
+        return shard_id, moving
+
+    def engine_for(self, user_id):
+        return self.engines[self.route_for(user_id)[0]]
+
+    def forget(self, user_id):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def next_id(self, table) -> int:
+        """
+        Shard table ke liye globally unique id (hi/lo) → ek primary
+        round-trip har NOTE_ID_BLOCK_SIZE rows par
+        """
+        with self._lock:
+            next_id, end = self._id_blocks.get(table.name, (0, 0))
+            if next_id < end:
+                self._id_blocks[table.name] = (next_id + 1, end)
+                return next_id
+
+        start = allocate_ids(table, NOTE_ID_BLOCK_SIZE)
+        with self._lock:
+            self._id_blocks[table.name] = (start + 1, start + NOTE_ID_BLOCK_SIZE)
+        return start
+
+    def next_note_id(self) -> int:
+        return self.next_id(Note.__table__)
+
+
+def allocate_ids(table, count: int) -> int:
+    """
+    Primary par table ka counter badha ke [start, start + count) range reserve karta hai
+    UPDATE pehle → row lock (MySQL) / write lock (SQLite), race nahi hota
+    Pehli allocation par do workers ek saath INSERT kare → haarne wala
+    IntegrityError ke baad UPDATE path se retry (row ab ban chuki hai)
+    """
+    try:
+        return _allocate_ids(table, count)
+    except IntegrityError:
+        return _allocate_ids(table, count)
+
+
+def _allocate_ids(table, count: int) -> int:
+    with engine.begin() as conn:
+        updated = conn.execute(
+            update(IdAllocator)
+            .where(IdAllocator.name == table.name)
+            .values(next_id=IdAllocator.next_id + count)
+        ).rowcount
+
+        if not updated:
+            # Pehli baar → saare shards ke max id ke baad se shuru
+            start = 1 + max(
+                _max_id(bind, table) for bind in set(shard_router.engines) | {engine}
+            )
+            conn.execute(
+                IdAllocator.__table__.insert().values(name=table.name, next_id=start + count)
+            )
+            return start
+
+        return conn.execute(
+            select(IdAllocator.next_id).where(IdAllocator.name == table.name)
+        ).scalar() - count
+
+
+def _max_id(bind, table) -> int:
+    with bind.connect() as conn:
+        return conn.execute(select(func.max(_pk(table)))).scalar() or 0
+
+
+shard_router = ShardRouter(shard_engines)
+
+
+#                    SHARD SESSION DEPENDENCIES
+
+
+def get_shard_db(user=Depends(get_current_user)):
+    """
+    Notes write ke liye session → user ke shard par
+    User move ho raha hai → 503 (thodi der baad retry)
+    """
+    shard_id, moving = shard_router.assign(user.id)
+    if moving:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Notes migrate ho rahe hain, thodi der baad try karo",
+            headers={"Retry-After": str(int(SHARD_ROUTE_CACHE_SECONDS) + 1)}
+        )
+
+    db = SessionLocal(bind=shard_router.engines[shard_id])
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_shard_read_db(user=Depends(get_current_user)):
+    """
+    Notes read ke liye session → user ka shard
+    Shard hi primary hai → read replica routing (read-your-writes ke saath,
+    replica fail → same request me failover)
+    """
+    bind = shard_router.engine_for(user.id)
+    if bind is engine:
+        db = ReadSessionLocal(user_id=user.id)
+    else:
+        db = SessionLocal(bind=bind)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+#                    ONLINE REBALANCER
+
+
+def _pk(table):
+    # Moved tables ka single-column primary key (notes.id, note_seq.user_id ...)
+    return list(table.primary_key.columns)[0]
+
+
+def _sync_rows(source, target, table, user_id, after_id, batch_size):
+    """
+    Source se target par user ki rows (pk > after_id) copy / update karta hai
+    Last copy hua pk return karta hai (None → kuch bacha nahi)
+    """
+    pk = _pk(table)
+    rows = source.execute(
+        select(table)
+        .where(table.c.user_id == user_id, pk > after_id)
+        .order_by(pk)
+        .limit(batch_size)
+    ).mappings().all()
+    if not rows:
+        return None
+
+    ids = [row[pk.name] for row in rows]
+    existing = {
+        row[pk.name]: row
+        for row in target.execute(
+            select(table).where(pk.in_(ids))
+        ).mappings()
+    }
+
+    inserts = [dict(row) for row in rows if row[pk.name] not in existing]
+    if inserts:
+        target.execute(table.insert(), inserts)
+
+    for row in rows:
+        if row[pk.name] in existing and dict(existing[row[pk.name]]) != dict(row):
+            target.execute(
+                table.update().where(pk == row[pk.name]).values(dict(row))
+            )
+
+    return ids[-1]
+
+
+def _delete_missing(source, target, table, user_id, batch_size):
+    """Source se delete ho chuki rows target se bhi hatao"""
+    pk = _pk(table)
+    after_id = 0
+    while True:
+        ids = target.execute(
+            select(pk)
+            .where(table.c.user_id == user_id, pk > after_id)
+            .order_by(pk)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return
+        present = set(
+            source.execute(select(pk).where(pk.in_(ids))).scalars()
+        )
+        gone = [i for i in ids if i not in present]
+        if gone:
+            target.execute(delete(table).where(pk.in_(gone)))
+        after_id = ids[-1]
+
+
+def _set_state(user_id, **values):
+    with SessionLocal() as db:
+        db.query(ShardMove).filter(ShardMove.user_id == user_id).update(values)
+        db.commit()
+
+
+def move_user(user_id: int, target_shard: int, batch_size: int = 500,
+              log=print):
+    """
+    User ke notes ek shard se dusre par move karta hai (online + resumable)
+
+    1. copying   → writes chalu rehte hai, batches me copy (last_note_id checkpoint)
+    2. freezing  → route moving=True, cache expire hone tak wait, phir
+                   final sync (naye / badle / delete hue notes)
+    3. cleanup   → route target shard par flip, wait, source se delete
+    4. done
+
+    Beech me crash hua → wahi command dobara chalao, jaha ruka tha waha se chalega
+    """
+    with SessionLocal() as db:
+        move = db.get(ShardMove, user_id)
+        route = db.get(ShardRoute, user_id)
+
+        if move is None or move.state == "done":
+            source_shard = route.shard_id if route else shard_router.ring.shard_for(user_id)
+            if source_shard == target_shard:
+                log(f"user {user_id}: already on shard {target_shard}")
+                return
+
+            if move is not None:
+                db.delete(move)
+                db.flush()
+            if route is None:
+                db.add(ShardRoute(user_id=user_id, shard_id=source_shard, moving=False))
+
+            move = ShardMove(
+                user_id=user_id,
+                source_shard=source_shard,
+                target_shard=target_shard,
+                state="copying",
+                last_note_id=0
+            )
+            db.add(move)
+            db.commit()
+        elif move.target_shard != target_shard:
+            raise RuntimeError(
+                f"user {user_id} ka move shard {move.target_shard} par pehle se chal raha hai"
+            )
+
+        source_shard = move.source_shard
+        state = move.state
+        last_note_id = move.last_note_id
+
+    source = shard_router.engines[source_shard]
+    target = shard_router.engines[target_shard]
+    started = time.perf_counter()
+
+    if state == "copying":
+        # Bulk copy sirf notes ka (checkpoint ke saath); baaki tables
+        # freezing phase ke final sync me aa jaati hai
+        notes = Note.__table__
+        while True:
+            with source.connect() as src, target.begin() as dst:
+                last = _sync_rows(src, dst, notes, user_id, last_note_id, batch_size)
+            if last is None:
+                break
+            last_note_id = last
+            _set_state(user_id, last_note_id=last_note_id)
+
+        with SessionLocal() as db:
+            db.query(ShardRoute).filter(ShardRoute.user_id == user_id).update(
+                {ShardRoute.moving: True}
+            )
+            db.commit()
+        _set_state(user_id, state="freezing")
+        state = "freezing"
+        log(f"user {user_id}: copy done, freezing writes")
+
+    if state == "freezing":
+        # Sab workers ka route cache expire ho → koi bhi source par nahi likhega
+        time.sleep(SHARD_ROUTE_CACHE_SECONDS)
+
+        with source.connect() as src, target.begin() as dst:
+            for table in MOVED_TABLES:
+                after_id = 0
+                while after_id is not None:
+                    after_id = _sync_rows(src, dst, table, user_id, after_id, batch_size)
+                _delete_missing(src, dst, table, user_id, batch_size)
+
+        with SessionLocal() as db:
+            db.query(ShardRoute).filter(ShardRoute.user_id == user_id).update(
+                {ShardRoute.shard_id: target_shard, ShardRoute.moving: False}
+            )
+            db.commit()
+        _set_state(user_id, state="cleanup")
+        state = "cleanup"
+        shard_router.forget(user_id)
+        log(f"user {user_id}: route flipped to shard {target_shard}")
+
+    if state == "cleanup":
+        # Purane route wale readers khatam hone do
+        time.sleep(SHARD_ROUTE_CACHE_SECONDS)
+
+        for table in reversed(MOVED_TABLES):
+            while True:
+                with source.begin() as src:
+                    ids = src.execute(
+                        select(_pk(table))
+                        .where(table.c.user_id == user_id)
+                        .limit(batch_size)
+                    ).scalars().all()
+                    if not ids:
+                        break
+                    src.execute(delete(table).where(_pk(table).in_(ids)))
+
+        _set_state(user_id, state="done")
+
+    log(f"user {user_id}: moved {source_shard} → {target_shard} "
+        f"in {time.perf_counter() - started:.1f}s")
+
+
+def rebalance_plan():
+    """
+    Pinned users jinka routing table shard ring ke shard se alag hai
+    (shard add / remove ke baad) + adhoore moves
+    Manual `move` se jaan-boojh kar rakhe gaye users skip hote hai
+    """
+    with SessionLocal() as db:
+        moves = {move.user_id: move for move in db.query(ShardMove).all()}
+
+        plan = {}
+        for route in db.query(ShardRoute).all():
+            move = moves.get(route.user_id)
+            if move is not None and move.target_shard == route.shard_id:
+                continue
+            ring_shard = shard_router.ring.shard_for(route.user_id)
+            if route.shard_id != ring_shard:
+                plan[route.user_id] = ring_shard
+
+        for move in moves.values():
+            if move.state != "done":
+                plan[move.user_id] = move.target_shard
+    return plan
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.sharding")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("plan", help="ring se alag shard par pinned users")
+
+    move = sub.add_parser("move", help="ek user ke notes move karo")
+    move.add_argument("--user-id", type=int, required=True)
+    move.add_argument("--to", type=int, required=True)
+    move.add_argument("--batch-size", type=int, default=500)
+
+    rebalance = sub.add_parser("rebalance", help="plan ke saare users move karo")
+    rebalance.add_argument("--batch-size", type=int, default=500)
+
+    args = parser.parse_args(argv)
+
+    if not shard_router.enabled:
+        parser.error("DATABASE_SHARD_URLS set nahi hai")
+
+    if args.command == "plan":
+        for user_id, target in sorted(rebalance_plan().items()):
+            print(f"user {user_id} → shard {target}")
+    elif args.command == "move":
+        move_user(args.user_id, args.to, args.batch_size)
+    elif args.command == "rebalance":
+        for user_id, target in sorted(rebalance_plan().items()):
+            move_user(user_id, target, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+
+# "Related notes" engine (in-process, NumPy)
+#
+# Har user ke notes ka per-worker index:
+#   - TF-IDF → words feature hashing se SIMILARITY_FEATURES buckets me,
+#     sparse vector = (bucket ids int32, tf float32) → cosine similarity
+#   - MinHash → word 3-shingles ki SIMILARITY_MINHASH_PERMS min-hashes (uint32)
+#     → Jaccard estimate (near-duplicate detection)
+#
+# Scoring poore user ke notes par ek saath (postings gather + np.bincount,
+# signatures == compare) → per-note Python loop nahi.
+#
+# Index pehli query par background thread me DB se banta hai (hot + archived
+# notes; LRU, SIMILARITY_MAX_USERS users) → tab tak API 202; phir har query se
+# pehle (user_id, change_seq) cursor se sirf naye / badle / delete hue notes
+# apply hote hai → kisi bhi worker ka create / update agli query me dikhta hai,
+# write path par tokenizing ka kharcha nahi.
+#
+# NumPy pehli index build / query par import hota hai (app startup par nahi).
+#
+#   python -m app.similarity bench --notes 10000 100000
+
+
+import argparse
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .archive import decompress
+from .encryption import note_cipher
+from .models import Note, NoteArchive, NoteSeq, NoteTombstone
+
+
+#                    SIMILARITY CONFIG
+
+# Feature hashing buckets (power of 2); per user df array = 4 bytes x isse
+SIMILARITY_FEATURES = int(os.getenv("SIMILARITY_FEATURES", str(1 << 17)))
+
+# Har note ki MinHash signature length (memory: 4 bytes x perms per note)
+SIMILARITY_MINHASH_PERMS = int(os.getenv("SIMILARITY_MINHASH_PERMS", "64"))
+
+# Per worker kitne users ke index memory me (LRU)
+SIMILARITY_MAX_USERS = int(os.getenv("SIMILARITY_MAX_USERS", "32"))
+
+# Note ke itne characters hi index hote hai (bahut bade notes)
+SIMILARITY_MAX_CHARS = int(os.getenv("SIMILARITY_MAX_CHARS", "100000"))
+
+# Itne badle notes ke baad postings dobara pack (tab tak alag delta segment)
+SIMILARITY_DELTA_MAX = int(os.getenv("SIMILARITY_DELTA_MAX", "1000"))
+
+# Itne fraction se zyada notes me aane wale words (the, and, ...) query me
+# skip → unki postings sabse lambi aur idf (score me hissa) sabse kam
+SIMILARITY_MAX_DF = float(os.getenv("SIMILARITY_MAX_DF", "0.1"))
+
+# Jaccard estimate isse upar → near_duplicate
+SIMILARITY_DUPLICATE_THRESHOLD = float(os.getenv("SIMILARITY_DUPLICATE_THRESHOLD", "0.8"))
+
+# Index build background me; request itne ms tak wait karti hai (chhote users
+# ko 202 na mile), phir 202 (client thodi der baad retry kare)
+SIMILARITY_BUILD_WAIT_MS = float(os.getenv("SIMILARITY_BUILD_WAIT_MS", "200"))
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# related() ka result jab index abhi background me ban raha hai
+INDEX_BUILDING = "building"
+
+
+@lru_cache
+def _numpy():
+    # NumPy import heavy hai → pehli index build / query par hi
+    import numpy
+    return numpy
+
+
+@lru_cache
+def _minhash_params():
+    # MinHash permutations → (a * x + b) mod 2^64, upar ke 32 bits (a odd)
+    np = _numpy()
+    rng = np.random.default_rng(20240917)
+    a = rng.integers(1, 2 ** 63, SIMILARITY_MINHASH_PERMS, dtype=np.uint64) * 2 + 1
+    b = rng.integers(0, 2 ** 63, SIMILARITY_MINHASH_PERMS, dtype=np.uint64)
+    return a, b
+
+
+#                    FEATURES
+
+
+def features(text: str, dim=SIMILARITY_FEATURES):
+    """
+    Text → (bucket ids, tf weights, minhash signature)
+    hash() process ke andar stable hai; index sirf isi process me rehta hai
+    """
+    np = _numpy()
+    minhash_a, minhash_b = _minhash_params()
+    tokens = TOKEN_RE.findall(text[:SIMILARITY_MAX_CHARS].lower())
+    hashes = np.fromiter((hash(token) for token in tokens), dtype=np.int64, count=len(tokens))
+
+    buckets, counts = np.unique(hashes & (dim - 1), return_counts=True)
+    tf = (1 + np.log(counts)).astype(np.float32)
+
+    # Word 3-shingles ka hash vectorized (tokens ke hashes ka combination)
+    values = hashes.view(np.uint64)
+    with np.errstate(over="ignore"):
+        if len(values) >= 3:
+            values = values[:-2] * np.uint64(0x9E3779B97F4A7C15) \
+                + values[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F) + values[2:]
+        if len(values):
+            mixed = values[None, :] * minhash_a[:, None] + minhash_b[:, None]
+            signature = (mixed >> np.uint64(32)).min(axis=1).astype(np.uint32)
+        else:
+            signature = np.full(SIMILARITY_MINHASH_PERMS, np.iinfo(np.uint32).max, np.uint32)
+
+    return buckets.astype(np.int32), tf, signature
+
+
+#                    PER-USER INDEX
+
+
+class _UserIndex:
+    """
+    Ek user ke notes. Position = note ka slot (delete par khaali, pack par compact)
+
+    main segment → pack time ke notes ke postings (bucket order me, weights
+    tf-idf + L2 normalized); uske baad badle notes delta set me (brute force
+    score), SIMILARITY_DELTA_MAX se zyada → repack
+    """
+
+    def __init__(self, dim):
+        np = _numpy()
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.cursor = 0
+
+        self.ids = []                  # position → note id (None → deleted)
+        self.position = {}             # note id → position
+        self.terms = []                # position → bucket ids
+        self.tfs = []                  # position → tf weights
+        self.signatures = np.zeros((0, SIMILARITY_MINHASH_PERMS), np.uint32)
+        self.alive = np.zeros(0, bool)
+        self.df = np.zeros(dim, np.int32)
+        self.count = 0
+
+        self.delta = set()             # pack ke baad badle / naye positions
+        self.packed = False
+        self.main_docs = self.post_ptr = self.post_docs = self.post_weights = None
+        self.in_main = np.zeros(0, bool)
+
+    #           WRITES
+
+    def _grow(self, size):
+        np = _numpy()
+        if size <= len(self.alive):
+            return
+        capacity = max(size, len(self.alive) * 2, 64)
+        signatures = np.zeros((capacity, SIMILARITY_MINHASH_PERMS), np.uint32)
+        signatures[:len(self.signatures)] = self.signatures
+        self.signatures = signatures
+        for name in ("alive", "in_main"):
+            grown = np.zeros(capacity, bool)
+            old = getattr(self, name)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def upsert(self, note_id, text):
+        terms, tf, signature = features(text, self.dim)
+        position = self.position.get(note_id)
+
+        if position is None:
+            position = len(self.ids)
+            self._grow(position + 1)
+            self.ids.append(note_id)
+            self.terms.append(terms)
+            self.tfs.append(tf)
+            self.position[note_id] = position
+            self.count += 1
+        else:
+            self.df[self.terms[position]] -= 1
+            self.terms[position] = terms
+            self.tfs[position] = tf
+
+        self.df[terms] += 1
+        self.signatures[position] = signature
+        self.alive[position] = True
+        self.in_main[position] = False
+        self.delta.add(position)
+
+    def remove(self, note_id):
+        position = self.position.pop(note_id, None)
+        if position is None:
+            return
+        self.df[self.terms[position]] -= 1
+        self.ids[position] = None
+        self.terms[position] = self.tfs[position] = None
+        self.alive[position] = False
+        self.in_main[position] = False
+        self.delta.discard(position)
+        self.count -= 1
+
+    #           PACK
+
+    def _idf(self):
+        np = _numpy()
+        return (np.log((self.count + 1) / (self.df + 1)) + 1).astype(np.float32)
+
+    def _weights(self, positions, idf):
+        """
+        positions ke vectors concat → (doc index, bucket, normalized weight)
+        """
+        np = _numpy()
+        lengths = np.fromiter((len(self.terms[p]) for p in positions), np.int64, len(positions))
+        if not len(positions) or not lengths.sum():
+            empty = np.zeros(0, np.int32)
+            return empty, empty, np.zeros(0, np.float32)
+
+        terms = np.concatenate([self.terms[p] for p in positions])
+        weights = np.concatenate([self.tfs[p] for p in positions]) * idf[terms]
+        docs = np.repeat(np.arange(len(positions), dtype=np.int32), lengths)
+
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=len(positions)))
+        weights /= np.maximum(norms, 1e-12)[docs].astype(np.float32)
+        return docs, terms, weights
+
+    def pack(self):
+        """
+        Compaction (deleted slots hatao) + saare notes ke postings bucket order me
+        """
+        np = _numpy()
+        keep = [p for p, note_id in enumerate(self.ids) if note_id is not None]
+        if len(keep) < len(self.ids):
+            self.ids = [self.ids[p] for p in keep]
+            self.terms = [self.terms[p] for p in keep]
+            self.tfs = [self.tfs[p] for p in keep]
+            self.signatures = self.signatures[keep]
+            self.position = {note_id: p for p, note_id in enumerate(self.ids)}
+            self.alive = np.ones(len(keep), bool)
+            self.in_main = np.zeros(len(keep), bool)
+
+        positions = np.arange(len(self.ids))
+        docs, terms, weights = self._weights(positions, self._idf())
+
+        order = np.argsort(terms, kind="stable")
+        self.main_docs = positions.astype(np.int32)
+        self.post_docs = docs[order]
+        self.post_weights = weights[order]
+        self.post_ptr = np.searchsorted(terms[order], np.arange(self.dim + 1))
+
+        self.in_main[:len(self.ids)] = True
+        self.delta = set()
+        self.packed = True
+
+    #           QUERY
+
+    def scores(self, note_id):
+        """
+        Note vs saare notes → (cosine, jaccard) arrays (position order)
+        Delta bahut bada / aadhe slots khaali → pehle repack
+        """
+        np = _numpy()
+        if not self.packed or len(self.delta) > SIMILARITY_DELTA_MAX \
+                or len(self.ids) > 2 * max(self.count, 1):
+            self.pack()
+
+        position = self.position[note_id]
+        size = len(self.ids)
+        idf = self._idf()
+        cosine = np.zeros(size, np.float32)
+
+        # Query vector (normalized)
+        terms = self.terms[position]
+        query = self.tfs[position] * idf[terms]
+        query /= max(float(np.sqrt((query * query).sum())), 1e-12)
+
+        # Main segment → sirf query buckets ki postings (vectorized gather)
+        # Bahut common buckets skip (cosine me unka hissa chhota, postings sabse lambi)
+        # (chhote users par nahi → wahan har shared word kaam ka hai)
+        max_df = SIMILARITY_MAX_DF * self.count if self.count >= 1000 else self.count
+        rare = self.df[terms] <= max_df
+        terms, query = terms[rare], query[rare]
+        starts, ends = self.post_ptr[terms], self.post_ptr[terms + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total:
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            index = np.arange(total) + offsets
+            contrib = self.post_weights[index] * np.repeat(query, lengths)
+            main = np.bincount(self.post_docs[index], weights=contrib, minlength=len(self.main_docs))
+            cosine[self.main_docs] = main
+        cosine[~self.in_main[:size]] = 0
+
+        # Delta segment (pack ke baad badle notes) → dense query se dot
+        if self.delta:
+            delta = sorted(self.delta)
+            docs, delta_terms, weights = self._weights(delta, idf)
+            dense = np.zeros(self.dim, np.float32)
+            dense[terms] = query
+            cosine[delta] = np.bincount(docs, weights=dense[delta_terms] * weights,
+                                        minlength=len(delta))
+
+        jaccard = (self.signatures[:size] == self.signatures[position]).mean(axis=1)
+
+        alive = self.alive[:size]
+        cosine[~alive] = 0
+        jaccard[~alive] = 0
+        cosine[position] = jaccard[position] = -1
+        return cosine, jaccard
+
+    def nbytes(self):
+        arrays = [self.signatures, self.alive, self.in_main, self.df]
+        if self.packed:
+            arrays += [self.main_docs, self.post_ptr, self.post_docs, self.post_weights]
+        return sum(a.nbytes for a in arrays) + \
+            sum(t.nbytes + w.nbytes for t, w in zip(self.terms, self.tfs) if t is not None)
+
+
+class SimilarityIndex:
+    """
+    user_id → _UserIndex (per worker LRU)
+    """
+
+    def __init__(self, max_users=SIMILARITY_MAX_USERS, dim=SIMILARITY_FEATURES):
+        self.max_users = max_users
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    def _user(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                index = self._users[user_id] = _UserIndex(self.dim)
+                index.cursor = None        # abhi load nahi hua
+                index.loader = None        # background build thread
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            return index
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    @staticmethod
+    def _apply(index, user_id, rows, archived=False):
+        keys = {}
+        for row in rows:
+            title = note_cipher.decrypt(user_id, row.title, keys)
+            content = row.content_z if archived else row.content
+            if archived:
+                content = decompress(content)
+            content = note_cipher.decrypt(user_id, content, keys)
+            index.upsert(row.id, f"{title}\n{content}")
+
+    def _load(self, db, user_id, index, batch_size=1000):
+        """
+        Hot notes + archived (cold tier) notes → index
+        Cursor pehle padha, lekin index.cursor me load ke end par → load ke
+        dauraan hue writes agli sync me dobara aa jaate hai, aur tab tak
+        doosri requests index ko ready nahi maanti
+        """
+        cursor = db.execute(
+            select(NoteSeq.last_seq).where(NoteSeq.user_id == user_id)
+        ).scalar() or 0
+
+        for model, content, archived in ((Note, Note.content, False),
+                                         (NoteArchive, NoteArchive.content_z, True)):
+            after_id = 0
+            while True:
+                rows = db.execute(
+                    select(model.id, model.title, content)
+                    .where(model.user_id == user_id, model.id > after_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                self._apply(index, user_id, rows, archived)
+                after_id = rows[-1].id
+        index.pack()
+        index.cursor = cursor
+
+    def _build(self, bind, user_id, index):
+        try:
+            with Session(bind=bind) as db, index.lock:
+                self._load(db, user_id, index)
+        except Exception as e:
+            # cursor None hi rehta hai → agli query dobara build shuru karti hai
+            print(f" Similarity index build failed (user {user_id})")
+            print(e)
+        finally:
+            index.loader = None
+
+    def _start_build(self, bind, user_id, index):
+        with self._lock:
+            loader = index.loader
+            if loader is None:
+                loader = index.loader = threading.Thread(
+                    target=self._build, args=(bind, user_id, index),
+                    name="similarity-build", daemon=True
+                )
+                loader.start()
+        loader.join(SIMILARITY_BUILD_WAIT_MS / 1000)
+
+    def _sync(self, db, user_id, index):
+        """
+        Cursor ke baad ke changes → (user_id, change_seq) index, do chhoti queries
+        Archive / unarchive change_seq nahi badalta → note index me bana rehta hai
+        """
+        rows = db.execute(
+            select(Note.id, Note.title, Note.content, Note.change_seq)
+            .where(Note.user_id == user_id, Note.change_seq > index.cursor)
+        ).all()
+        deleted = db.execute(
+            select(NoteTombstone.id, NoteTombstone.change_seq)
+            .where(NoteTombstone.user_id == user_id, NoteTombstone.change_seq > index.cursor)
+        ).all()
+
+        # Tombstone ke baad same id dobara nahi banta; delete pehle, phir upserts
+        for row in deleted:
+            index.remove(row.id)
+        self._apply(index, user_id, rows)
+
+        seqs = [row.change_seq for row in rows] + [row.change_seq for row in deleted]
+        if seqs:
+            index.cursor = max(index.cursor, max(seqs))
+
+    def related(self, db, user_id, note_id, limit=10, duplicates=False):
+        """
+        Note ke sabse similar notes → [(note_id, cosine, jaccard)]
+        duplicates=True → Jaccard order, sirf SIMILARITY_DUPLICATE_THRESHOLD se upar
+        Note index me nahi → None; index abhi ban raha hai → INDEX_BUILDING
+        """
+        np = _numpy()
+        index = self._user(user_id)
+        if index.cursor is None:
+            self._start_build(db.get_bind(), user_id, index)
+            if index.cursor is None:
+                return INDEX_BUILDING
+
+        with index.lock:
+            self._sync(db, user_id, index)
+
+            if note_id not in index.position:
+                return None
+
+            cosine, jaccard = index.scores(note_id)
+            if duplicates:
+                primary = np.where(jaccard >= SIMILARITY_DUPLICATE_THRESHOLD, jaccard, -1)
+            else:
+                primary = cosine
+
+            candidates = int((primary > 0).sum())
+            limit = min(limit, candidates)
+            if not limit:
+                return []
+
+            top = np.argpartition(-primary, limit - 1)[:limit]
+            top = top[np.argsort(-primary[top], kind="stable")]
+            return [
+                (index.ids[p], float(cosine[p]), float(jaccard[p]))
+                for p in top
+            ]
+
+
+related_index = SimilarityIndex()
+
+
+#                    BENCHMARK
+
+
+def _corpus(notes, words_per_note, seed=1):
+    """
+    Zipf distribution wale vocabulary se notes; har 20th note pichhle kisi
+    note ka near-duplicate (kuch words badle hue)
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    texts = []
+    for i in range(notes):
+        if i % 20 == 19:
+            words = texts[rng.randrange(i)].split()
+            for _ in range(len(words) // 20):
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            texts.append(" ".join(words))
+        else:
+            texts.append(" ".join(rng.choices(vocabulary, weights, k=words_per_note)))
+    return texts
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def benchmark(sizes, words_per_note=200, queries=200):
+    """
+    Har size ke liye: index build, query p50 / p99 (TF-IDF + MinHash),
+    note update ke baad query (delta segment), memory; chhote size par
+    pure Python cosine loop se comparison
+    """
+    np = _numpy()
+    print(f"{'notes':>7} {'build s':>8} {'MB':>7} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'upd+q ms':>9} {'dup hit':>8} {'py loop ms':>11}")
+
+    for notes in sizes:
+        texts = _corpus(notes, words_per_note)
+        index = _UserIndex(SIMILARITY_FEATURES)
+
+        started = time.perf_counter()
+        for note_id, text in enumerate(texts, 1):
+            index.upsert(note_id, text)
+        index.pack()
+        build_seconds = time.perf_counter() - started
+
+        rng = random.Random(2)
+        latencies = []
+        for _ in range(queries):
+            note_id = rng.randrange(1, notes + 1)
+            started = time.perf_counter()
+            cosine, _ = index.scores(note_id)
+            np.argpartition(-cosine, 10)[:10]
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        # Near-duplicates (har 20th note) ka source top Jaccard me mila?
+        hits = checked = 0
+        for note_id in range(20, min(notes, 2000), 20):
+            _, jaccard = index.scores(note_id)
+            checked += 1
+            hits += jaccard.max() >= 0.5
+
+        # Update ke baad pehli query (delta segment, repack nahi)
+        update_ms = []
+        for _ in range(20):
+            note_id = rng.randrange(1, notes + 1)
+            started = time.perf_counter()
+            index.upsert(note_id, texts[rng.randrange(notes)])
+            index.scores(note_id)
+            update_ms.append((time.perf_counter() - started) * 1000)
+
+        loop_ms = "-"
+        if notes <= 10000:
+            # Baseline: dict vectors + Python loop cosine
+            vectors = []
+            for text in texts:
+                counts = {}
+                for token in text.split():
+                    counts[token] = counts.get(token, 0) + 1
+                norm = math.sqrt(sum(v * v for v in counts.values()))
+                vectors.append({k: v / norm for k, v in counts.items()})
+            started = time.perf_counter()
+            for _ in range(5):
+                query = vectors[rng.randrange(notes)]
+                [sum(w * other.get(t, 0) for t, w in query.items()) for other in vectors]
+            loop_ms = f"{(time.perf_counter() - started) * 1000 / 5:.1f}"
+
+        print(f"{notes:>7} {build_seconds:>8.1f} {index.nbytes() / 1024 / 1024:>7.1f} "
+              f"{_percentile(latencies, 50):>7.2f} {_percentile(latencies, 99):>7.2f} "
+              f"{_percentile(update_ms, 50):>9.2f} {hits:>4}/{checked:<3} {loop_ms:>11}")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.similarity")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="build / query latency at N notes per user")
+    bench.add_argument("--notes", type=int, nargs="+", default=[10000, 100000])
+    bench.add_argument("--words", type=int, default=200)
+    bench.add_argument("--queries", type=int, default=200)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.notes, args.words, args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+
+# Delta sync helpers
+#
+# Har note write (create / update / delete) user ke note_seq counter ko
+# badhata hai aur wahi number note (ya tombstone) ke change_seq me jata hai.
+# GET /notes/changes?since=<seq> sirf (user_id, change_seq) index se
+# badle hue rows padhta hai → sync cost change ke hisaab se, library size se nahi.
+#
+# Note-list version: har user ka ek random token shared cache (app.cache) me.
+# Note / tag write wala transaction commit hote hi token hat jaata hai (sab
+# workers ke L1 se bhi) → GET /notes ka ETag badal jaata hai; same token →
+# client ka If-None-Match → 304, list query hi nahi chalti.
+
+
+import os
+import secrets
+
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .cache import cache
+from .models import NoteSeq
+
+
+# Token kitni der cache me (write par turant invalidate; ye sirf upper bound
+# un writers ke liye jo is process ke bahar chalte hai, jaise CACHE_BACKEND=local
+# ke saath `python -m app.archive run`)
+NOTE_LIST_VERSION_SECONDS = float(os.getenv("NOTE_LIST_VERSION_SECONDS", "300"))
+
+
+def ensure_seq_rows(bind, user_ids):
+    """
+    Users ke note_seq rows bana deta hai (alag short transaction me)
+    Dusra worker pehle bana de → IntegrityError ignore
+    """
+    with bind.connect() as conn:
+        existing = set(
+            conn.execute(
+                select(NoteSeq.user_id).where(NoteSeq.user_id.in_(list(user_ids)))
+            ).scalars()
+        )
+
+    for user_id in set(user_ids) - existing:
+        try:
+            with bind.begin() as conn:
+                conn.execute(
+                    NoteSeq.__table__.insert().values(user_id=user_id, last_seq=0)
+                )
+        except IntegrityError:
+            pass
+
+
+def _bump(db, user_id, count):
+    return db.execute(
+        update(NoteSeq)
+        .where(NoteSeq.user_id == user_id)
+        .values(last_seq=NoteSeq.last_seq + count)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def bump_change_seq(db, user_id, count=1):
+    """
+    User ka counter `count` se badhata hai (row lock transaction ke end tak)
+
+    Write transaction ka PEHLA statement hona chahiye → counter row na ho
+    to rollback karke row banate hai aur dobara try karte hai
+    """
+    if not _bump(db, user_id, count):
+        db.rollback()
+        ensure_seq_rows(db.get_bind(), [user_id])
+        _bump(db, user_id, count)
+    mark_changed(db, user_id)
+
+
+def current_seq(user_id):
+    """
+    Counter ki current value (SQL subquery) → UPDATE / INSERT ke andar hi
+    use hoti hai, alag SELECT round-trip nahi
+    """
+    return (
+        select(NoteSeq.last_seq)
+        .where(NoteSeq.user_id == user_id)
+        .scalar_subquery()
+    )
+
+
+def reserve_change_seqs(db, user_id, count) -> int:
+    """
+    Batch writes ke liye `count` sequence numbers reserve karta hai
+    Pehla number return hota hai: [first, first + count)
+    """
+    bump_change_seq(db, user_id, count)
+    last = db.execute(
+        select(NoteSeq.last_seq).where(NoteSeq.user_id == user_id)
+    ).scalar()
+    return last - count + 1
+
+
+#                    NOTE-LIST VERSION
+
+
+def _version_key(user_id):
+    return f"notes_version:{user_id}"
+
+
+def note_list_version(user_id):
+    """
+    User ki note list ka current token (na ho to naya)
+    List query se PEHLE lena → beech me write hua to agla request naya token dekhega
+    Shared cache nahi (CACHE_BACKEND=local) → None (doosre worker ka write is
+    worker ka token invalidate nahi karta → ETag nahi)
+    """
+    if not cache.is_shared:
+        return None
+    # Seedha L2 se (L1 copy invalidation miss hone par stale 304 de sakti hai)
+    # L2 unreachable → False → ETag nahi
+    key = _version_key(user_id)
+    version = cache.get_shared(key, failed=False)
+    if version is None:
+        version = secrets.token_hex(8)
+        if not cache.add(key, version, NOTE_LIST_VERSION_SECONDS):
+            version = cache.get_shared(key, failed=False)
+    return version or None
+
+
+def invalidate_note_list(*user_ids):
+    for user_id in user_ids:
+        cache.delete(_version_key(user_id))
+
+
+def mark_changed(db, user_id):
+    """
+    Session ke commit hone par user ka list token invalidate (rollback → kuch nahi)
+    """
+    db.info.setdefault("changed_users", set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    changed = session.info.pop("changed_users", None)
+    if changed:
+        invalidate_note_list(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("changed_users", None)
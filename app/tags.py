@@ -0,0 +1,201 @@
+
+# Note tags (many-to-many) + incremental per-tag note counts
+#
+#   tags       → user ke tags (naam per user unique), note_count
+#   note_tags  → (note_id, tag_id) rows
+#
+# GET /notes?tag=<name> → (user_id, tag_id, note_id) index se note ids.
+# tags.note_count note_tags insert / delete ke same transaction me +1 / -1.
+# Commit caller karta hai.
+
+
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import Note, NoteTag, Tag
+from .sync import mark_changed
+
+
+#                    TAG CONFIG
+
+# Ek note par max tags
+TAGS_PER_NOTE = int(os.getenv("TAGS_PER_NOTE", "50"))
+
+TAG_MAX_LENGTH = 100
+
+
+def normalize(names) -> list:
+    """
+    Tag names → strip, khaali hatao, duplicate hatao (order same)
+    """
+    result = []
+    for name in names or []:
+        name = name.strip()
+        if not name:
+            continue
+        if len(name) > TAG_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Tag max {TAG_MAX_LENGTH} characters ka")
+        if name not in result:
+            result.append(name)
+
+    if len(result) > TAGS_PER_NOTE:
+        raise HTTPException(status_code=400, detail=f"Ek note par max {TAGS_PER_NOTE} tags")
+    return result
+
+
+def ensure_tags(bind, user_id, names) -> None:
+    """
+    Missing tags bana deta hai (alag short transactions me)
+    Dusra worker pehle bana de → IntegrityError ignore
+    """
+    from .sharding import shard_router
+
+    with bind.connect() as conn:
+        existing = set(conn.execute(
+            select(Tag.name).where(Tag.user_id == user_id, Tag.name.in_(names))
+        ).scalars())
+
+    for name in names:
+        if name in existing:
+            continue
+        values = {"user_id": user_id, "name": name, "note_count": 0}
+        if shard_router.enabled:
+            values["id"] = shard_router.next_id(Tag.__table__)
+        try:
+            with bind.begin() as conn:
+                conn.execute(Tag.__table__.insert().values(**values))
+        except IntegrityError:
+            pass
+
+
+def tag_ids(db, user_id, names) -> dict:
+    return dict(db.execute(
+        select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+    ).all())
+
+
+def note_filter(db, user_id, name, column=Note.id):
+    """
+    GET /notes?tag= ke liye Note condition (tag nahi hai → koi note nahi)
+    column → NoteArchive.id cold listing ke liye
+    """
+    tag_id = db.execute(
+        select(Tag.id).where(Tag.user_id == user_id, Tag.name == name)
+    ).scalar()
+
+    return column.in_(
+        select(NoteTag.note_id).where(NoteTag.user_id == user_id, NoteTag.tag_id == tag_id)
+    )
+
+
+def _add_counts(db, user_id, deltas: dict):
+    # {tag_id: +n / -n} → same delta wale tags ek UPDATE me
+    by_delta = {}
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(tag_id)
+
+    for delta, ids in by_delta.items():
+        db.execute(
+            update(Tag)
+            .where(Tag.user_id == user_id, Tag.id.in_(ids))
+            .values(note_count=Tag.note_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def get_note_tags(db, user_id, note_ids) -> dict:
+    """
+    note_id → tag names (naam order me), ek query
+    """
+    rows = db.execute(
+        select(NoteTag.note_id, Tag.name)
+        .join(Tag, Tag.id == NoteTag.tag_id)
+        .where(NoteTag.user_id == user_id, NoteTag.note_id.in_(list(note_ids)))
+        .order_by(Tag.name)
+    ).all()
+
+    result = {note_id: [] for note_id in note_ids}
+    for note_id, name in rows:
+        result[note_id].append(name)
+    return result
+
+
+#                    WRITES
+
+
+def set_note_tags(db, user_id, note_id, names) -> list:
+    """
+    Note ke tags exactly `names` (sirf diff insert / delete, counts ±1)
+    Tags pehle se ensure_tags() se bane hone chahiye
+    """
+    from .sharding import shard_router
+
+    wanted = tag_ids(db, user_id, names) if names else {}
+    current = set(db.execute(
+        select(NoteTag.tag_id).where(NoteTag.user_id == user_id, NoteTag.note_id == note_id)
+    ).scalars())
+
+    added = [tag_id for tag_id in wanted.values() if tag_id not in current]
+    removed = [tag_id for tag_id in current if tag_id not in wanted.values()]
+
+    if removed:
+        db.execute(
+            delete(NoteTag)
+            .where(NoteTag.note_id == note_id, NoteTag.tag_id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    if added:
+        rows = [{"note_id": note_id, "tag_id": tag_id, "user_id": user_id} for tag_id in added]
+        if shard_router.enabled:
+            for row in rows:
+                row["id"] = shard_router.next_id(NoteTag.__table__)
+        db.execute(NoteTag.__table__.insert(), rows)
+
+    _add_counts(db, user_id, {
+        **{tag_id: 1 for tag_id in added},
+        **{tag_id: -1 for tag_id in removed}
+    })
+    if added or removed:
+        mark_changed(db, user_id)     # ?tag= listing badli
+    return sorted(wanted)
+
+
+def remove_note_tags(db, user_id, note_ids):
+    """
+    Delete hue notes ke note_tags rows hatao aur tag counts kam karo
+    """
+    counts = dict(db.execute(
+        select(NoteTag.tag_id, func.count())
+        .where(NoteTag.user_id == user_id, NoteTag.note_id.in_(list(note_ids)))
+        .group_by(NoteTag.tag_id)
+    ).all())
+    if not counts:
+        return
+
+    db.execute(
+        delete(NoteTag)
+        .where(NoteTag.user_id == user_id, NoteTag.note_id.in_(list(note_ids)))
+        .execution_options(synchronize_session=False)
+    )
+    _add_counts(db, user_id, {tag_id: -count for tag_id, count in counts.items()})
+    mark_changed(db, user_id)
+
+
+def delete_tag(db, user_id, tag_id) -> bool:
+    deleted = db.execute(
+        delete(Tag)
+        .where(Tag.id == tag_id, Tag.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if deleted:
+        db.execute(
+            delete(NoteTag)
+            .where(NoteTag.user_id == user_id, NoteTag.tag_id == tag_id)
+            .execution_options(synchronize_session=False)
+        )
+        mark_changed(db, user_id)
+    return bool(deleted)
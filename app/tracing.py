@@ -0,0 +1,611 @@
+
+# Request tracing (spans → local files, collector ki zarurat nahi)
+#
+# Slow request me time kaha gaya → JWT decode, User lookup, bcrypt, notes
+# query ya serialization? Har request ek trace, andar spans:
+#
+#   http.request                    (middleware, root)
+#     auth.get_current_user
+#       auth.jwt_decode
+#       auth.load_user → db.execute
+#     db.execute                    (har SQLAlchemy cursor execute, saare engines)
+#     auth.bcrypt_hash / auth.bcrypt_verify / auth.jwt_encode
+#     email.send
+#     response.serialize            (response_model validation + jsonable_encoder)
+#     response.render               (JSON bytes)
+#
+#   - Response headers: X-Trace-Id + traceparent (W3C); request ka traceparent
+#     ho to wahi trace id aage chalti hai. Uska sampled flag client control
+#     karta hai → export sirf TRACE_FORCED_PER_MINUTE budget tak (default 0)
+#   - Sampling: TRACE_SAMPLE_RATE (request start par) + TRACE_SLOW_MS se lamba
+#     har request hamesha (spans hamesha record, export ka faisla end par)
+#   - Export: TRACE_EXPORT_DIR/traces-<pid>.jsonl (json) ya otlp-<pid>.jsonl
+#     (OTLP/JSON, OpenTelemetry collector ka file format)
+#   - TRACING_ENABLED=0 (default) → decorators original function lautate hai,
+#     middleware / SQL hooks install hi nahi hote
+#
+#   python -m app.tracing summary traces/        # span name → count / p50 / p95 / total
+#   python -m app.tracing show <trace_id> traces/
+#   python -m app.tracing bench
+
+
+import contextvars
+import functools
+import glob
+import json
+import os
+import random
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+
+#                    TRACING CONFIG
+
+# 0 → kuch install nahi hota (zero overhead)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+
+# Itne fraction requests hamesha export (0.01 → 1%)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+# Isse lambi (ms) request sample rate ke bina bhi export
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+
+# Trace files yaha (har worker process apni file)
+TRACE_EXPORT_DIR = os.getenv("TRACE_EXPORT_DIR", "traces")
+
+# json → ek trace ek line (apna compact format); otlp → OTLP/JSON ExportTraceServiceRequest
+TRACE_EXPORT_FORMAT = os.getenv("TRACE_EXPORT_FORMAT", "json")
+
+# Request ke traceparent ka sampled flag (01) per worker per minute itni baar
+# export force kar sakta hai; 0 → flag ignore (koi bhi client disk nahi bhar sakta)
+TRACE_FORCED_PER_MINUTE = int(os.getenv("TRACE_FORCED_PER_MINUTE", "0"))
+
+# Long-lived requests (SSE stream, probes) trace nahi hote
+TRACE_EXCLUDE_PATHS = {
+    path.strip()
+    for path in os.getenv("TRACE_EXCLUDE_PATHS", "/notes/stream,/ready").split(",")
+    if path.strip()
+}
+
+# db.execute span me SQL statement ke max characters
+TRACE_SQL_MAX = int(os.getenv("TRACE_SQL_MAX", "300"))
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "secure-notes-api")
+
+
+#                    TRACE / SPAN
+
+
+# (Trace, current span id) → sync routes threadpool me chalte hai, Starlette
+# context copy karta hai → wahan bhi wahi trace
+_current = contextvars.ContextVar("trace_current", default=None)
+
+
+def _new_id(bits=64) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Trace:
+    """
+    Ek request ke spans (dicts); threadpool / event loop dono se append → list
+    append GIL ke saath atomic
+    """
+
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, trace_id=None, sampled=False):
+        self.trace_id = trace_id or _new_id(128)
+        self.sampled = sampled
+        self.spans = []
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "trace", "record", "token")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.record = None
+
+    def __enter__(self):
+        current = _current.get()
+        if current is None:
+            return self
+
+        self.trace, parent_id = current
+        self.record = {
+            "span_id": _new_id(), "parent_id": parent_id, "name": self.name,
+            "start": time.time_ns(), "attrs": self.attrs
+        }
+        self.token = _current.set((self.trace, self.record["span_id"]))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.record is None:
+            return False
+
+        _current.reset(self.token)
+        self.record["end"] = time.time_ns()
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        self.trace.spans.append(self.record)
+        return False
+
+    def set(self, key, value):
+        if self.record is not None:
+            self.attrs[key] = value
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """
+    with span("notes.query", user_id=7): ...  → active trace me child span
+    Tracing off / trace nahi → shared no-op
+    """
+    if not TRACING_ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def traced(name: str):
+    """
+    Function decorator; TRACING_ENABLED=0 → function waisa ka waisa (koi wrapper nahi)
+    """
+    def decorator(fn):
+        if not TRACING_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _add_span(name, start, end, error=None, **attrs):
+    # Pehle se naapa hua span (SQL hooks) current span ke child ke roop me
+    current = _current.get()
+    if current is None:
+        return
+    trace, parent_id = current
+    record = {"span_id": _new_id(), "parent_id": parent_id, "name": name,
+              "start": start, "end": end, "attrs": attrs}
+    if error is not None:
+        record["error"] = error
+    trace.spans.append(record)
+
+
+#                    EXPORT
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+# OTLP SpanKind: 1 internal, 2 server, 3 client (DB)
+_KINDS = {"http.request": 2, "db.execute": 3, "email.send": 3}
+
+
+def to_otlp(trace: Trace) -> dict:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}}
+        ]},
+        "scopeSpans": [{
+            "scope": {"name": "app.tracing"},
+            "spans": [
+                {
+                    "traceId": trace.trace_id,
+                    "spanId": record["span_id"],
+                    **({"parentSpanId": record["parent_id"]} if record["parent_id"] else {}),
+                    "name": record["name"],
+                    "kind": _KINDS.get(record["name"], 1),
+                    "startTimeUnixNano": str(record["start"]),
+                    "endTimeUnixNano": str(record["end"]),
+                    "attributes": [
+                        {"key": key, "value": _otlp_value(value)}
+                        for key, value in record["attrs"].items()
+                    ],
+                    "status": {"code": 2, "message": record["error"]} if "error" in record else {}
+                }
+                for record in trace.spans
+            ]
+        }]
+    }]}
+
+
+def to_json(trace: Trace) -> dict:
+    # Compact: offsets / durations ms me, root ke start se
+    spans = sorted(trace.spans, key=lambda record: record["start"])
+    root = spans[0]
+    return {
+        "trace_id": trace.trace_id,
+        "start": root["start"] / 1e9,
+        "duration_ms": round((root["end"] - root["start"]) / 1e6, 3),
+        "name": root["name"],
+        "attrs": root["attrs"],
+        "spans": [
+            {
+                "id": record["span_id"],
+                "parent": record["parent_id"],
+                "name": record["name"],
+                "offset_ms": round((record["start"] - root["start"]) / 1e6, 3),
+                "duration_ms": round((record["end"] - record["start"]) / 1e6, 3),
+                **({"attrs": record["attrs"]} if record["attrs"] else {}),
+                **({"error": record["error"]} if "error" in record else {})
+            }
+            for record in spans[1:]
+        ]
+    }
+
+
+class FileExporter:
+    """
+    Per-process JSON lines file (append, har trace ke baad flush)
+    Sirf sampled / slow traces aate hai → write event loop par hi
+    """
+
+    def __init__(self, directory=TRACE_EXPORT_DIR, fmt=TRACE_EXPORT_FORMAT):
+        self.directory = directory
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def _open(self):
+        # Fork ke baad (uvicorn --workers) naya pid → nayi file
+        if self._file is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            prefix = "otlp" if self.fmt == "otlp" else "traces"
+            self._pid = os.getpid()
+            self._file = open(os.path.join(self.directory, f"{prefix}-{self._pid}.jsonl"), "a")
+        return self._file
+
+    def export(self, trace: Trace):
+        data = to_otlp(trace) if self.fmt == "otlp" else to_json(trace)
+        line = json.dumps(data, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            f = self._open()
+            f.write(line)
+            f.flush()
+
+
+exporter = FileExporter()
+
+
+#                    MIDDLEWARE
+
+
+def parse_traceparent(value):
+    """
+    W3C "00-<32 hex trace id>-<16 hex span id>-<flags>" → (trace_id, parent_id, sampled)
+    Galat / missing → (None, None, False)
+    """
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None, False
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None, None, False
+    if parts[1] == "0" * 32:
+        return None, None, False
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI (streaming responses buffer nahi hote); sabse bahar wala
+    middleware → compression bhi trace ke andar. Background tasks (OTP email)
+    response ke baad isi call me chalte hai → unke spans bhi isi trace me
+    """
+
+    def __init__(self, app, exporter=exporter, sample_rate=TRACE_SAMPLE_RATE,
+                 slow_ms=TRACE_SLOW_MS, exclude=TRACE_EXCLUDE_PATHS,
+                 forced_per_minute=TRACE_FORCED_PER_MINUTE):
+        self.app = app
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ns = slow_ms * 1e6
+        self.exclude = exclude
+        self.forced_per_minute = forced_per_minute
+        self._forced_minute = None
+        self._forced_count = 0
+
+    def _allow_forced(self) -> bool:
+        # Sirf event loop thread se → lock nahi chahiye
+        if self.forced_per_minute <= 0:
+            return False
+        minute = int(time.monotonic() // 60)
+        if minute != self._forced_minute:
+            self._forced_minute, self._forced_count = minute, 0
+        if self._forced_count >= self.forced_per_minute:
+            return False
+        self._forced_count += 1
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, forced = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        sampled = random.random() < self.sample_rate
+        if forced and not sampled:
+            sampled = self._allow_forced()
+        trace = Trace(trace_id, sampled)
+        root = {
+            "span_id": _new_id(), "parent_id": parent_id, "name": "http.request",
+            "start": time.time_ns(),
+            "attrs": {"http.method": scope["method"], "http.target": scope["path"]}
+        }
+        token = _current.set((trace, root["span_id"]))
+
+        async def wrapped_send(message):
+            if message["type"] == "http.response.start":
+                root["attrs"]["http.status_code"] = message["status"]
+                headers = MutableHeaders(raw=message.setdefault("headers", []))
+                headers["X-Trace-Id"] = trace.trace_id
+                headers["traceparent"] = \
+                    f"00-{trace.trace_id}-{root['span_id']}-{'01' if trace.sampled else '00'}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        except Exception as e:
+            root["error"] = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            root["end"] = time.time_ns()
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                root["attrs"]["http.route"] = route.path
+            trace.spans.append(root)
+
+            if trace.sampled or root["end"] - root["start"] >= self.slow_ns:
+                try:
+                    self.exporter.export(trace)
+                except OSError as e:
+                    # Disk full / permission → request fail nahi honi chahiye
+                    print(f"trace export failed: {e!r}")
+
+
+#                    RESPONSE RENDERING
+
+
+class TracedJSONResponse(JSONResponse):
+    """
+    JSON bytes banana (json.dumps) → response.render span
+    """
+
+    def render(self, content) -> bytes:
+        with span("response.render"):
+            return super().render(content)
+
+
+#                    SQL HOOKS
+
+
+def _install_sql_hooks():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    # Engine class par → primary, replicas, shards, sab engines
+    @event.listens_for(Engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("trace_starts", []).append(time.time_ns())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("trace_starts")
+        if starts:
+            _add_span(
+                "db.execute", starts.pop(), time.time_ns(),
+                **{"db.system": conn.dialect.name,
+                   "db.statement": statement[:TRACE_SQL_MAX],
+                   "db.rows": cursor.rowcount,
+                   "db.executemany": executemany}
+            )
+
+    @event.listens_for(Engine, "handle_error")
+    def error(context):
+        conn = context.connection
+        starts = conn.info.get("trace_starts") if conn is not None else None
+        if starts:
+            _add_span(
+                "db.execute", starts.pop(), time.time_ns(),
+                error=type(context.original_exception).__name__,
+                **{"db.system": context.dialect.name,
+                   "db.statement": (context.statement or "")[:TRACE_SQL_MAX]}
+            )
+
+
+def instrument(app):
+    """
+    main.py se (sirf TRACING_ENABLED=1): middleware + SQL hooks + serialize span
+    """
+    import fastapi.routing
+
+    _install_sql_hooks()
+
+    # FastAPI response_model validation + jsonable_encoder ek module-level
+    # async function hai → span wala wrapper (route handler isse global naam se bulata hai)
+    serialize_response = fastapi.routing.serialize_response
+
+    @functools.wraps(serialize_response)
+    async def traced_serialize_response(*args, **kwargs):
+        with span("response.serialize"):
+            return await serialize_response(*args, **kwargs)
+
+    fastapi.routing.serialize_response = traced_serialize_response
+
+    app.add_middleware(TracingMiddleware)
+
+
+#                    READING TRACE FILES
+
+
+def _load(paths):
+    # json / otlp dono files → (trace_id, [(name, duration_ms, span dict)])
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                data = json.loads(line)
+                if "resourceSpans" in data:
+                    spans = sorted(
+                        (
+                            span_data
+                            for resource in data["resourceSpans"]
+                            for scope in resource["scopeSpans"]
+                            for span_data in scope["spans"]
+                        ),
+                        key=lambda span_data: int(span_data["startTimeUnixNano"])
+                    )
+                    yield spans[0]["traceId"] if spans else None, [
+                        (s["name"], (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6, s)
+                        for s in spans
+                    ]
+                else:
+                    yield data["trace_id"], [(data["name"], data["duration_ms"], data)] + [
+                        (s["name"], s["duration_ms"], s) for s in data["spans"]
+                    ]
+
+
+def _files(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.jsonl")))
+
+
+def summary(directory):
+    by_name = {}
+    traces = 0
+    for _, spans in _load(_files(directory)):
+        traces += 1
+        for name, duration, _ in spans:
+            by_name.setdefault(name, []).append(duration)
+
+    print(f"{traces} traces in {directory}")
+    print(f"{'span':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total ms':>12}")
+    for name, durations in sorted(by_name.items(), key=lambda item: -sum(item[1])):
+        durations.sort()
+        p50 = durations[len(durations) // 2]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        print(f"{name:<24}{len(durations):>8}{p50:>10.2f}{p95:>10.2f}"
+              f"{durations[-1]:>10.2f}{sum(durations):>12.1f}")
+
+
+def show(trace_id, directory):
+    for found_id, spans in _load(_files(directory)):
+        if found_id != trace_id:
+            continue
+        for name, duration, data in spans:
+            detail = data.get("attrs") or {
+                item["key"]: next(iter(item["value"].values())) for item in data.get("attributes", [])
+            }
+            statement = detail.get("db.statement")
+            extra = f"  {' '.join(statement.split())}" if statement else ""
+            print(f"{duration:>10.2f} ms  {name}{extra}")
+        return
+    print(f"trace {trace_id} nahi mila")
+
+
+#                    BENCHMARK
+
+
+def benchmark(iterations: int = 100000):
+    """
+    Span ki keemat: plain function vs traced (trace active nahi) vs traced
+    (trace active, span record), microseconds per call
+    """
+    global TRACING_ENABLED
+
+    def work():
+        return None
+
+    def run(fn):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - started) * 1e6 / iterations
+
+    enabled = TRACING_ENABLED
+    TRACING_ENABLED = True
+    try:
+        wrapped = traced("bench")(work)
+        plain = run(work)
+        idle = run(wrapped)
+
+        token = _current.set((Trace(), None))
+        try:
+            active = run(wrapped)
+        finally:
+            _current.reset(token)
+    finally:
+        TRACING_ENABLED = enabled
+
+    print(f"{iterations} calls")
+    print(f"plain function               : {plain:>7.3f} us")
+    print(f"traced, no active trace      : {idle:>7.3f} us")
+    print(f"traced, span recorded        : {active:>7.3f} us")
+    print("TRACING_ENABLED=0 → decorator original function lautata hai (plain jaisa)")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.tracing")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    summ = sub.add_parser("summary", help="span name → count / p50 / p95 / total")
+    summ.add_argument("directory", nargs="?", default=TRACE_EXPORT_DIR)
+
+    sh = sub.add_parser("show", help="ek trace ke spans")
+    sh.add_argument("trace_id")
+    sh.add_argument("directory", nargs="?", default=TRACE_EXPORT_DIR)
+
+    bench = sub.add_parser("bench", help="span overhead")
+    bench.add_argument("--iterations", type=int, default=100000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        summary(args.directory)
+    elif args.command == "show":
+        show(args.trace_id, args.directory)
+    else:
+        benchmark(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
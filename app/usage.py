@@ -0,0 +1,427 @@
+
+# Per-user usage counters + quotas
+#
+#   user_stats       (shard)   → note_count, content_bytes
+#   otp_send_counts  (primary) → email ke har ghante ke OTP sends
+#
+# Counters kabhi COUNT(*) / SUM() se nahi padhe jaate → note insert / update /
+# delete ke same transaction me +n / -n. Quota check usi UPDATE ki WHERE me
+# (note_count + n <= limit) → rowcount 0 = quota khatam. Alag read nahi, race
+# nahi, aur cost O(1) chahe user ke kitne bhi notes ho.
+#
+# Drift (purane rows, manual SQL, bugs) reconciliation job theek karta hai:
+#   python -m app.usage reconcile
+#   python -m app.usage bench --notes 100000
+
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import LargeBinary, cast, delete, func, select, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import Note, NoteArchive, OtpSendCount, UserStats
+
+
+#                    QUOTA CONFIG
+
+# 0 → limit nahi
+NOTE_QUOTA_COUNT = int(os.getenv("NOTE_QUOTA_COUNT", "100000"))
+
+# Notes ke content ke total stored bytes
+NOTE_QUOTA_BYTES = int(os.getenv("NOTE_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+
+# Ek email par ek ghante me kitne OTP (register + forgot password)
+OTP_SENDS_PER_HOUR = int(os.getenv("OTP_SENDS_PER_HOUR", "5"))
+
+# Per-worker yaad (bind, user_id) jinka user_stats row ban chuka hai
+STATS_ROWS_CACHE_SIZE = 100000
+
+
+#                    SIZE HELPERS
+
+
+def byte_length(bind, column):
+    # Postgres OCTET_LENGTH, MySQL LENGTH() bytes; SQLite LENGTH(text) characters → blob cast
+    name = bind.dialect.name
+    if name == "mysql":
+        return func.length(column)
+    if name == "sqlite":
+        return func.length(cast(column, LargeBinary))
+    return func.octet_length(column)
+
+
+def content_size(value) -> int:
+    # Stored value (encrypt_values ke baad) ke UTF-8 bytes → DB ke byte_length jaisa
+    return len(value.encode("utf-8")) if value else 0
+
+
+#                    NOTE STATS
+
+_known_rows = set()
+_known_lock = threading.Lock()
+
+
+def _aggregate(conn, user_ids):
+    # Asli numbers (sirf ensure / reconciliation me, request path par kabhi nahi)
+    # Cold tier (notes_archive) ke notes bhi gine jaate hai → content_size = asli bytes
+    result = {}
+    for query in (
+        select(
+            Note.user_id,
+            func.count(),
+            func.coalesce(func.sum(byte_length(conn, Note.content)), 0)
+        )
+        .where(Note.user_id.in_(list(user_ids)))
+        .group_by(Note.user_id),
+        select(
+            NoteArchive.user_id,
+            func.count(),
+            func.coalesce(func.sum(NoteArchive.content_size), 0)
+        )
+        .where(NoteArchive.user_id.in_(list(user_ids)))
+        .group_by(NoteArchive.user_id)
+    ):
+        for user_id, count, size in conn.execute(query).all():
+            old_count, old_size = result.get(user_id, (0, 0))
+            result[user_id] = (old_count + count, old_size + int(size))
+    return result
+
+
+def ensure_stats_row(bind, user_id):
+    """
+    User ka user_stats row (alag short transaction me, note transaction se pehle)
+    Naya row user ke maujooda notes se ek baar gin ke banta hai (migration ke
+    baad purane users). Dusra worker pehle bana de → IntegrityError ignore
+    """
+    key = (bind, user_id)
+    if key in _known_rows:
+        return
+
+    with bind.connect() as conn:
+        exists = conn.execute(
+            select(UserStats.user_id).where(UserStats.user_id == user_id)
+        ).first()
+        if not exists:
+            count, size = _aggregate(conn, [user_id]).get(user_id, (0, 0))
+
+    if not exists:
+        try:
+            with bind.begin() as conn:
+                conn.execute(
+                    UserStats.__table__.insert().values(
+                        user_id=user_id, note_count=count, content_bytes=size
+                    )
+                )
+        except IntegrityError:
+            pass
+
+    with _known_lock:
+        if len(_known_rows) >= STATS_ROWS_CACHE_SIZE:
+            _known_rows.clear()
+        _known_rows.add(key)
+
+
+def charge_notes(db, user_id, count: int, size: int):
+    """
+    user_stats += (count, size) caller ke transaction me
+    Badhne wale counter ka quota usi UPDATE me → fail ho to rollback + 403
+    Row hi nahi hai (ensure_stats_row nahi chala) → skip, reconciliation bana dega
+    """
+    if not count and not size:
+        return
+
+    stmt = (
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            note_count=UserStats.note_count + count,
+            content_bytes=UserStats.content_bytes + size
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if count > 0 and NOTE_QUOTA_COUNT:
+        stmt = stmt.where(UserStats.note_count + count <= NOTE_QUOTA_COUNT)
+    if size > 0 and NOTE_QUOTA_BYTES:
+        stmt = stmt.where(UserStats.content_bytes + size <= NOTE_QUOTA_BYTES)
+
+    if db.execute(stmt).rowcount:
+        return
+
+    stats = db.execute(
+        select(UserStats.note_count).where(UserStats.user_id == user_id)
+    ).first()
+    if stats is None:
+        return
+
+    db.rollback()
+    if count > 0 and NOTE_QUOTA_COUNT and stats.note_count + count > NOTE_QUOTA_COUNT:
+        detail = f"Note quota khatam (max {NOTE_QUOTA_COUNT} notes)"
+    else:
+        detail = f"Storage quota khatam (notes content max {NOTE_QUOTA_BYTES} bytes)"
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+
+def get_stats(db, user_id) -> dict:
+    row = db.execute(
+        select(UserStats.note_count, UserStats.content_bytes)
+        .where(UserStats.user_id == user_id)
+    ).first()
+    return {
+        "note_count": row.note_count if row else 0,
+        "content_bytes": row.content_bytes if row else 0
+    }
+
+
+#                    OTP SEND LIMIT
+
+
+def _window(now=None) -> datetime:
+    return (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+
+
+def ensure_otp_window(bind, email, window):
+    with bind.connect() as conn:
+        exists = conn.execute(
+            select(OtpSendCount.count)
+            .where(OtpSendCount.email == email, OtpSendCount.window_start == window)
+        ).first()
+    if exists:
+        return
+
+    try:
+        with bind.begin() as conn:
+            conn.execute(
+                OtpSendCount.__table__.insert().values(email=email, window_start=window, count=0)
+            )
+    except IntegrityError:
+        pass
+
+
+def charge_otp_send(db, email):
+    """
+    Is ghante ke OTP sends +1 caller ke transaction me (OTP insert ke saath)
+    Limit par rollback + 429 (Retry-After → agli window tak)
+    """
+    if not OTP_SENDS_PER_HOUR:
+        return
+
+    now = datetime.utcnow()
+    window = _window(now)
+    ensure_otp_window(db.get_bind(), email, window)
+
+    charged = db.execute(
+        update(OtpSendCount)
+        .where(
+            OtpSendCount.email == email,
+            OtpSendCount.window_start == window,
+            OtpSendCount.count < OTP_SENDS_PER_HOUR
+        )
+        .values(count=OtpSendCount.count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if charged:
+        return
+
+    db.rollback()
+    retry_after = int((window + timedelta(hours=1) - now).total_seconds()) + 1
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Ek ghante me max {OTP_SENDS_PER_HOUR} OTP, thodi der baad try karo",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+def otp_sends(db, email) -> int:
+    return db.execute(
+        select(OtpSendCount.count)
+        .where(OtpSendCount.email == email, OtpSendCount.window_start == _window())
+    ).scalar() or 0
+
+
+#                    RECONCILIATION
+
+
+def _fix_user(bind, user_id, now):
+    # Pehla statement stats row ka UPDATE → row lock (SQLite par write lock);
+    # concurrent note writes (wahi row update karte hai) commit tak wait karte hai
+    with Session(bind=bind) as db:
+        touched = db.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values(reconciled_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not touched:
+            return False
+
+        count, size = _aggregate(db.connection(), [user_id]).get(user_id, (0, 0))
+        db.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values(note_count=count, content_bytes=size)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return True
+
+
+def reconcile(bind, batch_size: int = 500) -> dict:
+    """
+    Ek shard ke users (notes, notes_archive ya user_stats me) batches me: GROUP BY se asli
+    count / bytes vs user_stats. Sirf drift wale users lock ke saath dobara
+    gine jaate hai (lock ke bina padha aggregate beech ke writes se galat ho
+    sakta hai). Dusre shard par route hue users skip (move ke beech)
+    """
+    from .sharding import shard_router
+
+    now = datetime.utcnow()
+    users = union(
+        select(Note.user_id), select(NoteArchive.user_id), select(UserStats.user_id)
+    ).subquery()
+    checked = fixed = 0
+    last = None
+
+    while True:
+        with bind.connect() as conn:
+            query = select(users.c.user_id).order_by(users.c.user_id).limit(batch_size)
+            if last is not None:
+                query = query.where(users.c.user_id > last)
+            batch = conn.execute(query).scalars().all()
+            if not batch:
+                break
+            last = batch[-1]
+
+            if shard_router.enabled:
+                batch = [user_id for user_id in batch if shard_router.engine_for(user_id) is bind]
+
+            actual = _aggregate(conn, batch)
+            stored = {
+                row.user_id: (row.note_count, row.content_bytes)
+                for row in conn.execute(
+                    select(UserStats.user_id, UserStats.note_count, UserStats.content_bytes)
+                    .where(UserStats.user_id.in_(batch))
+                )
+            }
+
+        for user_id in batch:
+            checked += 1
+            if user_id not in stored:
+                # Row hi nahi → aggregate se ban jaata hai
+                ensure_stats_row(bind, user_id)
+                fixed += 1
+            elif stored[user_id] != actual.get(user_id, (0, 0)):
+                fixed += _fix_user(bind, user_id, now)
+
+    return {"users": checked, "fixed": fixed}
+
+
+def purge_otp_windows(bind) -> int:
+    # Pichle ghante se purani windows ka ab koi kaam nahi
+    with bind.begin() as conn:
+        return conn.execute(
+            delete(OtpSendCount).where(OtpSendCount.window_start < _window() - timedelta(hours=1))
+        ).rowcount
+
+
+#                    BENCHMARK
+
+
+def benchmark(notes: int, repeat: int = 20):
+    """
+    In-memory SQLite par ek user ke `notes` notes → quota check COUNT(*) +
+    SUM(bytes) se vs user_stats ke conditional UPDATE se
+    """
+    import time
+
+    from sqlalchemy import insert
+
+    from .database import Base, create_db_engine
+
+    global NOTE_QUOTA_COUNT, NOTE_QUOTA_BYTES
+
+    # Check chale par fail na ho (sirf timing)
+    NOTE_QUOTA_COUNT = max(NOTE_QUOTA_COUNT, notes * 2)
+    NOTE_QUOTA_BYTES = max(NOTE_QUOTA_BYTES, notes * 1000)
+
+    bind = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind)
+    user_id = 1
+
+    with Session(bind=bind) as db:
+        db.execute(insert(Note), [
+            {"title": f"note {i}", "content": "x" * 500, "user_id": user_id, "change_seq": i + 1}
+            for i in range(notes)
+        ])
+        db.commit()
+
+    started = time.perf_counter()
+    ensure_stats_row(bind, user_id)
+    ensure_ms = (time.perf_counter() - started) * 1000
+
+    def timed(fn):
+        with Session(bind=bind) as db:
+            fn(db)
+            db.rollback()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                fn(db)
+                db.rollback()
+            return (time.perf_counter() - started) * 1000 / repeat
+
+    def aggregate_check(db):
+        count, size = _aggregate(db.connection(), [user_id])[user_id]
+        return count + 1 <= NOTE_QUOTA_COUNT and size + 500 <= NOTE_QUOTA_BYTES
+
+    aggregate_ms = timed(aggregate_check)
+    counter_ms = timed(lambda db: charge_notes(db, user_id, 1, 500))
+
+    print(f"{notes} notes (1 user)")
+    print(f"quota check via COUNT + SUM    : {aggregate_ms:>8.3f} ms")
+    print(f"quota check via user_stats     : {counter_ms:>8.3f} ms")
+    print(f"user_stats row initial build   : {ensure_ms:>8.3f} ms (ek baar)")
+
+
+#                    CLI
+
+
+def main(argv=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(prog="python -m app.usage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("reconcile", help="user_stats vs notes drift fix + purani OTP windows")
+    rec.add_argument("--batch-size", type=int, default=500)
+    rec.add_argument("--loop-seconds", type=float, default=0,
+                     help="> 0 → har itne seconds me dobara (background job)")
+
+    bench = sub.add_parser("bench", help="quota check: aggregate vs counter row")
+    bench.add_argument("--notes", type=int, default=100000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.notes)
+        return
+
+    from .database import engine
+    from .sharding import shard_router
+
+    while True:
+        for shard_id, bind in enumerate(shard_router.engines):
+            result = reconcile(bind, args.batch_size)
+            print(f"shard {shard_id}: {result['users']} users checked, {result['fixed']} fixed")
+        print(f"otp windows purged: {purge_otp_windows(engine)}")
+
+        if args.loop_seconds <= 0:
+            break
+        time.sleep(args.loop_seconds)
+
+
+if __name__ == "__main__":
+    main()
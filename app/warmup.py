@@ -0,0 +1,273 @@
+
+# Startup warm-up
+#
+# Deploy ke baad pehli requests slow hoti thi kyunki wahi:
+#   - pool ke DB connections kholti thi
+#   - passlib ka bcrypt backend detect karwati thi
+#   - response serializers (NoteResponse / UserResponse) pehli baar chalati thi
+# Ye sab kaam ab lifespan ke andar background me ek baar ho jata hai
+# aur GET /ready tab tak 503 deta hai
+#
+#   python -m app.warmup bench --rounds 5    → warm-up off vs on, pehli /login + /notes latency
+
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+
+#                    WARM-UP CONFIG
+
+# WARMUP_ENABLED=0 → warm-up skip (app turant ready)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+# Kitne pool connections pehle se khol ke rakhne hain
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "5"))
+
+# Warm-up fail (DB abhi up nahi) → itne seconds se retry, har baar double,
+# WARMUP_RETRY_MAX_SECONDS tak; success tak chalta rehta hai
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "1"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+
+
+# Worker-level warm-up state → /ready isi ko padhta hai
+# steps → har step kitne ms me hua (first request ka bacha hua time)
+warmup_state = {
+    "ready": False,
+    "steps": {},
+    "error": None,
+    "attempts": 0
+}
+
+
+#                    WARM-UP STEPS
+
+
+def warm_pool(bind, connections: int = WARMUP_POOL_CONNECTIONS) -> int:
+    """
+    N connections ek saath kholta hai, har ek par SELECT 1 ping,
+    phir sab pool me wapas → pehli requests ko ready connection milta hai
+
+    Pool size se zyada connections kholna bekaar hai (overflow wale close
+    hote hi discard ho jaate hain), isliye pool size par cap hai
+    """
+    pool_size = getattr(bind.pool, "size", None)
+    if callable(pool_size):
+        connections = min(connections, pool_size())
+
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = bind.connect()
+            opened.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            conn.close()
+
+    return len(opened)
+
+
+def warm_crypto():
+    """
+    Ek throwaway hash + verify → passlib load + bcrypt backend detection
+    Note encryption on ho to AES-GCM backend bhi load
+    """
+    from .auth import hash_password, verify_password
+    from .encryption import _aesgcm, note_cipher
+
+    verify_password("warmup", hash_password("warmup"))
+
+    if note_cipher.enabled:
+        aes = _aesgcm()(bytes(32))
+        aes.decrypt(bytes(12), aes.encrypt(bytes(12), b"warmup", None), None)
+
+
+def warm_serializers(app=None):
+    """
+    Response schemas ka ek validate + JSON dump round trip
+    aur OpenAPI schema (/docs) pehle se build
+    """
+    from .schemas import NoteResponse, UserResponse
+
+    now = datetime.utcnow()
+    NoteResponse.model_validate(
+        {"id": 0, "title": "warmup", "content": "warmup", "created_at": now,
+         "version": 1, "updated_at": now, "change_seq": 1}
+    ).model_dump_json()
+    UserResponse.model_validate(
+        {"id": 0, "name": "warmup", "email": "warmup@example.com"}
+    ).model_dump_json()
+
+    if app is not None:
+        app.openapi()
+
+
+def _warm_replicas():
+    """
+    Replica pools bhi warm → down replica readiness nahi rokti,
+    sirf unhealthy mark hoti hai (reads primary par chale jaate hain)
+    """
+    from .database import replica_engines, replica_router
+
+    for i, replica in enumerate(replica_engines):
+        try:
+            _timed(f"replica_pool_{i}", warm_pool, replica)
+        except Exception:
+            replica_router.mark_unhealthy(replica)
+
+
+def _timed(name: str, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    warmup_state["steps"][name] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def run_warmup(bind, app=None, stop=None):
+    """
+    Saare warm-up steps chalata hai (blocking → thread me chalana)
+    Koi step fail ho to error state me record, backoff ke baad poora warm-up
+    dobara (worker crash nahi hota, /ready 503 hi rehta hai)
+    stop (threading.Event) set → retry band (shutdown)
+    """
+    stop = stop or threading.Event()
+    delay = WARMUP_RETRY_SECONDS
+    while True:
+        warmup_state["attempts"] += 1
+        try:
+            if WARMUP_ENABLED:
+                _timed("pool", warm_pool, bind)
+                _warm_replicas()
+                _timed("crypto", warm_crypto)
+                _timed("serializers", warm_serializers, app)
+            break
+        except Exception as e:
+            warmup_state["error"] = str(e)
+            print(f" Warm-up failed (attempt {warmup_state['attempts']}), retry in {delay:g}s")
+            print(e)
+
+        if stop.wait(delay):
+            return
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+    warmup_state["error"] = None
+    warmup_state["ready"] = True
+
+
+#                    BENCHMARK
+
+# Seed → temp SQLite file par schema + ek user (password "bench-password") + notes
+_SEED = """
+import sys
+from app.auth import hash_password
+from app.bootstrap import migrate
+from app.database import SessionLocal
+from app.models import Note, User
+
+migrate()
+with SessionLocal() as db:
+    user = User(name="bench", email="bench@example.com", hashed_password=hash_password("bench-password"))
+    db.add(user)
+    db.flush()
+    db.add_all(Note(user_id=user.id, title=f"note {i}", content="x" * 200) for i in range(int(sys.argv[1])))
+    db.commit()
+"""
+
+# Naya interpreter → app boot (lifespan), /ready 200 tak wait, phir argv[1]
+# (login / notes) process ki pehli request, phir wahi dobara; last line JSON (ms)
+# Token pehle se bana ke rakha → notes wale process ki pehli request /notes hi hai
+_FIRST_REQUEST = """
+import json, sys, time
+from fastapi.testclient import TestClient
+
+started = time.perf_counter()
+from app.auth import create_access_token
+from app.main import app
+
+headers = {"Authorization": "Bearer " + create_access_token({"user_id": 1})}
+form = {"username": "bench@example.com", "password": "bench-password"}
+request = {
+    "login": lambda client: client.post("/login", data=form),
+    "notes": lambda client: client.get("/notes/", headers=headers),
+}[sys.argv[1]]
+
+with TestClient(app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.005)
+    result = {"ready": (time.perf_counter() - started) * 1000}
+    for attempt in ("first", "second"):
+        t = time.perf_counter()
+        response = request(client)
+        result[attempt] = (time.perf_counter() - t) * 1000
+        assert response.status_code == 200, response.text
+print(json.dumps(result))
+"""
+
+
+def _run(code, env, *args):
+    result = subprocess.run(
+        [sys.executable, "-c", code, *map(str, args)],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise RuntimeError("bench child process fail hua")
+    return json.loads(result.stdout.strip().splitlines()[-1]) if result.stdout.strip() else None
+
+
+def benchmark(rounds: int = 5, notes: int = 50):
+    """
+    Temp SQLite file par har round me har (request, WARMUP_ENABLED) ke liye
+    ek fresh process (alternate order) → /ready tak ka time, us process ki
+    pehli aur doosri request ka time; medians print
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(directory, 'warmup.db')}",
+            PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+        )
+        _run(_SEED, env, notes)
+
+        cases = [(request, enabled) for request in ("login", "notes") for enabled in ("0", "1")]
+        results = {case: [] for case in cases}
+        for i in range(rounds):
+            for request, enabled in (cases if i % 2 == 0 else cases[::-1]):
+                results[request, enabled].append(
+                    _run(_FIRST_REQUEST, dict(env, WARMUP_ENABLED=enabled), request)
+                )
+
+    print(f"{rounds} rounds, {notes} notes (medians, ms)")
+    print(f"{'request':>11}  {'warm-up':>7}  {'ready':>8}  {'first':>8}  {'second':>8}")
+    for (request, enabled), rows in results.items():
+        ready, first, second = (statistics.median(row[c] for row in rows) for c in ("ready", "first", "second"))
+        label = "POST /login" if request == "login" else "GET /notes"
+        print(f"{label:>11}  {'on' if enabled == '1' else 'off':>7}  {ready:>8.1f}  {first:>8.1f}  {second:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.warmup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench = sub.add_parser("bench", help="warm-up off vs on → pehli request latency")
+    bench.add_argument("--rounds", type=int, default=5)
+    bench.add_argument("--notes", type=int, default=50)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.rounds, args.notes)
+
+
+if __name__ == "__main__":
+    main()
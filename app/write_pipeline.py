@@ -0,0 +1,251 @@
+
+# Group-commit write pipeline (note creation)
+#
+# Har create_note apna commit() karta tha → har note ek fsync-bound
+# transaction. Write burst me DB commit-bound ho jata hai.
+#
+# NOTE_GROUP_COMMIT_MS > 0 → concurrent note inserts kuch milliseconds
+# tak collect hote hain aur ek hi transaction me commit hote hain.
+# Har waiting request ko apna note (id ke saath) milta hai; batch fail ho
+# to har note alag se retry hota hai taaki ek kharab row baaki ko na gira de.
+#
+# Benchmark (batch windows compare):
+#   python -m app.write_pipeline --windows 0,1,2,5,10 --writers 32 --notes 2000
+
+
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from .encryption import note_cipher
+from .folders import count_notes
+from .models import Note
+from .revisions import record_revisions
+from .sync import ensure_seq_rows, reserve_change_seqs
+from .usage import charge_notes, content_size, ensure_stats_row
+
+
+#                    PIPELINE CONFIG
+
+# 0 → pipeline off (har note ka apna commit, purana behaviour)
+NOTE_GROUP_COMMIT_MS = float(os.getenv("NOTE_GROUP_COMMIT_MS", "0"))
+
+# Ek transaction me max kitne notes
+NOTE_GROUP_COMMIT_MAX_BATCH = int(os.getenv("NOTE_GROUP_COMMIT_MAX_BATCH", "256"))
+
+
+#                    GROUP COMMITTER
+
+
+class GroupCommitter:
+    """
+    Har engine (shard) ke liye ek queue + background thread
+
+    submit() blocking hai → sync routes threadpool me chalte hain,
+    isliye event loop block nahi hota
+    """
+
+    def __init__(self, window_ms=NOTE_GROUP_COMMIT_MS,
+                 max_batch=NOTE_GROUP_COMMIT_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._queues = {}    # engine → queue.Queue
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def submit(self, bind, values: dict) -> Note:
+        """
+        Note values queue me daalta hai aur commit hone tak wait karta hai
+        Committed (detached) Note return hota hai, ya us note ki apni error raise
+        """
+        future = Future()
+        self._queue_for(bind).put((values, future))
+        return future.result()
+
+    def _queue_for(self, bind):
+        with self._lock:
+            q = self._queues.get(bind)
+            if q is None:
+                q = self._queues[bind] = queue.Queue()
+                threading.Thread(
+                    target=self._run,
+                    args=(bind, q),
+                    name="note-group-commit",
+                    daemon=True
+                ).start()
+            return q
+
+    def _run(self, bind, q):
+        while True:
+            batch = [q.get()]
+
+            # Pehla note aane ke baad window tak aur notes collect
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._commit(bind, batch)
+
+    def _commit(self, bind, batch):
+        try:
+            user_ids = {values["user_id"] for values, _ in batch}
+            ensure_seq_rows(bind, user_ids)
+            for user_id in user_ids:
+                ensure_stats_row(bind, user_id)
+            with Session(bind=bind, expire_on_commit=False) as db:
+                notes = self._insert(db, [values for values, _ in batch])
+                db.commit()
+        except Exception:
+            # Failure isolation → har note apne transaction me retry
+            for values, future in batch:
+                try:
+                    with Session(bind=bind, expire_on_commit=False) as db:
+                        note, = self._insert(db, [values])
+                        db.commit()
+                    future.set_result(note)
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for note, (_, future) in zip(notes, batch):
+            future.set_result(note)
+
+
+    @staticmethod
+    def _insert(db, rows):
+        """
+        Har user ke liye ek hi counter bump me saare change_seq reserve,
+        phir saare notes ek flush me (aur unke pehle revisions ek INSERT ... SELECT me)
+        Usage counters bhi har user ke liye ek UPDATE (quota fail → batch fail,
+        retry me sirf wahi note)
+        """
+        counts = {}
+        sizes = {}
+        for values in rows:
+            counts[values["user_id"]] = counts.get(values["user_id"], 0) + 1
+            sizes[values["user_id"]] = sizes.get(values["user_id"], 0) + content_size(values["content"])
+
+        next_seq = {
+            user_id: reserve_change_seqs(db, user_id, count)
+            for user_id, count in counts.items()
+        }
+        for user_id, count in counts.items():
+            charge_notes(db, user_id, count, sizes[user_id])
+
+        notes = []
+        for values in rows:
+            seq = next_seq[values["user_id"]]
+            next_seq[values["user_id"]] = seq + 1
+            notes.append(Note(**values, change_seq=seq))
+
+        db.add_all(notes)
+        db.flush()
+        # Revision size plaintext se (values me content already encrypted ho sakta hai)
+        record_revisions(db, [note.id for note in notes], {
+            note.id: len(note_cipher.decrypt(note.user_id, note.content)) for note in notes
+        })
+        count_notes(db, notes)
+        return notes
+
+
+note_pipeline = GroupCommitter()
+
+
+#                    BENCHMARK
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def benchmark(bind, windows, writers: int, notes: int):
+    """
+    Har batch window ke liye `writers` concurrent threads se `notes` inserts
+    Throughput (notes/s) aur per-request latency (p50 / p99) print karta hai
+    window 0 → pipeline off (har note ka apna commit)
+    bind khaali bench database ka hona chahiye (tables yahi banti aur drop hoti hai)
+    """
+    from sqlalchemy import insert, inspect
+
+    from .models import User
+
+    with bind.connect() as conn:
+        if inspect(conn).has_table("notes"):
+            raise RuntimeError(f"{bind.url!r} me pehle se tables hai → khaali bench database do")
+    # `python -m app.write_pipeline` → models wala Base app.database ka
+    metadata = Note.metadata
+    metadata.create_all(bind)
+
+    try:
+        with bind.begin() as conn:
+            user_id = conn.execute(
+                insert(User).values(name="bench", email="bench@example.com", hashed_password="x")
+            ).inserted_primary_key[0]
+
+        print(f"{'window ms':>10}  {'notes/s':>10}  {'p50 ms':>8}  {'p99 ms':>8}")
+
+        for window in windows:
+            committer = GroupCommitter(window_ms=window)
+            latencies = []
+
+            def write(i):
+                values = {"title": f"bench {i}", "content": "x" * 200, "user_id": user_id}
+                started = time.perf_counter()
+                if committer.enabled:
+                    committer.submit(bind, values)
+                else:
+                    with Session(bind=bind) as db:
+                        GroupCommitter._insert(db, [values])
+                        db.commit()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=writers) as pool:
+                list(pool.map(write, range(notes)))
+            elapsed = time.perf_counter() - started
+
+            print(f"{window:>10g}  {notes / elapsed:>10.0f}  "
+                  f"{_percentile(latencies, 50):>8.2f}  {_percentile(latencies, 99):>8.2f}")
+    finally:
+        metadata.drop_all(bind)
+        bind.dispose()
+
+
+def main(argv=None):
+    import tempfile
+
+    from .database import create_db_engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.write_pipeline")
+    parser.add_argument("--windows", default="0,1,2,5,10",
+                        help="comma separated batch windows (ms)")
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--url", default=None,
+                        help="khaali bench database URL (default → temp SQLite file; app DB kabhi nahi)")
+    args = parser.parse_args(argv)
+
+    # In-memory SQLite nahi → ek hi shared connection, concurrent writers ke liye safe nahi
+    url = args.url or f"sqlite:///{tempfile.mkdtemp()}/pipeline.db"
+    windows = [float(w) for w in args.windows.split(",")]
+    benchmark(create_db_engine(url), windows, args.writers, args.notes)
+
+
+if __name__ == "__main__":
+    main()